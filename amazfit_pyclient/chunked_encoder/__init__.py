@@ -1,3 +1,4 @@
 from .chunked_decoder import ChunkedDecoder
 from .chunked_encoder import ChunkedEncoder
 from .chunked_endpoint import ChunkedEndpoint
+from .scheduler import OutboundScheduler
@@ -13,3 +13,41 @@ def decrypt_aes(value, secret_key):
     decryptor = cipher.decryptor()
     pt = decryptor.update(value) + decryptor.finalize()
     return pt
+
+
+class SessionCrypto:
+    """
+    Per-session AES state.
+
+    Messages are encrypted with the session key xored with the one byte
+    message handle, so there are at most 256 keys per session. Keys and
+    ciphers are derived on first use and reused afterwards.
+    """
+
+    def __init__(self, shared_session_key: bytes):
+        assert len(shared_session_key) == 16
+        self.shared_session_key = shared_session_key
+        self.keys: dict[int, bytes] = {}
+        self.ciphers: dict[int, Cipher] = {}
+
+    def message_key(self, handle: int) -> bytes:
+        key = self.keys.get(handle)
+        if key is None:
+            key = self.keys[handle] = bytes(i ^ handle for i in self.shared_session_key)
+        return key
+
+    def cipher(self, handle: int) -> Cipher:
+        cipher = self.ciphers.get(handle)
+        if cipher is None:
+            cipher = self.ciphers[handle] = Cipher(
+                algorithms.AES(self.message_key(handle)), modes.ECB()
+            )
+        return cipher
+
+    def encrypt(self, handle: int, value) -> bytes:
+        encryptor = self.cipher(handle).encryptor()
+        return encryptor.update(value) + encryptor.finalize()
+
+    def decrypt(self, handle: int, value) -> bytes:
+        decryptor = self.cipher(handle).decryptor()
+        return decryptor.update(value) + decryptor.finalize()
@@ -1,32 +1,38 @@
 import logging
 import struct
+import time
 from typing import Awaitable, Callable, Optional, TYPE_CHECKING
 
 from bleak import BleakClient, BleakGATTCharacteristic
 
-from .aes import decrypt_aes
+from .aes import SessionCrypto
 from .chunked_endpoint import ChunkedEndpoint, HeaderFlags
+from .dispatcher import Dispatcher
+from .reassembly import Reassembly
 
 if TYPE_CHECKING:
     from handlers.base_handler import BaseHandler
 
 
 class ChunkedDecoder:
-    current_handle: Optional[int] = None
-    current_type = 0
-    full_length = 0
-    last_count = 0
+    __crypto: Optional[SessionCrypto] = None
 
-    reassembly_buffer: bytes = b""
-    __shared_session_key: Optional[bytes] = None
-
-    callbacks: dict[ChunkedEndpoint, Callable[[bytes], Awaitable[None]]]
+    callbacks: dict[ChunkedEndpoint, Callable[[memoryview], Awaitable[None]]]
+    messages: dict[int, Reassembly]
 
     def __init__(
         self,
         client: BleakClient,
+        max_messages: int = 8,
+        message_timeout: float = 30.0,
+        queue_size: int = 32,
+        concurrency: int = 4,
     ):
         self.client = client
+        self.max_messages = max_messages
+        self.message_timeout = message_timeout
+        self.messages = {}
+        self.dispatcher = Dispatcher(queue_size, concurrency)
 
         service = client.services.get_service("0000fee0-0000-1000-8000-00805f9b34fb")
         self.char = service.get_characteristic("00000017-0000-3512-2118-0009af100700")
@@ -42,8 +48,11 @@ class ChunkedDecoder:
     async def start_notify(self):
         await self.client.start_notify(self.char.handle, self.callback)
 
+    async def close(self):
+        await self.dispatcher.close()
+
     def set_encryption_parameters(self, final_shared_session_aes: bytes):
-        self.__shared_session_key = final_shared_session_aes
+        self.__crypto = SessionCrypto(final_shared_session_aes)
 
     def add_handler(
         self,
@@ -52,9 +61,25 @@ class ChunkedDecoder:
         assert callback.endpoint not in self.callbacks
         self.callbacks[callback.endpoint] = callback
 
+    def evict(self, now: float):
+        for handle, message in list(self.messages.items()):
+            if now - message.updated > self.message_timeout:
+                self.logger.warning(
+                    "Dropping stale message %s: %s/%s bytes",
+                    handle,
+                    message.offset,
+                    message.size,
+                )
+                del self.messages[handle]
+
+        while len(self.messages) >= self.max_messages:
+            handle = min(self.messages, key=lambda i: self.messages[i].updated)
+            self.logger.warning("Too many pending messages, dropping %s", handle)
+            del self.messages[handle]
+
     async def decode(self, data: bytes):
-        chunked, _flags, _, handle, self.last_count = struct.unpack("BBBBB", data[:5])
-        data = data[5:]
+        chunked, _flags, _, handle, count = struct.unpack_from("BBBBB", data)
+        data = memoryview(data)[5:]
 
         if chunked != 0x03:
             self.logger.warning("Ignoring non-chunked payload")
@@ -62,86 +87,87 @@ class ChunkedDecoder:
 
         flags = HeaderFlags(_flags)
 
-        if self.current_handle is not None and self.current_handle != handle:
-            self.logger.warning(
-                "ignoring handle %s, expected %s", handle, self.current_handle
-            )
-            return False, 0
-
         if flags.first_chunk:
-            self.full_length = int.from_bytes(data[:4], "little")
-            data = data[4:]
+            if handle in self.messages:
+                self.logger.warning("Restarting unfinished message %s", handle)
+                del self.messages[handle]
+            self.evict(time.monotonic())
+
+            full_length, endpoint = struct.unpack_from("<IH", data)
+            data = data[6:]
+            size = full_length
             if flags.encrypted:
-                encrypted_length = self.full_length + 8
-                overflow = encrypted_length % 16
+                size = full_length + 8
+                overflow = size % 16
                 if overflow > 0:
-                    encrypted_length += 16 - overflow
+                    size += 16 - overflow
+
+            self.messages[handle] = Reassembly(handle, endpoint, full_length, size)
+
+        message = self.messages.get(handle)
+        if message is None:
+            self.logger.warning("Got chunk of handle %s without a first chunk", handle)
+            return False, 0
 
-                self.full_length = encrypted_length
+        if not message.write(data):
+            self.logger.warning(
+                "Message %s overflows announced length %s", handle, message.size
+            )
+            del self.messages[handle]
+            return False, 0
 
-            self.reassembly_buffer = b""
-            self.current_type = int.from_bytes(data[:2], "little")
-            data = data[2:]
-            self.current_handle = handle
+        if not flags.last_chunk:
+            return
 
-        self.reassembly_buffer += data
+        del self.messages[handle]
+        if not message.complete:
+            self.logger.warning(
+                "Message %s is incomplete: %s/%s bytes",
+                handle,
+                message.offset,
+                message.size,
+            )
+            return False, 0
 
-        if flags.last_chunk:
-            assert len(self.reassembly_buffer) == self.full_length
-            if flags.encrypted:
-                if self.__shared_session_key is None:
-                    self.logger.warning(
-                        "Got encrypted message, but there's no shared session key"
-                    )
-                    self.current_handle = None
-                    self.current_type = 0
-                    return False, 0
-
-                message_key = bytes(
-                    [self.__shared_session_key[i] ^ handle for i in range(16)]
+        if flags.encrypted:
+            if self.__crypto is None:
+                self.logger.warning(
+                    "Got encrypted message, but there's no shared session key"
                 )
+                return False, 0
 
-                try:
-                    buf = decrypt_aes(self.reassembly_buffer, message_key)
-                except Exception as e:
-                    self.logger.warning("error decrypting: %s", e)
-                    self.current_handle = None
-                    self.current_type = 0
-                    return False, 0
-
-                # todo: decode head
-                head = buf[self.full_length :]
-                buf = buf[: self.full_length]
-            else:
-                buf = self.reassembly_buffer
+            try:
+                decrypted = self.__crypto.decrypt(handle, message.payload())
+            except Exception as e:
+                self.logger.warning("error decrypting: %s", e)
+                return False, 0
 
-            self.reassembly_buffer = b""
+            # the tail holds the sequence number and the crc32 of the payload
+            buf = memoryview(decrypted)[: message.length]
+        else:
+            buf = message.payload()
 
-            if self.current_type in list(ChunkedEndpoint):
-                t_name = ChunkedEndpoint(self.current_type).name
-            else:
-                t_name = hex(self.current_type)
+        if message.endpoint in list(ChunkedEndpoint):
+            t_name = ChunkedEndpoint(message.endpoint).name
+        else:
+            t_name = hex(message.endpoint)
 
+        if self.logger.isEnabledFor(logging.DEBUG):
             self.logger.debug(
                 "%s data %s: %s",
                 "Decrypted" if flags.encrypted else "Plaintext",
                 t_name,
-                buf,
+                bytes(buf),
             )
 
-            if self.current_type not in self.callbacks:
-                self.logger.warning("No callback for event type: %s", t_name)
-            else:
-                try:
-                    await self.callbacks[self.current_type](buf)
-                except Exception as e:
-                    self.logger.exception("Failed to handle payload: %s", e)
-
-            if flags.needs_ack:
-                ack_payload = struct.pack(
-                    "<5B", 0x04, 0x00, self.current_handle, 0x01, self.last_count
-                )
-                await self.client.write_gatt_char(self.char, ack_payload)
+        if message.endpoint not in self.callbacks:
+            self.logger.warning("No callback for event type: %s", t_name)
+        elif not self.dispatcher.submit(
+            message.endpoint, self.callbacks[message.endpoint], buf
+        ):
+            # not acknowledged, so the watch sends it again
+            return False, 0
 
-            self.current_type = 0
-            self.current_handle = None
+        if flags.needs_ack:
+            ack_payload = struct.pack("<5B", 0x04, 0x00, message.handle, 0x01, count)
+            await self.client.write_gatt_char(self.char, ack_payload)
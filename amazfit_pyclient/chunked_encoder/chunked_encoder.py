@@ -1,21 +1,45 @@
+import asyncio
 import logging
+import struct
 import zlib
-from typing import Optional
+from functools import partial
+from typing import Iterator, Optional
 
 from bleak import BleakClient
+from bleak.exc import BleakError
 
-from .aes import encrypt_aes
+from .aes import SessionCrypto
 from .chunked_endpoint import HeaderFlags
+from .scheduler import OutboundScheduler
+
+# (first chunk, following chunks) headers, indexed by extended_flags
+HEADERS = {
+    False: (struct.Struct("<4BIH"), struct.Struct("<4B")),
+    True: (struct.Struct("<5BIH"), struct.Struct("<5B")),
+}
 
 
 class ChunkedEncoder:
     shared_session_key: Optional[bytes] = None
+    crypto: Optional[SessionCrypto] = None
     write_handle = 0
     encrypted_sequence_nr = 0
     m_mtu = 23
 
-    def __init__(self, client: BleakClient):
+    def __init__(
+        self,
+        client: BleakClient,
+        pipelined: bool = False,
+        window: int = 8,
+        scheduler: Optional[OutboundScheduler] = None,
+    ):
         self.client = client
+        self.pipelined = pipelined
+        self.window = window
+        self.scheduler = scheduler
+        # cleared while the MTU is being negotiated, encrypted messages wait for it
+        self.mtu_settled = asyncio.Event()
+        self.mtu_settled.set()
 
         self.char = client.services.get_characteristic(
             "00000016-0000-3512-2118-0009af100700"
@@ -27,12 +51,10 @@ class ChunkedEncoder:
         self, encrypted_sequence_number: int, final_shared_session_aes: bytes
     ):
         self.shared_session_key = final_shared_session_aes
+        self.crypto = SessionCrypto(final_shared_session_aes)
         self.encrypted_sequence_nr = encrypted_sequence_number
 
     def encrypt(self, payload: bytes):
-        messagekey = bytes(i ^ self.write_handle for i in self.shared_session_key)
-        assert len(messagekey) == 16
-
         encrypted_length = len(payload) + 8
         overflow = encrypted_length % 16
         if overflow:
@@ -43,21 +65,15 @@ class ChunkedEncoder:
         checksum = zlib.crc32(encryptable_payload)
         encryptable_payload += checksum.to_bytes(4, "little")
 
-        payload = encrypt_aes(
+        payload = self.crypto.encrypt(
+            self.write_handle,
             encryptable_payload + b"\0" * (encrypted_length - len(encryptable_payload)),
-            messagekey,
         )
         self.encrypted_sequence_nr += 1
 
         return payload
 
-    def encode(
-        self,
-        endpoint: int,
-        payload: bytes,
-        extended_flags: bool = False,
-        encrypt: bool = False,
-    ):
+    def prepare(self, payload: bytes, encrypt: bool) -> Optional[bytes]:
         if encrypt and self.shared_session_key is None:
             self.logger.error("Can't encrypt without the shared session key")
             return
@@ -66,9 +82,6 @@ class ChunkedEncoder:
         if self.write_handle >= 256:
             self.write_handle = 0
 
-        count = 0
-        header_size = 11
-
         if encrypt:
             try:
                 payload = self.encrypt(payload)
@@ -76,38 +89,88 @@ class ChunkedEncoder:
                 self.logger.error("Could not encrypt data: %s", e)
                 return
 
-        while payload:
-            max_chunklength = self.m_mtu - 3 - header_size
-            copybytes = min(len(payload), max_chunklength)
+        return payload
 
-            flags = HeaderFlags(0)
-            if encrypt:
-                flags |= HeaderFlags.encrypted
+    def layout(
+        self, endpoint: int, length: int, extended_flags: bool, encrypt: bool
+    ) -> Iterator[tuple[struct.Struct, tuple, int, int]]:
+        """
+        Yields header struct, header values, payload offset and payload size of
+        every chunk of a `length` bytes message.
+        """
+        first, header = HEADERS[extended_flags]
+        prefix = (0x03,)
+        suffix = (0x00, self.write_handle) if extended_flags else (self.write_handle,)
+        base_flags = HeaderFlags.encrypted if encrypt else HeaderFlags(0)
+
+        max_chunklength = self.m_mtu - 3 - first.size
+        offset = 0
+        count = 0
+        while offset < length:
+            flags = base_flags
             if count == 0:
                 flags |= HeaderFlags.first_chunk
-            if len(payload) <= max_chunklength:
+            if length - offset <= max_chunklength:
                 flags |= HeaderFlags.last_chunk
+            size = min(length - offset, max_chunklength)
 
-            header = b"\x03"
-            header += flags.to_bytes(1, "little")
-            if extended_flags:
-                header += b"\x00"
-            header += self.write_handle.to_bytes(1, "little")
-            header += count.to_bytes(1, "little")
+            values = prefix + (flags,) + suffix + (count & 0xFF,)
             if count == 0:
-                header += len(payload).to_bytes(4, "little")
-                header += endpoint.to_bytes(2, "little")
-
-            chunk = header + payload[:copybytes]
+                yield first, values + (length, endpoint), offset, size
+            else:
+                yield header, values, offset, size
 
-            assert len(chunk) == header_size + copybytes
-            yield chunk
+            offset += size
+            count += 1
+            max_chunklength = self.m_mtu - 3 - header.size
 
-            payload = payload[copybytes:]
+    def encode(
+        self,
+        endpoint: int,
+        payload: bytes,
+        extended_flags: bool = False,
+        encrypt: bool = False,
+    ) -> Iterator[bytes]:
+        payload = self.prepare(payload, encrypt)
+        if payload is None:
+            return
 
-            header_size = 4 + extended_flags
+        view = memoryview(payload)
+        for header, values, offset, size in self.layout(
+            endpoint, len(view), extended_flags, encrypt
+        ):
+            yield header.pack(*values) + view[offset : offset + size]
 
-            count += 1
+    def encode_into(
+        self,
+        endpoint: int,
+        payload: bytes,
+        extended_flags: bool = False,
+        encrypt: bool = False,
+    ) -> list[memoryview]:
+        """
+        Same as `encode`, but writes all chunks into one preallocated buffer
+        and returns views of it.
+        """
+        payload = self.prepare(payload, encrypt)
+        if payload is None:
+            return []
+
+        view = memoryview(payload)
+        chunks = list(self.layout(endpoint, len(view), extended_flags, encrypt))
+        buffer = bytearray(sum(header.size + size for header, _, _, size in chunks))
+        out = memoryview(buffer)
+
+        result = []
+        position = 0
+        for header, values, offset, size in chunks:
+            header.pack_into(buffer, position, *values)
+            end = position + header.size + size
+            out[position + header.size : end] = view[offset : offset + size]
+            result.append(out[position:end])
+            position = end
+
+        return result
 
     async def write(
         self,
@@ -116,5 +179,52 @@ class ChunkedEncoder:
         extended_flags: bool = False,
         encrypt: bool = False,
     ):
-        for i in self.encode(t, payload, extended_flags, encrypt):
-            await self.client.write_gatt_char(self.char, i)
+        if encrypt:
+            await self.mtu_settled.wait()
+
+        if self.scheduler is None:
+            await self.send(t, payload, extended_flags, encrypt)
+        else:
+            await self.scheduler.submit(
+                t, partial(self.send, t, payload, extended_flags, encrypt)
+            )
+
+    async def send(
+        self,
+        t: int,
+        payload: bytes,
+        extended_flags: bool = False,
+        encrypt: bool = False,
+    ):
+        if not self.pipelined:
+            for i in self.encode(t, payload, extended_flags, encrypt):
+                await self.client.write_gatt_char(self.char, i)
+            return
+
+        await self.write_pipelined(
+            list(self.encode(t, payload, extended_flags, encrypt))
+        )
+
+    async def write_pipelined(self, chunks: list[bytes]):
+        """
+        Sends chunks with write-without-response, forcing an acknowledged
+        write after every `window` unacknowledged ones and for the last
+        chunk. A failed unacknowledged write is treated as congestion and the
+        rest of the message falls back to acknowledged writes.
+        """
+        pipelined = "write-without-response" in self.char.properties
+        in_flight = 0
+        last = len(chunks) - 1
+        for n, chunk in enumerate(chunks):
+            if pipelined and n != last and in_flight < self.window:
+                try:
+                    await self.client.write_gatt_char(self.char, chunk, response=False)
+                except BleakError as e:
+                    self.logger.warning("Write without response failed: %s", e)
+                    pipelined = False
+                else:
+                    in_flight += 1
+                    continue
+
+            await self.client.write_gatt_char(self.char, chunk, response=True)
+            in_flight = 0
@@ -0,0 +1,107 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+
+
+@dataclass
+class DispatchStats:
+    handled: int = 0
+    failed: int = 0
+    dropped: int = 0
+    wait_total: float = 0.0
+    latency_total: float = 0.0
+    latency_max: float = 0.0
+
+    @property
+    def latency_avg(self) -> float:
+        done = self.handled + self.failed
+        return self.latency_total / done if done else 0.0
+
+    @property
+    def wait_avg(self) -> float:
+        done = self.handled + self.failed
+        return self.wait_total / done if done else 0.0
+
+
+class Dispatcher:
+    """
+    Runs message handlers outside the notification callback.
+
+    Every endpoint gets a bounded queue and a worker task, so messages of one
+    endpoint are handled in order while a slow endpoint doesn't hold back the
+    others. `concurrency` limits how many handlers run at the same time.
+    """
+
+    queues: dict[int, asyncio.Queue]
+    workers: dict[int, asyncio.Task]
+    stats: dict[int, DispatchStats]
+
+    def __init__(self, queue_size: int = 32, concurrency: int = 4):
+        self.queue_size = queue_size
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.queues = {}
+        self.workers = {}
+        self.stats = {}
+
+        self.logger = logging.getLogger(self.__class__.__qualname__)
+
+    def submit(
+        self,
+        endpoint: int,
+        callback: Callable[[memoryview], Awaitable[None]],
+        payload: memoryview,
+    ) -> bool:
+        queue = self.queues.get(endpoint)
+        if queue is None:
+            queue = self.queues[endpoint] = asyncio.Queue(self.queue_size)
+            self.stats[endpoint] = DispatchStats()
+            self.workers[endpoint] = asyncio.create_task(self.worker(endpoint))
+
+        try:
+            queue.put_nowait((time.monotonic(), callback, payload))
+        except asyncio.QueueFull:
+            self.stats[endpoint].dropped += 1
+            self.logger.warning("Queue of %s is full, dropping message", endpoint)
+            return False
+
+        return True
+
+    async def worker(self, endpoint: int):
+        queue = self.queues[endpoint]
+        stats = self.stats[endpoint]
+        while True:
+            queued, callback, payload = await queue.get()
+            try:
+                async with self.semaphore:
+                    start = time.monotonic()
+                    stats.wait_total += start - queued
+                    try:
+                        await callback(payload)
+                    except Exception as e:
+                        stats.failed += 1
+                        self.logger.exception("Failed to handle payload: %s", e)
+                    else:
+                        stats.handled += 1
+
+                    latency = time.monotonic() - start
+                    stats.latency_total += latency
+                    stats.latency_max = max(stats.latency_max, latency)
+            finally:
+                queue.task_done()
+
+    def queue_depth(self, endpoint: int) -> int:
+        queue = self.queues.get(endpoint)
+        return queue.qsize() if queue else 0
+
+    async def join(self):
+        for queue in list(self.queues.values()):
+            await queue.join()
+
+    async def close(self):
+        for task in self.workers.values():
+            task.cancel()
+        await asyncio.gather(*self.workers.values(), return_exceptions=True)
+        self.workers.clear()
+        self.queues.clear()
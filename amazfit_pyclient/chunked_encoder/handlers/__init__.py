@@ -1,8 +1,9 @@
 from .auth_handler import AuthHandler
-from .base_handler import BaseHandler
-from .battery_handler import BatteryClient
+from .base_handler import BaseHandler, RequestStats
+from .battery_handler import BatteryClient, BatteryInfo
 from .connection_handler import ConnectionClient
-from .heartrate_handler import HeartRateClient
+from .heartrate_handler import HeartRateClient, HeartRateSample
 from .http_handler import HttpClient
 from .logs_handler import LogsClient
-from .steps_handler import StepsClient
+from .steps_handler import RealtimeSteps, Steps, StepsClient
+from .utils import OverflowPolicy, RealtimeStream, Subscription
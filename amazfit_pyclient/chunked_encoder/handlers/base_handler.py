@@ -1,15 +1,38 @@
+import asyncio
 import logging
-from typing import Awaitable, Callable, Protocol
+import time
+from collections import deque
+from dataclasses import dataclass
+from functools import partial
+from typing import Any, Awaitable, Callable, Protocol
 
 from ..chunked_decoder import ChunkedDecoder
 from ..chunked_encoder import ChunkedEncoder
 from ..chunked_endpoint import ChunkedEndpoint
 
+DEFAULT_TIMEOUT = 5.0
+
+
+@dataclass
+class RequestStats:
+    completed: int = 0
+    failed: int = 0
+    timeouts: int = 0
+    latency_total: float = 0.0
+    latency_max: float = 0.0
+
+    @property
+    def latency_avg(self) -> float:
+        return self.latency_total / self.completed if self.completed else 0.0
+
 
 class BaseHandler(Protocol):
     endpoint: ChunkedEndpoint
     encrypted: bool
-    handlers: dict[int, Callable[["BaseHandler", bytes], Awaitable[None]]]
+    handlers: dict[int, Callable[["BaseHandler", memoryview], Awaitable[Any]]]
+    # futures of requests waiting for a response, keyed by (endpoint, cmd)
+    pending: dict[tuple[int, int], deque[asyncio.Future]]
+    stats: dict[tuple[int, int], RequestStats]
 
     def __init__(
         self,
@@ -19,27 +42,102 @@ class BaseHandler(Protocol):
         self.encoder = encoder
         self.decoder = decoder
         decoder.add_handler(self)
+        self.pending = {}
+        self.stats = {}
         self.logger = logging.getLogger(self.__class__.__qualname__)
 
-    async def __call__(self, payload: bytes):
-        handler = self.handlers.get(payload[0])
+    async def __call__(self, payload: memoryview):
+        cmd = payload[0]
+        handler = self.handlers.get(cmd)
         if not handler:
-            self.logger.error(f"Handler not found: {payload[0]} -> {payload[1:]}")
+            self.logger.error(f"Handler not found: {cmd} -> {bytes(payload[1:])}")
             return
 
-        await handler(self, payload[1:])
+        try:
+            result = await handler(self, payload[1:])
+        except Exception as e:
+            if not self.resolve(cmd, exception=e):
+                raise
+        else:
+            self.resolve(cmd, result)
+
+    def resolve(self, cmd: int, result: Any = None, exception=None) -> bool:
+        """
+        Completes the oldest request waiting for `cmd` with the handler's
+        result, returns False if nobody waits for it.
+        """
+        key = (self.endpoint, cmd)
+        futures = self.pending.get(key)
+        while futures:
+            future = futures.popleft()
+            if not futures:
+                del self.pending[key]
+            if future.done():
+                continue
+            if exception is not None:
+                future.set_exception(exception)
+            else:
+                future.set_result(result)
+            return True
+        return False
+
+    def discard(self, key: tuple[int, int], future: asyncio.Future):
+        """Forgets a request that timed out or was cancelled"""
+        futures = self.pending.get(key)
+        if futures is None:
+            return
+        try:
+            futures.remove(future)
+        except ValueError:
+            # already taken by `resolve`
+            return
+        if not futures:
+            del self.pending[key]
 
     async def write(self, payload: bytes):
         await self.encoder.write(
             self.endpoint, payload, encrypt=self.encrypted, extended_flags=True
         )
 
+    async def query(
+        self, payload: bytes, response: int, timeout: float = DEFAULT_TIMEOUT
+    ) -> Any:
+        """
+        Writes `payload` and waits for the `response` command, returns what
+        its handler returned. Requests for the same response are answered in
+        the order they were sent, so several can be in flight at once.
+        """
+        key = (self.endpoint, response)
+        stats = self.stats.setdefault(key, RequestStats())
+        future = asyncio.get_running_loop().create_future()
+        self.pending.setdefault(key, deque()).append(future)
+        future.add_done_callback(partial(self.discard, key))
+
+        start = time.monotonic()
+        try:
+            await self.write(payload)
+            result = await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            stats.timeouts += 1
+            raise
+        except Exception:
+            stats.failed += 1
+            raise
+        finally:
+            future.cancel()
+
+        latency = time.monotonic() - start
+        stats.completed += 1
+        stats.latency_total += latency
+        stats.latency_max = max(stats.latency_max, latency)
+        return result
+
     @classmethod
     def handler(cls, cmd: int):
         if not hasattr(cls, "handlers"):
             cls.handlers = {}
 
-        def decorator(func: Callable[[cls, bytes], Awaitable[None]]):
+        def decorator(func: Callable[[cls, memoryview], Awaitable[Any]]):
             cls.handlers[cmd] = func
 
             return func
@@ -1,9 +1,10 @@
 import struct
+from dataclasses import dataclass
 from datetime import datetime
 from enum import Enum
 from typing import Tuple
 
-from .base_handler import BaseHandler
+from .base_handler import BaseHandler, DEFAULT_TIMEOUT
 from ..chunked_endpoint import ChunkedEndpoint
 from amazfit_pyclient.fetch.utils import TimeUtils
 
@@ -20,18 +21,26 @@ class BatteryStatus(int, Enum):
     CHARGING = 1
 
 
+@dataclass(frozen=True)
+class BatteryInfo:
+    level: int
+    status: BatteryStatus
+    last_charge_start: datetime
+    last_charge_level: int
+
+
 class BatteryClient(BaseHandler):
     endpoint = ChunkedEndpoint.BATTERY
     encrypted = False
 
-    async def request_state(self):
-        await self.write(
-            bytes([BatteryCmd.GET_STATE]),
+    async def request_state(self, timeout: float = DEFAULT_TIMEOUT) -> int:
+        return await self.query(
+            bytes([BatteryCmd.GET_STATE]), BatteryCmd.STATE_ACK, timeout
         )
 
-    async def request_status(self):
-        await self.write(
-            bytes([BatteryCmd.GET_STATUS]),
+    async def request_status(self, timeout: float = DEFAULT_TIMEOUT) -> BatteryInfo:
+        return await self.query(
+            bytes([BatteryCmd.GET_STATUS]), BatteryCmd.FULL_INFO_ACK, timeout
         )
 
     def decode_payload(
@@ -59,7 +68,7 @@ class BatteryClient(BaseHandler):
 
 
 @BatteryClient.handler(BatteryCmd.FULL_INFO_ACK)
-async def get_full_info_handler(self: BatteryClient, payload: bytes):
+async def get_full_info_handler(self: BatteryClient, payload: bytes) -> BatteryInfo:
     (
         proc,
         status,
@@ -70,8 +79,11 @@ async def get_full_info_handler(self: BatteryClient, payload: bytes):
         "proc = %i, status = %s, last_charge_start = %s, last_charge_proc = %i"
         % (proc, status, last_charge_start, last_charge_proc)
     )
+    return BatteryInfo(proc, status, last_charge_start, last_charge_proc)
 
 
 @BatteryClient.handler(BatteryCmd.STATE_ACK)
-async def get_info_handler(self: BatteryClient, payload: bytes):
-    print(f"Battery status: {int.from_bytes(payload)}")
+async def get_info_handler(self: BatteryClient, payload: bytes) -> int:
+    state = int.from_bytes(payload)
+    print(f"Battery status: {state}")
+    return state
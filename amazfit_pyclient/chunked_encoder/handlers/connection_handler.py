@@ -1,6 +1,7 @@
+import asyncio
 from enum import Enum
 
-from .base_handler import BaseHandler
+from .base_handler import BaseHandler, DEFAULT_TIMEOUT
 from ..chunked_endpoint import ChunkedEndpoint
 
 
@@ -15,11 +16,42 @@ class ConnectionClient(BaseHandler):
     endpoint = ChunkedEndpoint.CONNECT
     encrypted = False
 
-    async def ping(self):
-        await self.write(ConnectionCmd.PING_REQUEST.to_bytes(1, "little"))
+    async def ping(self, timeout: float = DEFAULT_TIMEOUT) -> float:
+        """Round trip time in seconds"""
+        start = asyncio.get_running_loop().time()
+        await self.query(
+            ConnectionCmd.PING_REQUEST.to_bytes(1, "little"),
+            ConnectionCmd.PING_RESPONSE,
+            timeout,
+        )
+        return asyncio.get_running_loop().time() - start
 
-    async def get_mtu(self):
-        await self.write(ConnectionCmd.MTU_REQUEST.to_bytes(1, "little"))
+    async def get_mtu(self, timeout: float = DEFAULT_TIMEOUT) -> int:
+        return await self.query(
+            ConnectionCmd.MTU_REQUEST.to_bytes(1, "little"),
+            ConnectionCmd.MTU_RESPONSE,
+            timeout,
+        )
+
+    async def negotiate_mtu(self, timeout: float = 5.0) -> int:
+        """
+        Sizes chunks from the ATT MTU reported by bleak, then asks the watch
+        for its protocol MTU. Encrypted messages are held back until done.
+        """
+        self.encoder.mtu_settled.clear()
+        try:
+            att_mtu = self.encoder.client.mtu_size
+            self.logger.info(f"ATT MTU: {att_mtu}")
+            self.encoder.m_mtu = att_mtu
+
+            try:
+                await self.get_mtu(timeout)
+            except asyncio.TimeoutError:
+                self.logger.warning("No MTU response, keeping %i", att_mtu)
+        finally:
+            self.encoder.mtu_settled.set()
+
+        return self.encoder.m_mtu
 
 
 @ConnectionClient.handler(ConnectionCmd.PING_REQUEST)
@@ -27,8 +59,24 @@ async def ping_response_handler(self: ConnectionClient, payload: bytes):
     await self.write(ConnectionCmd.PING_RESPONSE.to_bytes(1, "little"))
 
 
+@ConnectionClient.handler(ConnectionCmd.PING_RESPONSE)
+async def ping_reply_handler(self: ConnectionClient, payload: bytes):
+    self.logger.debug("Ping response")
+
+
 @ConnectionClient.handler(ConnectionCmd.MTU_RESPONSE)
-async def mtu_response_handler(self: ConnectionClient, payload: bytes):
+async def mtu_response_handler(self: ConnectionClient, payload: bytes) -> int:
     mtu = int.from_bytes(payload, "little")
     self.logger.info(f"MTU: {mtu}")
+    att_mtu = self.encoder.client.mtu_size
+    if mtu > att_mtu:
+        # larger chunks wouldn't fit in a write
+        self.logger.warning(
+            "Protocol MTU %i is above the ATT MTU %i, using %i",
+            mtu,
+            att_mtu,
+            att_mtu,
+        )
+        mtu = att_mtu
     self.encoder.m_mtu = mtu
+    return mtu
@@ -1,8 +1,17 @@
+from dataclasses import dataclass
+from datetime import datetime
 from enum import Enum
+from uuid import UUID
 
 from .base_handler import BaseHandler
+from .utils import OverflowPolicy, RealtimeStream, Subscription
+from ..chunked_decoder import ChunkedDecoder
+from ..chunked_encoder import ChunkedEncoder
 from ..chunked_endpoint import ChunkedEndpoint
 
+# standard Heart Rate Measurement characteristic
+CHARACTERISTIC_HR = UUID("00002a37-0000-1000-8000-00805f9b34fb")
+
 
 class HeartRateCmd(int, Enum):
     REALTIME_SET = 0x04
@@ -21,9 +30,50 @@ class SleepStatus(int, Enum):
     WAKE_UP = 0x00
 
 
+@dataclass(frozen=True)
+class HeartRateSample:
+    # arrival time, the measurement carries none
+    timestamp: datetime
+    heart_rate: int
+
+
+def parse_heart_rate(data: bytes) -> int:
+    # bit 0 of the flags selects an uint16 value
+    if data[0] & 0x01:
+        return int.from_bytes(data[1:3], "little")
+    return data[1]
+
+
 class HeartRateClient(BaseHandler):
     endpoint = ChunkedEndpoint.HEARTRATE
     encrypted = False
+    stream: RealtimeStream[HeartRateSample]
+
+    def __init__(self, encoder: ChunkedEncoder, decoder: ChunkedDecoder):
+        super().__init__(encoder, decoder)
+        self.stream = RealtimeStream()
+
+    def on_measurement(self, char, data: bytearray):
+        # called by bleak, must not block
+        sample = HeartRateSample(datetime.now().astimezone(), parse_heart_rate(data))
+        self.stream.publish_nowait(sample)
+
+    async def start_notify(self):
+        await self.encoder.client.start_notify(CHARACTERISTIC_HR, self.on_measurement)
+
+    async def stop_notify(self):
+        await self.encoder.client.stop_notify(CHARACTERISTIC_HR)
+
+    def subscribe(
+        self,
+        maxsize: int = 256,
+        policy: OverflowPolicy = OverflowPolicy.DROP_OLDEST,
+    ) -> Subscription[HeartRateSample]:
+        """
+        Realtime heart rate as an async iterator, `start_notify` and `start`
+        begin the measurement.
+        """
+        return self.stream.subscribe(maxsize, policy)
 
     async def start(self):
         await self.write(
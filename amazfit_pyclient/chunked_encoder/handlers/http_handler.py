@@ -1,7 +1,11 @@
+import asyncio
+import time
 from enum import Enum
+from typing import Optional
 
-from .base_handler import BaseHandler
-from .utils import WeatherServer
+from .base_handler import BaseHandler, RequestStats
+from .utils import CachedResponse, ResponseCache, Upstream, WeatherServer
+from .utils.response_cache import DEFAULT_TTL
 from ..chunked_endpoint import ChunkedEndpoint
 
 
@@ -22,39 +26,127 @@ def list_to_dict(lst):
     return res_dict
 
 
+DEFAULT_TIMEOUT = 10.0
+
+
 class HttpClient(BaseHandler):
+    """
+    Proxies the HTTP requests of watch apps to `upstream`, the local
+    `WeatherServer` unless `HttpUpstream` or another one is given.
+
+    Every request runs as its own task, at most `concurrency` of them talk
+    to the upstream at once and each gets `timeout` seconds from arrival
+    to response. Replies are written as requests finish, so a slow one
+    doesn't hold up the others. The app's headers are forwarded, GET
+    requests go through `cache`, which by default only keeps the weather.
+
+    Only GET is proxied: the request body layout isn't known, so other
+    methods are answered with an error instead of being forwarded without
+    their body.
+    """
+
     endpoint = ChunkedEndpoint.HTTP
     encrypted = True
-
-    def __init__(self, *args, **kwargs):
+    tasks: dict[int, asyncio.Task]
+
+    def __init__(
+        self,
+        *args,
+        upstream: Optional[Upstream] = None,
+        cache: Optional[ResponseCache] = None,
+        concurrency: int = 8,
+        timeout: float = DEFAULT_TIMEOUT,
+        **kwargs,
+    ):
         super().__init__(*args, **kwargs)
         self.weather = WeatherServer()
+        self.upstream = upstream or self.weather
+        self.cache = cache or ResponseCache(
+            self.upstream, ttls={"/weather/current": DEFAULT_TTL}
+        )
+        self.limit = asyncio.Semaphore(concurrency)
+        self.timeout = timeout
+        self.tasks = {}
+        self.proxy_stats = RequestStats()
+
+    def dispatch(
+        self, request_id: int, method: str, url: str, headers: dict = None
+    ) -> asyncio.Task:
+        # the watch reuses ids only for requests it gave up on
+        previous = self.tasks.pop(request_id, None)
+        if previous is not None:
+            previous.cancel()
+
+        task = asyncio.create_task(self.request(request_id, method, url, headers))
+        self.tasks[request_id] = task
+        task.add_done_callback(lambda t: self.finished(request_id, t))
+        return task
+
+    def finished(self, request_id: int, task: asyncio.Task):
+        if self.tasks.get(request_id) is task:
+            del self.tasks[request_id]
+        if not task.cancelled() and task.exception() is not None:
+            self.logger.error(
+                "Request %i failed", request_id, exc_info=task.exception()
+            )
+
+    async def fetch(self, url: str, headers: Optional[dict] = None) -> CachedResponse:
+        async with self.limit:
+            return await self.cache.get(url, headers)
 
     async def request(
         self, request_id: int, method: str, url: str, headers: dict = None
     ):
-        response = self.weather.get(url)
+        stats = self.proxy_stats
+        if method != "GET":
+            stats.failed += 1
+            self.logger.warning("%s %s is not supported", method, url)
+            await self.reply_http_fail(request_id)
+            return
+
+        start = time.monotonic()
+        try:
+            response = await asyncio.wait_for(self.fetch(url, headers), self.timeout)
+        except asyncio.TimeoutError:
+            stats.timeouts += 1
+            self.logger.warning("%s %s timed out", method, url)
+            await self.reply_http_fail(request_id)
+            return
+        except Exception as e:
+            stats.failed += 1
+            self.logger.warning("%s %s failed: %r", method, url, e)
+            await self.reply_http_fail(request_id)
+            return
+
+        latency = time.monotonic() - start
+        stats.completed += 1
+        stats.latency_total += latency
+        stats.latency_max = max(stats.latency_max, latency)
+
         self.logger.info(
-            f"{method} {url}[{response.status_code}] -> {response.content}"
+            "%s %s [%i] %i bytes",
+            method,
+            url,
+            response.status_code,
+            len(response.content),
         )
         if response.is_success:
-            await self.reply_http_success(
-                request_id, response.status_code, response.content
-            )
+            await self.reply_http_success(request_id, response)
         else:
             await self.reply_http_fail(request_id)
 
-    async def reply_http_success(self, request_id: int, status: int, content: bytes):
-        buf = bytes(
-            [
-                CMDType.RESPONSE,
-                request_id,
-                ResponseCode.SUCCESS,
-                status,
-            ]
-        ) + len(content).to_bytes(4, "little")
+    async def reply_http_success(self, request_id: int, response: CachedResponse):
+        # the frame after the request id is the same for every reply, the
+        # encrypted chunks are not: they carry the write handle and sequence
+        # number of the session
+        if response.frame is None:
+            response.frame = (
+                bytes([ResponseCode.SUCCESS, response.status_code])
+                + len(response.content).to_bytes(4, "little")
+                + response.content
+            )
 
-        await self.write(buf + content)
+        await self.write(bytes([CMDType.RESPONSE, request_id]) + response.frame)
 
     async def reply_http_fail(self, request_id: int):
         buf = bytes(
@@ -69,11 +161,24 @@ class HttpClient(BaseHandler):
 
         await self.write(buf)
 
+    def cancel(self):
+        """Drops all requests in flight, their replies can't be delivered"""
+        for task in self.tasks.values():
+            task.cancel()
+
+    async def close(self):
+        tasks = list(self.tasks.values())
+        self.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self.cache.close()
+        if hasattr(self.upstream, "aclose"):
+            await self.upstream.aclose()
+
 
 @HttpClient.handler(CMDType.REQUEST)
-async def request_handler(self: HttpClient, payload: bytes):
+async def request_handler(self: HttpClient, payload: memoryview):
     request_id = payload[1]
-    data = payload[1:]
+    data = bytes(payload[2:])
 
     head, metadata = data.split(b"\0\0\0\0", 1)
 
@@ -83,8 +188,8 @@ async def request_handler(self: HttpClient, payload: bytes):
     method = _method.decode("utf-8")
     url = _url.decode("utf-8")
 
-    headers = list_to_dict(headers_data[1:].split(b"\0"))
+    headers = list_to_dict([i.decode("utf-8") for i in headers_data[1:].split(b"\0")])
 
     assert len_headers == len(headers)
 
-    await self.request(request_id, method, url, headers)
+    self.dispatch(request_id, method, url, headers)
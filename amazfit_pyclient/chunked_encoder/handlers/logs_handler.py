@@ -1,6 +1,8 @@
 from enum import Enum
+from typing import Optional
 
 from .base_handler import BaseHandler
+from .utils import LogEntry, LogWriter, parse_log_entry
 from ..chunked_endpoint import ChunkedEndpoint
 
 
@@ -21,10 +23,34 @@ class LogsClient(BaseHandler):
     encrypted = False
     logs_type = None
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, writer: Optional[LogWriter] = None, **kwargs):
         self.sessions = set()
+        # index of the last entry of every session
+        self.indexes: dict[int, int] = {}
+        # entries the watch numbered but never sent
+        self.missed = 0
+        self.writer = writer
         super().__init__(*args, **kwargs)
 
+    def on_entry(self, entry: LogEntry):
+        last = self.indexes.get(entry.session_id)
+        if last is not None:
+            # the index is a single byte and wraps around
+            self.missed += (entry.index - last - 1) & 0xFF
+        self.indexes[entry.session_id] = entry.index
+
+        if self.writer is not None:
+            self.writer.submit(entry)
+        else:
+            self.logger.info(
+                "Log entry %i:%i - %s [%s] - %s",
+                entry.session_id,
+                entry.index,
+                entry.timestamp,
+                entry.app_id,
+                entry.message,
+            )
+
     async def request_capabilities(self):
         await self.write(
             bytes([CMDType.CAPABILITIES_REQUEST]),
@@ -57,6 +83,7 @@ async def logs_start_ack_handler(self: LogsClient, payload: bytes):
         raise Exception("Start logging failed")
     session_id = payload[1]
     self.sessions.add(session_id)
+    self.indexes.pop(session_id, None)
     self.logger.info("Start logging: %i", session_id)
 
 
@@ -67,19 +94,15 @@ async def logs_stop_ack_handler(self: LogsClient, payload: bytes):
 
 
 @LogsClient.handler(CMDType.LOGS_DATA)
-async def logs_data_handler(self: LogsClient, payload: bytes):
-    index = payload[1]
-    session_id = payload[0]
-
-    app_id, timestamp, data = payload.split(b"\0")
-    self.logger.info("Log entry - {} [{}] - {}", timestamp, app_id, data)
+async def logs_data_handler(self: LogsClient, payload: memoryview):
+    self.on_entry(parse_log_entry(payload))
 
 
 @LogsClient.handler(CMDType.CAPABILITIES_RESPONSE)
-async def capabilities_response_handler(self: LogsClient, payload: bytes):
+async def capabilities_response_handler(self: LogsClient, payload: memoryview):
     version = payload[0]
     var1 = payload[1]
     var2 = payload[2]
     assert [version, var1, var2] == [1, 1, 0]
-    self.logs_type = payload[3:].rstrip(b"\0").decode()
+    self.logs_type = bytes(payload[3:]).rstrip(b"\0").decode()
     self.logger.info(f"Logs type: {self.logs_type}")
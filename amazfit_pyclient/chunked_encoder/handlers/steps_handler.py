@@ -1,7 +1,14 @@
+import asyncio
 import struct
+from dataclasses import dataclass
+from datetime import datetime
 from enum import Enum
+from typing import Optional
 
-from .base_handler import BaseHandler
+from .base_handler import BaseHandler, DEFAULT_TIMEOUT
+from .utils import OverflowPolicy, RealtimeStream, Subscription
+from ..chunked_decoder import ChunkedDecoder
+from ..chunked_encoder import ChunkedEncoder
 from ..chunked_endpoint import ChunkedEndpoint
 
 
@@ -13,25 +20,88 @@ class StepsCmd(int, Enum):
     REALTIME_NOTIFICATION = 0x07
 
 
+@dataclass(frozen=True)
+class Steps:
+    steps: int
+    meters: int
+    calories: int
+
+
+@dataclass(frozen=True)
+class RealtimeSteps:
+    # arrival time
+    timestamp: datetime
+    steps: int
+    meters: int
+    calories: int
+
+
 class StepsClient(BaseHandler):
+    """
+    Realtime steps are handed to a publisher task, so a subscriber with the
+    BACKPRESSURE policy only holds up that task and never the endpoint's
+    handlers. When `max_pending` samples are already waiting for it, new
+    ones are dropped and counted in `dropped`.
+    """
+
     endpoint = ChunkedEndpoint.STEPS
     encrypted = False
+    stream: RealtimeStream[RealtimeSteps]
+    publisher: Optional[asyncio.Task] = None
+
+    def __init__(
+        self,
+        encoder: ChunkedEncoder,
+        decoder: ChunkedDecoder,
+        max_pending: int = 256,
+    ):
+        super().__init__(encoder, decoder)
+        self.stream = RealtimeStream()
+        self.pending_samples: asyncio.Queue[RealtimeSteps] = asyncio.Queue(max_pending)
+        self.dropped = 0
+
+    def publish(self, sample: RealtimeSteps):
+        if self.publisher is None:
+            self.publisher = asyncio.create_task(self.run_publisher())
+        try:
+            self.pending_samples.put_nowait(sample)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    async def run_publisher(self):
+        while True:
+            sample = await self.pending_samples.get()
+            await self.stream.publish(sample)
+
+    async def close(self):
+        if self.publisher is not None:
+            self.publisher.cancel()
+            await asyncio.gather(self.publisher, return_exceptions=True)
+            self.publisher = None
+        self.stream.close()
+
+    def subscribe(
+        self,
+        maxsize: int = 256,
+        policy: OverflowPolicy = OverflowPolicy.DROP_OLDEST,
+    ) -> Subscription[RealtimeSteps]:
+        """Realtime steps as an async iterator, `start` enables them"""
+        return self.stream.subscribe(maxsize, policy)
 
     async def start(self):
         await self.write(
             bytes([StepsCmd.ENABLE_REALTIME]),
         )
 
-    async def get_steps(self):
-        await self.write(
-            bytes([StepsCmd.GET]),
-        )
+    async def get_steps(self, timeout: float = DEFAULT_TIMEOUT) -> Steps:
+        return await self.query(bytes([StepsCmd.GET]), StepsCmd.REPLY, timeout)
 
 
 @StepsClient.handler(StepsCmd.REPLY)
-async def reply_handler(self: StepsClient, payload: bytes):
+async def reply_handler(self: StepsClient, payload: bytes) -> Steps:
     _, _, steps, meters, calories = struct.unpack("<BB3I", payload)
     self.logger.info(f"steps: {steps}, meters: {meters}, calories: {calories}")
+    return Steps(steps, meters, calories)
 
 
 @StepsClient.handler(StepsCmd.ENABLE_REALTIME_ACK)
@@ -45,5 +115,6 @@ async def enable_realtime_ack_handler(self: StepsClient, payload: bytes):
 
 @StepsClient.handler(StepsCmd.REALTIME_NOTIFICATION)
 async def realtime_notification_handler(self: StepsClient, payload: bytes):
-    data = struct.unpack("<Biii", payload)
-    self.logger.info(f"Realtime steps: {data}")
+    _, steps, meters, calories = struct.unpack("<Biii", payload)
+    self.logger.debug(f"Realtime steps: {steps}, {meters}, {calories}")
+    self.publish(RealtimeSteps(datetime.now().astimezone(), steps, meters, calories))
@@ -1 +1,5 @@
+from .http_upstream import HttpUpstream
+from .log_writer import LogEntry, LogStats, LogWriter, parse_log_entry
+from .realtime_stream import OverflowPolicy, RealtimeStream, Subscription
+from .response_cache import CachedResponse, ResponseCache, Upstream
 from .weather_server import WeatherServer
@@ -0,0 +1,52 @@
+from typing import Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import httpx
+
+DEFAULT_TIMEOUT = 10.0
+
+
+class HttpUpstream:
+    """
+    Forwards watch requests to the internet. All requests share one httpx
+    client, so connections to the same host are pooled and kept alive.
+
+    Needs the `http` extra.
+    """
+
+    _client: Optional["httpx.AsyncClient"] = None
+
+    def __init__(
+        self,
+        timeout: float = DEFAULT_TIMEOUT,
+        max_connections: int = 16,
+        **client_kwargs,
+    ):
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.client_kwargs = client_kwargs
+
+    @property
+    def client(self) -> "httpx.AsyncClient":
+        if self._client is None:
+            import httpx
+
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+                **self.client_kwargs,
+            )
+        return self._client
+
+    async def fetch(
+        self, url: str, method: str = "GET", headers: Optional[dict] = None
+    ) -> "httpx.Response":
+        return await self.client.request(method, url, headers=headers)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
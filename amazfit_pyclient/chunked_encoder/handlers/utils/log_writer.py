@@ -0,0 +1,232 @@
+import asyncio
+import gzip
+import logging
+import os
+import time
+from concurrent.futures import Executor
+from dataclasses import dataclass
+from datetime import datetime
+from functools import partial
+from typing import BinaryIO, Optional
+
+COMPRESSIONS = {
+    "gzip": ".gz",
+    "zstd": ".zst",
+}
+
+
+@dataclass(frozen=True)
+class LogEntry:
+    session_id: int
+    index: int
+    app_id: str
+    timestamp: str
+    message: str
+
+    def line(self) -> str:
+        # one line per entry, multi-line messages are escaped
+        message = self.message
+        if "\n" in message or "\r" in message:
+            message = message.replace("\r", "\\r").replace("\n", "\\n")
+        return (
+            f"{self.timestamp} {self.session_id}:{self.index} "
+            f"[{self.app_id}] {message}\n"
+        )
+
+
+def parse_log_entry(payload: bytes) -> LogEntry:
+    """
+    Parses a LOGS_DATA payload: session id, entry index, then app id,
+    timestamp and message as NUL terminated strings. The message is the rest
+    of the payload, NULs in it are kept as spaces.
+    """
+    session_id = payload[0]
+    index = payload[1]
+    app_id, timestamp, message = (bytes(payload[2:]).split(b"\0", 2) + [b"", b""])[:3]
+    message = message.rstrip(b"\0").replace(b"\0", b" ")
+    return LogEntry(
+        session_id,
+        index,
+        app_id.decode("utf-8", "replace"),
+        timestamp.decode("utf-8", "replace"),
+        message.decode("utf-8", "replace"),
+    )
+
+
+@dataclass
+class LogStats:
+    received: int = 0
+    written: int = 0
+    # entries of batches the writer couldn't keep up with
+    dropped: int = 0
+    batches: int = 0
+    files: int = 0
+    bytes_written: int = 0
+
+
+class LogWriter:
+    """
+    Writes log entries to compressed files in `directory` from a background
+    task.
+
+    `submit` only appends to the current batch, full batches are queued for
+    the writer, which formats, compresses and writes them on `executor`.
+    When `max_batches` are already waiting, the new batch is dropped and
+    counted instead of slowing the caller down. Partial batches are written
+    after `flush_interval` seconds. A new file is started when the current
+    one reached `max_bytes` compressed or is `max_age` seconds old.
+
+    "zstd" compression needs the `zstd` extra.
+    """
+
+    executor: Optional[Executor] = None
+
+    def __init__(
+        self,
+        directory: str,
+        prefix: str = "watch",
+        compression: str = "gzip",
+        level: Optional[int] = None,
+        max_bytes: int = 16 * 1024 * 1024,
+        max_age: float = 3600.0,
+        batch_size: int = 512,
+        max_batches: int = 64,
+        flush_interval: float = 1.0,
+    ):
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unknown compression: {compression}")
+        if compression == "zstd":
+            # fail here rather than in the writer task
+            import zstandard  # noqa: F401
+
+        self.directory = directory
+        self.prefix = prefix
+        self.compression = compression
+        self.level = level
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.batch: list[LogEntry] = []
+        # None stops the writer
+        self.queue: asyncio.Queue[Optional[list[LogEntry]]] = asyncio.Queue(max_batches)
+        self.stats = LogStats()
+        self.task: Optional[asyncio.Task] = None
+
+        self.path: Optional[str] = None
+        self.raw: Optional[BinaryIO] = None
+        self.file: Optional[BinaryIO] = None
+        self.opened = 0.0
+
+        self.logger = logging.getLogger(self.__class__.__qualname__)
+
+    def submit(self, entry: LogEntry):
+        self.stats.received += 1
+        self.batch.append(entry)
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Hands the current batch to the writer"""
+        if not self.batch:
+            return
+        batch, self.batch = self.batch, []
+        try:
+            self.queue.put_nowait(batch)
+        except asyncio.QueueFull:
+            self.stats.dropped += len(batch)
+
+    def start(self):
+        if self.task is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self.task = asyncio.create_task(self.run())
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                batch = await asyncio.wait_for(self.queue.get(), self.flush_interval)
+            except asyncio.TimeoutError:
+                self.flush()
+                if self.queue.empty() and self.due():
+                    await loop.run_in_executor(self.executor, self.close_file)
+                continue
+
+            if batch is None:
+                break
+            try:
+                await loop.run_in_executor(
+                    self.executor, partial(self.write_batch, batch)
+                )
+            except Exception as e:
+                self.stats.dropped += len(batch)
+                self.logger.error("Writing %i log entries failed: %r", len(batch), e)
+
+        await loop.run_in_executor(self.executor, self.close_file)
+
+    def due(self) -> bool:
+        """Whether the current file should be rotated"""
+        if self.file is None:
+            return False
+        return (
+            self.raw.tell() >= self.max_bytes
+            or time.monotonic() - self.opened >= self.max_age
+        )
+
+    def open_file(self):
+        now = datetime.now()
+        name = (
+            f"{self.prefix}-{now:%Y%m%d-%H%M%S}-{self.stats.files:04}"
+            f".log{COMPRESSIONS[self.compression]}"
+        )
+        self.path = os.path.join(self.directory, name)
+        self.raw = open(self.path, "wb")
+        if self.compression == "zstd":
+            import zstandard
+
+            level = 3 if self.level is None else self.level
+            compressor = zstandard.ZstdCompressor(level=level)
+            self.file = compressor.stream_writer(self.raw)
+        else:
+            level = 6 if self.level is None else self.level
+            self.file = gzip.GzipFile(fileobj=self.raw, mode="wb", compresslevel=level)
+        self.opened = time.monotonic()
+        self.stats.files += 1
+
+    def close_file(self):
+        if self.file is None:
+            return
+        self.file.close()
+        if not self.raw.closed:
+            self.raw.close()
+        self.file = self.raw = None
+
+    def write_batch(self, batch: list[LogEntry]):
+        if self.due():
+            self.close_file()
+        if self.file is None:
+            self.open_file()
+
+        data = "".join([entry.line() for entry in batch]).encode("utf-8")
+        self.file.write(data)
+        self.stats.written += len(batch)
+        self.stats.batches += 1
+        self.stats.bytes_written += len(data)
+
+    async def close(self):
+        """Writes what was submitted so far and stops the writer"""
+        if self.task is None:
+            return
+        if self.batch:
+            batch, self.batch = self.batch, []
+            await self.queue.put(batch)
+        await self.queue.put(None)
+        await self.task
+        self.task = None
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
@@ -0,0 +1,125 @@
+import asyncio
+from collections import deque
+from enum import Enum
+from typing import Generic, TypeVar
+
+T = TypeVar("T")
+
+
+class OverflowPolicy(str, Enum):
+    # a full buffer discards its oldest sample
+    DROP_OLDEST = "drop_oldest"
+    # `publish` waits until the subscriber made room, `publish_nowait`
+    # drops the new sample instead
+    BACKPRESSURE = "backpressure"
+
+
+class Subscription(Generic[T]):
+    """
+    One consumer of a `RealtimeStream`, iterate it with `async for`.
+
+    Samples are kept in a ring buffer of `maxsize`, so a slow consumer
+    never makes the buffer grow. `dropped` counts the samples it missed.
+    """
+
+    def __init__(
+        self, stream: "RealtimeStream[T]", maxsize: int, policy: OverflowPolicy
+    ):
+        self.stream = stream
+        self.maxsize = maxsize
+        self.policy = policy
+        self.buffer: deque[T] = deque(maxlen=maxsize)
+        self.ready = asyncio.Event()
+        self.space = asyncio.Event()
+        self.space.set()
+        self.closed = False
+        self.received = 0
+        self.dropped = 0
+
+    @property
+    def full(self) -> bool:
+        return len(self.buffer) >= self.maxsize
+
+    def put_nowait(self, item: T) -> bool:
+        if self.closed:
+            return False
+        if self.full:
+            self.dropped += 1
+            if self.policy == OverflowPolicy.BACKPRESSURE:
+                return False
+        self.buffer.append(item)
+        self.received += 1
+        self.ready.set()
+        if self.full:
+            self.space.clear()
+        return True
+
+    async def put(self, item: T) -> bool:
+        if self.policy == OverflowPolicy.BACKPRESSURE:
+            while self.full and not self.closed:
+                await self.space.wait()
+        return self.put_nowait(item)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> T:
+        while not self.buffer:
+            if self.closed:
+                raise StopAsyncIteration
+            self.ready.clear()
+            await self.ready.wait()
+
+        item = self.buffer.popleft()
+        self.space.set()
+        return item
+
+    def close(self):
+        """Stops the subscription, samples already buffered are still read"""
+        self.closed = True
+        self.ready.set()
+        self.space.set()
+        self.stream.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class RealtimeStream(Generic[T]):
+    """
+    Broadcasts samples to any number of independent subscriptions.
+    """
+
+    subscribers: list[Subscription[T]]
+
+    def __init__(self):
+        self.subscribers = []
+
+    def subscribe(
+        self,
+        maxsize: int = 256,
+        policy: OverflowPolicy = OverflowPolicy.DROP_OLDEST,
+    ) -> Subscription[T]:
+        subscription = Subscription(self, maxsize, OverflowPolicy(policy))
+        self.subscribers.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription[T]):
+        if subscription in self.subscribers:
+            self.subscribers.remove(subscription)
+
+    def publish_nowait(self, item: T):
+        """For callbacks that must not wait"""
+        for subscription in list(self.subscribers):
+            subscription.put_nowait(item)
+
+    async def publish(self, item: T):
+        for subscription in list(self.subscribers):
+            await subscription.put(item)
+
+    def close(self):
+        for subscription in list(self.subscribers):
+            subscription.close()
@@ -0,0 +1,166 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Optional, Protocol
+
+from yarl import URL
+
+DEFAULT_TTL = 600.0
+DEFAULT_MAX_ENTRIES = 256
+
+
+class Response(Protocol):
+    status_code: int
+    content: bytes
+
+    @property
+    def is_success(self) -> bool: ...
+
+
+class Upstream(Protocol):
+    async def fetch(
+        self, url: str, method: str = "GET", headers: Optional[dict] = None
+    ) -> Response: ...
+
+
+@dataclass
+class CachedResponse:
+    status_code: int
+    content: bytes
+    fetched: float = field(default_factory=time.monotonic)
+    # serialized protocol frame of the response, filled in by the first user
+    frame: Optional[bytes] = None
+
+    @property
+    def is_success(self):
+        return 100 < self.status_code < 300
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.fetched
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    refreshes: int = 0
+    errors: int = 0
+    # requests for URLs without a ttl, passed to the upstream
+    bypassed: int = 0
+
+
+class ResponseCache:
+    """
+    Keeps successful upstream responses of the URL paths in `ttls` for that
+    many seconds, of other URLs for `ttl` seconds if it's given. Requests
+    for URLs without a ttl go straight to the upstream.
+
+    An entry older than `refresh_after` of its ttl is still served, and
+    refreshed in the background so polls never wait for the upstream. Only
+    expired or missing entries are fetched in the foreground, concurrent
+    requests for the same URL share one fetch. When a fetch fails, an
+    expired entry is served rather than nothing. At most `max_entries`
+    responses are kept, the least recently fetched ones are dropped first.
+    """
+
+    entries: dict[str, CachedResponse]
+
+    def __init__(
+        self,
+        upstream: Upstream,
+        ttl: Optional[float] = None,
+        ttls: Optional[dict[str, float]] = None,
+        refresh_after: float = 0.8,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+    ):
+        self.upstream = upstream
+        self.ttl = ttl
+        self.ttls = ttls or {}
+        self.refresh_after = refresh_after
+        self.max_entries = max_entries
+        self.entries = {}
+        self.url_ttls: dict[str, Optional[float]] = {}
+        self.fetching: dict[str, asyncio.Task] = {}
+        self.stats = CacheStats()
+        self.logger = logging.getLogger(self.__class__.__qualname__)
+
+    def ttl_for(self, url: str) -> Optional[float]:
+        if url in self.url_ttls:
+            return self.url_ttls[url]
+        if len(self.url_ttls) >= self.max_entries:
+            self.url_ttls.pop(next(iter(self.url_ttls)))
+        ttl = self.url_ttls[url] = self.ttls.get(URL(url).path, self.ttl)
+        return ttl
+
+    async def get(self, url: str, headers: Optional[dict] = None) -> CachedResponse:
+        ttl = self.ttl_for(url)
+        if ttl is None:
+            self.stats.bypassed += 1
+            return await self.fetch(url, headers, store=False)
+
+        entry = self.entries.get(url)
+        if entry is not None:
+            age = entry.age
+            if age < ttl:
+                self.stats.hits += 1
+                if age >= ttl * self.refresh_after:
+                    self.refresh(url, headers)
+                return entry
+
+        self.stats.misses += 1
+        try:
+            return await asyncio.shield(self.refresh(url, headers))
+        except Exception:
+            if entry is None:
+                raise
+            self.logger.warning("Serving expired %s", url)
+            return entry
+
+    def refresh(self, url: str, headers: Optional[dict] = None) -> asyncio.Task:
+        """Fetches `url` in the background unless a fetch already runs"""
+        task = self.fetching.get(url)
+        if task is None:
+            task = self.fetching[url] = asyncio.create_task(self.fetch(url, headers))
+            task.add_done_callback(lambda t: self.fetched(url, t))
+        return task
+
+    def fetched(self, url: str, task: asyncio.Task):
+        self.fetching.pop(url, None)
+        if not task.cancelled():
+            # already logged, background refreshes have nobody to raise to
+            task.exception()
+
+    async def fetch(
+        self, url: str, headers: Optional[dict] = None, store: bool = True
+    ) -> CachedResponse:
+        try:
+            response = await self.upstream.fetch(url, headers=headers)
+        except Exception as e:
+            self.stats.errors += 1
+            self.logger.warning("Upstream failed for %s: %r", url, e)
+            raise
+
+        self.stats.refreshes += 1
+        entry = CachedResponse(response.status_code, bytes(response.content))
+        if store and entry.is_success:
+            self.entries.pop(url, None)
+            self.entries[url] = entry
+            while len(self.entries) > self.max_entries:
+                self.entries.pop(next(iter(self.entries)))
+        return entry
+
+    def invalidate(self, url: Optional[str] = None):
+        if url is None:
+            self.entries.clear()
+            self.url_ttls.clear()
+        else:
+            self.entries.pop(url, None)
+            self.url_ttls.pop(url, None)
+
+    async def close(self):
+        tasks = list(self.fetching.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
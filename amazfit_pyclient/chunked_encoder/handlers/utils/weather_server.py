@@ -1,6 +1,8 @@
+import asyncio
 import json
 from dataclasses import dataclass
 from enum import Enum
+from typing import Optional
 
 from yarl import URL
 
@@ -62,6 +64,23 @@ class FakeResponse:
 
 
 class WeatherServer:
+    """
+    Local stand-in for the weather upstream, `latency` seconds are added to
+    every async `fetch` and `requests` counts them.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.requests = 0
+
+    async def fetch(
+        self, url: str, method: str = "GET", headers: Optional[dict] = None
+    ):
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self.get(url)
+
     def get(self, url: str):
         _url = URL(url)
         if _url.path == "/weather/current":
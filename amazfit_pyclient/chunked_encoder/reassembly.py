@@ -0,0 +1,51 @@
+import time
+
+
+class Reassembly:
+    """
+    Reassembly state of one chunked message.
+
+    The buffer is allocated once from the length announced in the first chunk,
+    every following chunk is copied straight into it, so the cost of a message
+    is linear in its size.
+    """
+
+    __slots__ = (
+        "handle",
+        "endpoint",
+        "length",
+        "size",
+        "buffer",
+        "view",
+        "offset",
+        "updated",
+    )
+
+    def __init__(self, handle: int, endpoint: int, length: int, size: int):
+        self.handle = handle
+        self.endpoint = endpoint
+        # payload length announced by the first chunk
+        self.length = length
+        # bytes expected on the wire, padded to the AES block for encrypted data
+        self.size = size
+        self.buffer = bytearray(size)
+        self.view = memoryview(self.buffer)
+        self.offset = 0
+        self.updated = time.monotonic()
+
+    def write(self, data: memoryview) -> bool:
+        end = self.offset + len(data)
+        if end > self.size:
+            return False
+
+        self.view[self.offset : end] = data
+        self.offset = end
+        self.updated = time.monotonic()
+        return True
+
+    @property
+    def complete(self) -> bool:
+        return self.offset == self.size
+
+    def payload(self) -> memoryview:
+        return self.view.toreadonly()
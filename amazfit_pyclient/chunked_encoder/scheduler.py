@@ -0,0 +1,113 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional
+
+from .chunked_endpoint import ChunkedEndpoint
+
+DEFAULT_PRIORITY = 2
+
+DEFAULT_PRIORITIES = {
+    ChunkedEndpoint.AUTH: 0,
+    ChunkedEndpoint.CONNECT: 0,
+    ChunkedEndpoint.HEARTRATE: 1,
+    ChunkedEndpoint.STEPS: 1,
+    ChunkedEndpoint.HTTP: 3,
+    ChunkedEndpoint.LOGS: 3,
+}
+
+
+@dataclass
+class PriorityStats:
+    sent: int = 0
+    wait_total: float = 0.0
+    wait_max: float = 0.0
+
+    @property
+    def wait_avg(self) -> float:
+        return self.wait_total / self.sent if self.sent else 0.0
+
+
+class OutboundScheduler:
+    """
+    Orders outbound messages by endpoint priority (lower goes first).
+
+    Messages are never split, so a bulk message that is already being written
+    finishes first, but everything queued behind it is picked by priority and
+    then in submission order.
+    """
+
+    stats: dict[int, PriorityStats]
+
+    def __init__(self, priorities: Optional[dict[int, int]] = None):
+        self.priorities = {**DEFAULT_PRIORITIES, **(priorities or {})}
+        self.queue = []
+        self.counter = itertools.count()
+        self.wakeup = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self.stats = {}
+
+        self.logger = logging.getLogger(self.__class__.__qualname__)
+
+    def priority(self, endpoint: int) -> int:
+        return self.priorities.get(endpoint, DEFAULT_PRIORITY)
+
+    async def submit(self, endpoint: int, send: Callable[[], Awaitable[None]]):
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(
+            self.queue,
+            (
+                self.priority(endpoint),
+                next(self.counter),
+                time.monotonic(),
+                send,
+                future,
+            ),
+        )
+        self.wakeup.set()
+
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.sender())
+
+        await future
+
+    async def sender(self):
+        while True:
+            while not self.queue:
+                self.wakeup.clear()
+                await self.wakeup.wait()
+
+            priority, _, queued, send, future = heapq.heappop(self.queue)
+            if future.done():
+                continue
+
+            wait = time.monotonic() - queued
+            stats = self.stats.setdefault(priority, PriorityStats())
+            stats.sent += 1
+            stats.wait_total += wait
+            stats.wait_max = max(stats.wait_max, wait)
+
+            try:
+                await send()
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                if not future.done():
+                    future.set_result(None)
+
+    def pending(self) -> int:
+        return len(self.queue)
+
+    async def close(self):
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+        for *_, future in self.queue:
+            future.cancel()
+        self.queue.clear()
@@ -1,4 +1,7 @@
 from .data_fetch import DataFetch, FetchType
-from .fetch_activity import ActivitySample, FetchActivity
+from .fetch_activity import ActivityBatch, ActivitySample, FetchActivity
 from .fetch_logs import FetchLogs
-from .fetch_stress import FetchStress, StressSample
+from .fetch_schema import SchemaFetch
+from .fetch_scheduler import FetchScheduler, JobStats
+from .fetch_stress import FetchStress, StressBatch, StressSample
+from .schema import get_schema, RecordSchema, register_schema, SCHEMAS
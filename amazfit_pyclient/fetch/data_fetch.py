@@ -1,17 +1,44 @@
 import asyncio
 import struct
-from dataclasses import asdict, fields
-from datetime import datetime
+from bisect import bisect_right
+from concurrent.futures import Executor
+from contextlib import ExitStack
+from dataclasses import dataclass
+from datetime import datetime, timedelta
 from enum import Enum
-from io import BytesIO
+from functools import partial
 from logging import getLogger
 from pathlib import Path
-from typing import Iterator, Type
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Iterator,
+    Optional,
+    Type,
+    TYPE_CHECKING,
+)
 from uuid import UUID
 
 from bleak import BleakClient, BleakGATTCharacteristic
 
-from .utils import get_time_bytes, save_csv, TimeUnit, TimeUtils
+from .utils import (
+    Checkpoint,
+    Exporter,
+    get_exporter,
+    get_time_bytes,
+    RecordStream,
+    SampleBatch,
+    SampleBatcher,
+    SpoolBuffer,
+    TimeSeriesStore,
+    TimeUnit,
+    TimeUtils,
+)
+
+if TYPE_CHECKING:
+    from .schema import RecordSchema
+    from .utils.columnar import Columns
 
 
 class FetchType(int, Enum):
@@ -44,38 +71,132 @@ class ActivityDataCMD(int, Enum):
     ACK_ACTIVITY_DATA = 3
 
 
+@dataclass
+class LossStats:
+    packets: int = 0
+    lost_packets: int = 0
+    lost_bytes: int = 0
+    # repeated packets, with a counter just behind the expected one
+    out_of_order: int = 0
+
+    @property
+    def loss_rate(self) -> float:
+        total = self.packets + self.lost_packets
+        return self.lost_packets / total if total else 0.0
+
+
 class DataFetch:
     CHARACTERISTIC_ACTIVITY_METADATA = UUID("00000004-0000-3512-2118-0009af100700")
     CHARACTERISTIC_ACTIVITY_DATA = UUID("00000005-0000-3512-2118-0009af100700")
-    buffer: BytesIO
+    buffer: Optional[SpoolBuffer] = None
+    # transfers larger than this are spooled to a file in `spool_dir`
+    spool_threshold = 1 << 20
+    spool_dir: Optional[Path] = None
     counter: int
     global_counter: int
     expected_data_length: int
     start_timestamp: datetime
     fetch_type: FetchType
     in_progress: asyncio.Lock
+    # set once all data arrived and was acknowledged, before it's exported
+    transferred: asyncio.Event
+    # set once the data is exported or the fetch failed
+    finished: asyncio.Event
+    # why the fetch failed, None while it didn't
+    error: Optional[str] = None
+    received_bytes: int
+    # bytes of the transfer received or lost so far
+    position: int
+    # byte ranges of the transfer lost in transit, filled with 0xFF
+    gaps: list[tuple[int, int]]
+    loss: LossStats
+    # largest packet payload seen, estimates the size of lost packets
+    packet_size: int
+    # False when notifications are routed by a FetchScheduler
+    subscribed = False
+    # counters up to this far behind the expected one are taken as repeats,
+    # bursts of more than 256 - repeat_window lost packets can't be told
+    repeat_window = 8
+    # file I/O and parsing run here, None is the loop's default thread pool
+    executor: Optional[Executor] = None
 
     def __init__(self, client: BleakClient):
         self.client = client
         self.in_progress = asyncio.Lock()
+        self.transferred = asyncio.Event()
+        self.finished = asyncio.Event()
         self.log = getLogger(__name__)
 
     async def handle_activity_data(
         self, char: BleakGATTCharacteristic, data: bytearray
     ):
         data = bytes(data)
-        counter = data[0]
-        assert counter == (
-            self.counter
-        ), f"Unexpected counter: {counter} != {self.counter + 1}"
-
-        self.counter = self.counter + 1
-        if self.counter == 256:
-            self.global_counter += self.counter
-            self.counter = 0
+        # notifications arrive in order, a counter just behind the expected
+        # one is a repeated packet, any other jump a burst of lost ones
+        if 0 < (self.counter - data[0]) & 0xFF <= self.repeat_window:
+            self.loss.out_of_order += 1
+            self.log.warning(
+                f"Dropping repeated packet {data[0]}, expected {self.counter}"
+            )
+            return
+        # packets skipped since the last one, modulo the one byte counter
+        missing = (data[0] - self.counter) & 0xFF
+
+        self.packet_size = max(self.packet_size, len(data) - 1)
+        if missing:
+            self.on_gap(missing, missing * self.packet_size)
+        self.advance(missing + 1)
+
+        self.loss.packets += 1
+        self.received_bytes += len(data) - 1
+        self.position += len(data) - 1
+        self.on_data(data[1:])
+
+    def advance(self, packets: int):
+        self.counter += packets
+        while self.counter >= 256:
+            self.global_counter += 256
+            self.counter -= 256
             self.log.debug(f"Received {self.global_counter} packets")
 
-        self.buffer.write(data[1:])
+    def on_gap(self, packets: int, length: int):
+        """
+        Called for `packets` lost packets of about `length` bytes. They are
+        replaced by 0xFF bytes, so the data after them keeps its offset.
+        """
+        self.log.warning(
+            f"Lost {packets} packets after {self.global_counter + self.counter}, "
+            f"~{length} bytes at {self.position}"
+        )
+        self.gaps.append((self.position, self.position + length))
+        self.loss.lost_packets += packets
+        self.loss.lost_bytes += length
+        self.position += length
+        self.on_data(b"\xff" * length)
+
+    async def on_start(self):
+        pass
+
+    def on_data(self, data: bytes):
+        self.buffer.write(data)
+
+    async def on_abort(self):
+        pass
+
+    async def abort(self, error: str = "aborted"):
+        """
+        Ends a fetch that failed or will never complete, like after a dropped
+        link, so whoever waits for it can go on. `error` is kept in `error`.
+        """
+        if self.error is None:
+            self.error = error
+        try:
+            await self.on_abort()
+        finally:
+            if self.in_progress.locked():
+                self.in_progress.release()
+            self.transferred.set()
+            self.finished.set()
 
     async def handle_activity_metadata(
         self, char: BleakGATTCharacteristic, data: bytearray
@@ -89,7 +210,7 @@ class DataFetch:
             elif cmd == ActivityDataCMD.FETCH_DATA:
                 await self.handle_fetch_data_response(data)
         except Exception as e:
-            self.in_progress.release()
+            await self.abort(str(e) or repr(e))
             raise
 
     async def handle_start_date_response(self, data: bytes):
@@ -105,6 +226,7 @@ class DataFetch:
         self.log.info(
             f"Start date: {self.start_timestamp}, expected data length: {self.expected_data_length}, {hex(unknown)=}"
         )
+        await self.on_start()
         await self.client.write_gatt_char(
             self.CHARACTERISTIC_ACTIVITY_METADATA, bytes([DataCMD.FETCH_DATA])
         )
@@ -114,12 +236,22 @@ class DataFetch:
         data = data[1:]
         assert status == 0x01, f"Failed to fetch data: {hex(status)}: {data}"
         print(f"{data}")
+        missing = self.expected_data_length - self.position
+        if missing > 0:
+            # the last packets were lost, the counter can't tell
+            self.on_gap(-(-missing // max(self.packet_size, 1)), missing)
         self.buffer.seek(0)
-        self.in_progress.release()
-
-        await self.on_transaction_complete()
 
+        # the data stays on the watch, so acknowledging it before the export
+        # lets the next transfer start while this one is exported, a failure
+        # from here on ends up in `abort`
         await self.data_ack(True)
+        self.transferred.set()
+        try:
+            await self.on_transaction_complete()
+        finally:
+            self.in_progress.release()
+        self.finished.set()
 
     @property
     def path(self):
@@ -127,12 +259,19 @@ class DataFetch:
             f"{self.fetch_type.name.lower()}.{self.start_timestamp.isoformat()}.bin"
         )
 
+    async def run_blocking(self, func: Callable, *args) -> Any:
+        """
+        Runs `func` on `executor`, so notifications keep being handled while
+        a large transfer is exported.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(func, *args))
+
     async def on_transaction_complete(self):
         path = self.path
 
         path = path.with_suffix(".bin")
-        with open(path, "wb") as f:
-            f.write(self.buffer.getvalue())
+        await self.run_blocking(self.buffer.save, path)
 
         print(f"Saved to {path}")
 
@@ -143,13 +282,7 @@ class DataFetch:
             self.CHARACTERISTIC_ACTIVITY_METADATA, ack_bytes
         )
 
-    async def start(self, fetch_type: FetchType, since: datetime):
-        self.buffer = BytesIO()
-        self.counter = 0
-        self.global_counter = 0
-        self.fetch_type = fetch_type
-        await self.in_progress.acquire()
-
+    async def start_notify(self):
         await self.client.start_notify(
             self.CHARACTERISTIC_ACTIVITY_METADATA,
             self.handle_activity_metadata,
@@ -159,6 +292,30 @@ class DataFetch:
             self.CHARACTERISTIC_ACTIVITY_DATA,
             self.handle_activity_data,
         )
+        self.subscribed = True
+
+    async def start(self, fetch_type: FetchType, since: datetime):
+        await self.request(fetch_type, since)
+
+    async def request(self, fetch_type: FetchType, since: datetime):
+        if self.buffer is not None:
+            self.buffer.close()
+        self.buffer = SpoolBuffer(self.spool_threshold, self.spool_dir)
+        self.counter = 0
+        self.global_counter = 0
+        self.received_bytes = 0
+        self.position = 0
+        self.packet_size = 0
+        self.gaps = []
+        self.loss = LossStats()
+        self.fetch_type = fetch_type
+        self.error = None
+        self.transferred.clear()
+        self.finished.clear()
+        await self.in_progress.acquire()
+
+        if not self.subscribed:
+            await self.start_notify()
 
         await self.client.write_gatt_char(
             self.CHARACTERISTIC_ACTIVITY_METADATA,
@@ -169,22 +326,391 @@ class DataFetch:
 
 class CsvDataFetch(DataFetch):
     sample_type: Type
+    record_size: int
+    # sample fields besides the timestamp, as exporters take them
+    record_dtype: list[tuple[str, str]]
+    interval = timedelta(minutes=1)
+    # bytes in front of the first record
+    header = 0
+    batch_type: Type[SampleBatch]
+    # compiled decoders for the record layout
+    schema: "RecordSchema"
+
+    stream: RecordStream
+    # record ranges of the buffer without valid data, sorted
+    lost: list[tuple[int, int]]
+    # buffer bytes in front of this transfer's data
+    base: int
+    sinks: list[Callable[[Any], None]]
+    # queues of the `samples()` iterators and the sinks feeding them
+    subscribers: list[tuple[asyncio.Queue, Callable[[Any], None]]]
+    batchers: list[SampleBatcher]
+    # samples the `samples()` iterators were too slow for
+    dropped_samples: int
+    # blocking writes of full streaming batches and checkpoints, run in
+    # order by `writer` on the executor, None ends it
+    writes: asyncio.Queue
+    writer: Optional[asyncio.Task] = None
+    # data received since the last checkpoint
+    unsaved: list[bytes]
+
+    def __init__(
+        self,
+        client: BleakClient,
+        streaming: bool = False,
+        columnar: bool = False,
+        export_format: str = "csv",
+        batch_size: int = 65536,
+        checkpoint_dir: Optional[Path] = None,
+        checkpoint_every: int = 64,
+        store: Optional[TimeSeriesStore] = None,
+        device: Optional[str] = None,
+    ):
+        """
+        In streaming mode records are parsed as packets arrive and handed to
+        `sinks` (the exporter and `samples()` iterators) instead of being
+        collected until the end of the transfer.
+
+        In columnar mode the buffer is decoded with numpy (see `get_columns`)
+        instead of one sample object per record.
+
+        Samples are exported as `export_format` ("csv" or "parquet") in
+        batches of `batch_size` rows.
+
+        With `checkpoint_dir` the received data is saved there every
+        `checkpoint_every` packets, and a later `start` of the same fetch type
+        continues after the last complete record instead of downloading the
+        whole window again.
+
+        With `store` the samples are also upserted into that time-series
+        store under `device` (the client's address by default).
+        """
+        assert not (streaming and checkpoint_dir), "can't resume streaming fetches"
+        super().__init__(client)
+        self.streaming = streaming
+        self.columnar = columnar
+        self.exporter_type = get_exporter(export_format)
+        self.batch_size = batch_size
+        self.checkpoint_dir = checkpoint_dir
+        self.checkpoint_every = checkpoint_every
+        self.store = store
+        self.device = device
+        self.checkpoint: Optional[Checkpoint] = None
+        self.resume: Optional[dict] = None
+        self.lost = []
+        self.base = 0
+        self.sinks = []
+        self.subscribers = []
+        self.batchers = []
+        self.dropped_samples = 0
+        self.exit_stack = ExitStack()
 
     @property
     def path(self):
         return Path(
-            f"{self.fetch_type.name.lower()}.{self.start_timestamp.isoformat()}.csv"
+            f"{self.fetch_type.name.lower()}.{self.start_timestamp.isoformat()}"
+            f"{self.exporter_type.suffix}"
+        )
+
+    def open_exporter(self) -> Exporter:
+        return self.exporter_type(
+            self.path,
+            self.record_dtype,
+            self.start_timestamp.tzinfo,
+            {
+                "fetch_type": self.fetch_type.name,
+                "start_timestamp": self.start_timestamp.isoformat(),
+            },
+        )
+
+    def open_exporters(self, stack: ExitStack) -> list[Exporter]:
+        exporters = [stack.enter_context(self.open_exporter())]
+        if self.store is not None:
+            exporter = self.store.exporter(
+                self.device or self.client.address,
+                self.fetch_type.name.lower(),
+                self.record_dtype,
+                self.start_timestamp.tzinfo,
+            )
+            exporters.append(stack.enter_context(exporter))
+        return exporters
+
+    async def request(self, fetch_type: FetchType, since: datetime):
+        self.stream = RecordStream(self.record_size, self.header)
+        self.since = since
+        self.packets = 0
+        self.lost = []
+        self.base = 0
+        self.dropped_samples = 0
+        self.unsaved = []
+
+        if self.checkpoint_dir is not None:
+            self.checkpoint = Checkpoint(
+                Path(self.checkpoint_dir) / fetch_type.name.lower()
+            )
+            self.resume = await self.run_blocking(self.load_checkpoint, since)
+            if self.resume is not None:
+                since = self.resume["resume_from"]
+                self.log.info(f"Resuming {fetch_type.name} from {since}")
+
+        await super().request(fetch_type, since)
+
+    def load_checkpoint(self, since: datetime) -> Optional[dict]:
+        state = self.checkpoint.load()
+        if state is None:
+            return None
+
+        start = datetime.fromisoformat(state["start_timestamp"])
+        records = state["length"] // self.record_size
+        resume_from = start + records * self.interval
+        if not datetime.fromisoformat(state["since"]) <= since <= resume_from:
+            self.log.info("Checkpoint doesn't match the requested window")
+            self.checkpoint.reset()
+            return None
+
+        return {**state, "start": start, "resume_from": resume_from}
+
+    async def restore(self, state: dict):
+        """
+        Puts the checkpointed records in front of the new data. Records the
+        new transfer covers again are dropped from the old data, a gap between
+        them is filled with 0xFF records.
+        """
+        offset = (self.start_timestamp - state["start"]) // self.interval
+        if offset < 0:
+            self.log.warning("Watch restarted before the checkpoint, discarding it")
+            await self.run_blocking(self.checkpoint.reset)
+            return
+
+        kept = min(offset, state["length"] // self.record_size)
+        self.start_timestamp = state["start"]
+        self.lost = [
+            (first, min(last, kept))
+            for first, last in state.get("lost", [])
+            if first < kept
+        ]
+        if offset > kept:
+            self.mark_lost(kept, offset)
+
+        await self.run_blocking(
+            self.restore_data,
+            kept * self.record_size,
+            (offset - kept) * self.record_size,
+            self.checkpoint_state(),
         )
 
+    def restore_data(self, kept: int, fill: int, state: dict):
+        # the checkpoint keeps its first `kept` bytes, the fill follows them
+        for chunk in self.checkpoint.read(kept):
+            self.buffer.write(chunk)
+        self.buffer.write(b"\xff" * fill)
+        self.checkpoint.length = kept
+        self.checkpoint.append(b"\xff" * fill, state)
+
+    def checkpoint_state(self) -> dict:
+        return {
+            "since": self.since.isoformat(),
+            "start_timestamp": self.start_timestamp.isoformat(),
+            "counter": self.counter,
+            "global_counter": self.global_counter,
+            "lost": list(self.lost),
+        }
+
+    def save_checkpoint(self):
+        data = b"".join(self.unsaved)
+        self.unsaved = []
+        self.queue_write(partial(self.checkpoint.append, data, self.checkpoint_state()))
+
+    async def on_start(self):
+        if self.checkpoint is not None:
+            if self.resume is not None:
+                await self.restore(self.resume)
+            else:
+                await self.run_blocking(self.checkpoint.reset)
+        self.base = len(self.buffer)
+
+        if self.streaming:
+            self.batchers = [
+                SampleBatcher(
+                    exporter,
+                    self.sample_type,
+                    self.batch_size,
+                    partial(self.queue_batch, exporter),
+                )
+                for exporter in self.open_exporters(self.exit_stack)
+            ]
+            self.sinks.extend(self.batchers)
+        if self.streaming or self.checkpoint is not None:
+            self.writes = asyncio.Queue()
+            self.writer = asyncio.create_task(self.run_writes())
+
+    def queue_batch(self, exporter: Exporter, timestamp: list, columns: dict):
+        self.queue_write(partial(exporter.write, timestamp, columns))
+
+    def queue_write(self, write: Callable[[], Any]):
+        # called from the notification handler, which must not wait for I/O
+        self.writes.put_nowait(write)
+
+    async def run_writes(self):
+        while (write := await self.writes.get()) is not None:
+            await self.run_blocking(write)
+
+    async def close_writer(self):
+        """Waits for the queued writes and ends the writer"""
+        if self.writer is None:
+            return
+        self.writes.put_nowait(None)
+        writer, self.writer = self.writer, None
+        await writer
+
+    def on_data(self, data: bytes):
+        if not self.streaming:
+            super().on_data(data)
+            if self.checkpoint is not None:
+                self.unsaved.append(data)
+                self.packets += 1
+                if self.packets % self.checkpoint_every == 0:
+                    self.save_checkpoint()
+            return
+
+        for n, record in self.stream.feed(data):
+            if self.lost and self.is_lost(n):
+                continue
+            sample = self.schema.parse(n, record, self.start_timestamp)
+            if sample is not None:
+                for sink in self.sinks:
+                    sink(sample)
+
+    def mark_lost(self, first: int, last: int):
+        if self.lost and self.lost[-1][1] >= first:
+            first = self.lost.pop()[0]
+        self.lost.append((first, last))
+
+    def is_lost(self, n: int) -> bool:
+        i = bisect_right(self.lost, (n, float("inf"))) - 1
+        return i >= 0 and n < self.lost[i][1]
+
+    def on_gap(self, packets: int, length: int):
+        """
+        Marks the records overlapping the gap as lost, they are left out of
+        the samples and exports.
+        """
+        start = self.base + self.position - self.header
+        self.mark_lost(
+            start // self.record_size,
+            -(-(start + length) // self.record_size),
+        )
+        super().on_gap(packets, length)
+
     async def on_transaction_complete(self):
         path = self.path
-        _fields = [i.name for i in fields(self.sample_type)]
 
-        with save_csv(path, _fields) as writer:
-            for sample in self.get_samples():
-                writer.writerow(asdict(sample))
+        if self.streaming:
+            if self.stream.pending:
+                self.log.warning(
+                    f"Dropping {len(self.stream.pending)} bytes of a partial record"
+                )
+            try:
+                await self.close_stream()
+            finally:
+                self.end_subscribers()
+        else:
+            await self.close_writer()
+            await self.run_blocking(self.export)
+
+        if self.checkpoint is not None:
+            await self.run_blocking(self.checkpoint.reset)
+        # the data stays readable for get_samples() until the next request
+        self.buffer.unlink()
 
         print(f"Saved to {path}")
 
+    async def close_stream(self):
+        if self.writer is None:
+            return
+        for batcher in self.batchers:
+            batcher.flush()
+            self.sinks.remove(batcher)
+        self.batchers = []
+        try:
+            await self.close_writer()
+        finally:
+            await self.run_blocking(self.exit_stack.close)
+
+    def end_subscribers(self):
+        """Ends the `samples()` iterators, other sinks stay registered"""
+        for queue, sink in self.subscribers:
+            self.sinks.remove(sink)
+            queue.put_nowait(None)
+        self.subscribers = []
+
+    async def on_abort(self):
+        # exporters and the checkpoint get what arrived so far
+        try:
+            if self.streaming:
+                await self.close_stream()
+            else:
+                await self.close_writer()
+        finally:
+            self.end_subscribers()
+
+    def export(self):
+        with ExitStack() as stack:
+            exporters = self.open_exporters(stack)
+            if self.columnar:
+                columns = self.get_columns()
+                for exporter in exporters:
+                    exporter.write_columns(columns, self.batch_size)
+            else:
+                batchers = [
+                    SampleBatcher(exporter, self.sample_type, self.batch_size)
+                    for exporter in exporters
+                ]
+                for sample in self.get_samples():
+                    for batcher in batchers:
+                        batcher(sample)
+                for batcher in batchers:
+                    batcher.flush()
+
+    def samples(self, maxsize: int = 4096) -> AsyncIterator:
+        """
+        Yields samples as they are parsed, must be called before the transfer
+        completes. Only works in streaming mode.
+
+        At most `maxsize` samples wait for a slow consumer, the oldest one is
+        dropped for a new one then and counted in `dropped_samples`. The
+        iteration ends when the fetch completes or is aborted.
+        """
+        assert self.streaming, "samples() requires streaming mode"
+        # one more slot, so the end of the iteration always fits
+        queue = asyncio.Queue(maxsize + 1)
+
+        def sink(sample):
+            if queue.qsize() >= maxsize:
+                queue.get_nowait()
+                self.dropped_samples += 1
+            queue.put_nowait(sample)
+
+        self.sinks.append(sink)
+        self.subscribers.append((queue, sink))
+
+        async def _iter():
+            while (sample := await queue.get()) is not None:
+                yield sample
+
+        return _iter()
+
+    def get_columns(self) -> "Columns":
+        return self.schema.columns(
+            self.buffer.getbuffer(), self.start_timestamp, self.lost
+        )
+
+    def get_batch(self) -> SampleBatch:
+        return self.schema.batch(
+            self.buffer.getbuffer(), self.start_timestamp, self.lost, self.batch_type
+        )
+
     def get_samples(self) -> Iterator:
-        raise NotImplementedError()
+        return self.schema.samples(
+            self.buffer.getbuffer(), self.start_timestamp, self.lost
+        )
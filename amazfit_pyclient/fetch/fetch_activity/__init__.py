@@ -1 +1 @@
-from .data_fetcher import FetchActivity, ActivitySample
+from .data_fetcher import FetchActivity, ActivityBatch, ActivitySample
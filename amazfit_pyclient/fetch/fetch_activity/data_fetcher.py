@@ -1,8 +1,10 @@
 import struct
 from dataclasses import dataclass
-from datetime import datetime, timedelta
+from datetime import datetime
 
 from ..data_fetch import CsvDataFetch, FetchType
+from ..schema import RecordSchema, register_schema
+from ..utils import SampleBatch
 
 
 @dataclass(frozen=True)
@@ -22,18 +24,36 @@ class ActivitySample:
         return cls(timestamp, *struct.unpack("8B", data))
 
 
+ACTIVITY_SCHEMA = register_schema(
+    FetchType.ACTIVITY,
+    RecordSchema(
+        "activity",
+        (
+            ("kind", "u1"),
+            ("intensity", "u1"),
+            ("steps", "u1"),
+            ("heart_rate", "u1"),
+            ("retain", "u1"),
+            ("sleep", "u1"),
+            ("deep_sleep", "u1"),
+            ("rem_sleep", "u1"),
+        ),
+        sample_type=ActivitySample,
+    ),
+)
+
+
+class ActivityBatch(SampleBatch):
+    __slots__ = ()
+    sample_type = ActivitySample
+
+
 class FetchActivity(CsvDataFetch):
     sample_type = ActivitySample
+    batch_type = ActivityBatch
+    schema = ACTIVITY_SCHEMA
+    record_size = ACTIVITY_SCHEMA.record_size
+    record_dtype = ACTIVITY_SCHEMA.record_dtype
 
     async def start(self, since: datetime):
         await super().start(FetchType.ACTIVITY, since)
-
-    def get_samples(self):
-        def _iter(_buf):
-            while data := _buf.read(8):
-                yield data
-
-        for n, sample in enumerate(_iter(self.buffer)):
-            yield self.sample_type.parse(
-                self.start_timestamp + timedelta(minutes=1 * n), sample
-            )
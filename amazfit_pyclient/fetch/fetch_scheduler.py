@@ -0,0 +1,204 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from logging import getLogger
+from typing import Optional, Type
+
+from bleak import BleakClient, BleakGATTCharacteristic
+
+from .data_fetch import CsvDataFetch, DataFetch, FetchType
+from .fetch_activity import FetchActivity
+from .fetch_logs import FetchLogs
+from .fetch_schema import SchemaFetch
+from .fetch_stress import FetchStress
+from .schema import SCHEMAS
+
+FETCHERS: dict[FetchType, Type[DataFetch]] = {
+    FetchType.ACTIVITY: FetchActivity,
+    FetchType.DEBUG_LOGS: FetchLogs,
+    FetchType.STRESS_AUTOMATIC: FetchStress,
+}
+
+
+@dataclass
+class JobStats:
+    fetch_type: FetchType
+    since: datetime
+    received_bytes: int = 0
+    # received packets, the lost ones are counted in lost_packets
+    packets: int = 0
+    lost_packets: int = 0
+    lost_bytes: int = 0
+    started: float = 0.0
+    finished: float = 0.0
+    error: Optional[str] = None
+
+    @property
+    def duration(self) -> float:
+        return self.finished - self.started
+
+    @property
+    def throughput(self) -> float:
+        """Bytes per second"""
+        return self.received_bytes / self.duration if self.duration else 0.0
+
+
+class FetchScheduler:
+    """
+    Runs several fetches back to back on one notification subscription.
+
+    Packets of the metadata/data characteristics are routed to the fetcher of
+    the job in progress. Types without a fetcher in `fetchers` are parsed by
+    `SchemaFetch` if they have a record schema and saved raw by `DataFetch`
+    otherwise. `fetcher_kwargs` are passed to the `CsvDataFetch` ones.
+
+    The next job is requested as soon as the data of the previous one is
+    acknowledged, its export runs meanwhile.
+
+    A job is given up when no notification arrived for `idle_timeout`
+    seconds or, with `job_timeout`, when its transfer took longer than that.
+    It is aborted, the timeout recorded in its `error` and the next job
+    started. Failures of the fetch itself, like the watch refusing the
+    request, are recorded there as well.
+    """
+
+    current: Optional[DataFetch] = None
+    subscribed = False
+    # loop time of the last notification
+    last_activity = 0.0
+
+    def __init__(
+        self,
+        client: BleakClient,
+        fetchers: Optional[dict[FetchType, Type[DataFetch]]] = None,
+        fetcher_kwargs: Optional[dict] = None,
+        idle_timeout: float = 30.0,
+        job_timeout: Optional[float] = None,
+    ):
+        self.client = client
+        self.fetchers = {**FETCHERS, **(fetchers or {})}
+        self.fetcher_kwargs = fetcher_kwargs or {}
+        self.idle_timeout = idle_timeout
+        self.job_timeout = job_timeout
+        self.log = getLogger(__name__)
+
+    def touch(self):
+        self.last_activity = asyncio.get_running_loop().time()
+
+    async def handle_activity_metadata(
+        self, char: BleakGATTCharacteristic, data: bytearray
+    ):
+        self.touch()
+        if self.current is None:
+            self.log.warning(f"Metadata without a fetch in progress: {bytes(data)}")
+            return
+        fetch = self.current
+        try:
+            await fetch.handle_activity_metadata(char, data)
+        except Exception as e:
+            # the fetch is aborted and keeps the error for the job's stats
+            self.log.error(f"{fetch.fetch_type.name} failed: {e!r}")
+
+    async def handle_activity_data(
+        self, char: BleakGATTCharacteristic, data: bytearray
+    ):
+        self.touch()
+        if self.current is None:
+            self.log.warning("Data without a fetch in progress")
+            return
+        await self.current.handle_activity_data(char, data)
+
+    async def start_notify(self):
+        await self.client.start_notify(
+            DataFetch.CHARACTERISTIC_ACTIVITY_METADATA,
+            self.handle_activity_metadata,
+        )
+        await self.client.start_notify(
+            DataFetch.CHARACTERISTIC_ACTIVITY_DATA,
+            self.handle_activity_data,
+        )
+        self.subscribed = True
+
+    def create_fetcher(self, fetch_type: FetchType) -> DataFetch:
+        fetcher = self.fetchers.get(fetch_type)
+        if fetcher is not None:
+            kwargs = self.fetcher_kwargs if issubclass(fetcher, CsvDataFetch) else {}
+            fetch = fetcher(self.client, **kwargs)
+        elif fetch_type in SCHEMAS:
+            fetch = SchemaFetch(self.client, fetch_type, **self.fetcher_kwargs)
+        else:
+            fetch = DataFetch(self.client)
+        fetch.subscribed = True
+        return fetch
+
+    async def wait_transferred(self, fetch: DataFetch):
+        """Waits for the data of `fetch`, raises TimeoutError when it stalls"""
+        loop = asyncio.get_running_loop()
+        self.touch()
+        deadline = None
+        if self.job_timeout is not None:
+            deadline = loop.time() + self.job_timeout
+
+        while not fetch.transferred.is_set():
+            timeout = self.last_activity + self.idle_timeout - loop.time()
+            if deadline is not None:
+                timeout = min(timeout, deadline - loop.time())
+            if timeout <= 0:
+                if deadline is not None and loop.time() >= deadline:
+                    raise asyncio.TimeoutError(
+                        f"not finished after {self.job_timeout}s"
+                    )
+                raise asyncio.TimeoutError(f"no data for {self.idle_timeout}s")
+            try:
+                await asyncio.wait_for(fetch.transferred.wait(), timeout)
+            except asyncio.TimeoutError:
+                # notifications may have arrived meanwhile
+                pass
+
+    async def transfer(
+        self, fetch_type: FetchType, since: datetime
+    ) -> tuple[DataFetch, JobStats]:
+        """Runs the transfer of a job, its export may still be running"""
+        stats = JobStats(fetch_type, since, started=time.perf_counter())
+        fetch = self.current = self.create_fetcher(fetch_type)
+        try:
+            await fetch.request(fetch_type, since)
+            await self.wait_transferred(fetch)
+        except asyncio.TimeoutError as e:
+            self.log.error(f"{fetch_type.name} timed out: {e}")
+            await fetch.abort(f"timeout: {e}")
+        except Exception as e:
+            self.log.exception(f"{fetch_type.name} failed: {e}")
+            await fetch.abort(str(e))
+        finally:
+            self.current = None
+        return fetch, stats
+
+    async def complete(self, fetch: DataFetch, stats: JobStats) -> JobStats:
+        """Waits for the export of a transferred job"""
+        await fetch.finished.wait()
+        stats.finished = time.perf_counter()
+        stats.error = fetch.error
+        stats.received_bytes = fetch.received_bytes
+        stats.packets = fetch.loss.packets
+        stats.lost_packets = fetch.loss.lost_packets
+        stats.lost_bytes = fetch.loss.lost_bytes
+        self.log.info(
+            f"{stats.fetch_type.name}: {stats.received_bytes} bytes in "
+            f"{stats.duration:.2f}s ({stats.throughput:.0f} B/s)"
+        )
+        return stats
+
+    async def run_job(self, fetch_type: FetchType, since: datetime) -> JobStats:
+        return await self.complete(*await self.transfer(fetch_type, since))
+
+    async def run(self, jobs: list[tuple[FetchType, datetime]]) -> list[JobStats]:
+        if not self.subscribed:
+            await self.start_notify()
+
+        exports = []
+        for fetch_type, since in jobs:
+            fetch, stats = await self.transfer(fetch_type, since)
+            exports.append(asyncio.create_task(self.complete(fetch, stats)))
+        return list(await asyncio.gather(*exports))
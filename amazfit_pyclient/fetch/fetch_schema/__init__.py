@@ -0,0 +1 @@
+from .data_fetcher import SchemaFetch
@@ -0,0 +1,31 @@
+from datetime import datetime
+
+from bleak import BleakClient
+
+from ..data_fetch import CsvDataFetch, FetchType
+from ..schema import get_schema
+
+
+class SchemaFetch(CsvDataFetch):
+    """
+    Fetches and exports any type with a registered `RecordSchema`.
+    """
+
+    def __init__(self, client: BleakClient, fetch_type: FetchType, **kwargs):
+        schema = get_schema(fetch_type)
+        assert not (
+            kwargs.get("checkpoint_dir")
+            and (schema.explicit_timestamp or schema.header)
+        ), "can only resume records at a fixed interval"
+        super().__init__(client, **kwargs)
+        self.type = fetch_type
+        self.schema = schema
+        self.sample_type = schema.sample
+        self.batch_type = schema.batch_type
+        self.record_size = schema.record_size
+        self.record_dtype = schema.record_dtype
+        self.interval = schema.interval
+        self.header = schema.header
+
+    async def start(self, since: datetime):
+        await super().start(self.type, since)
@@ -1 +1 @@
-from .data_fetcher import FetchStress, StressSample
+from .data_fetcher import FetchStress, StressBatch, StressSample
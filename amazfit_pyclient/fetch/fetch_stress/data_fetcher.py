@@ -1,7 +1,9 @@
 from dataclasses import dataclass
-from datetime import datetime, timedelta
+from datetime import datetime
 
 from ..data_fetch import CsvDataFetch, FetchType
+from ..schema import RecordSchema, register_schema
+from ..utils import SampleBatch
 
 
 @dataclass(frozen=True)
@@ -14,15 +16,28 @@ class StressSample:
         return cls(timestamp, data)
 
 
+STRESS_SCHEMA = register_schema(
+    FetchType.STRESS_AUTOMATIC,
+    RecordSchema(
+        "stress_automatic",
+        (("stress", "u1"),),
+        sentinel=("stress", 0xFF),
+        sample_type=StressSample,
+    ),
+)
+
+
+class StressBatch(SampleBatch):
+    __slots__ = ()
+    sample_type = StressSample
+
+
 class FetchStress(CsvDataFetch):
     sample_type = StressSample
+    batch_type = StressBatch
+    schema = STRESS_SCHEMA
+    record_size = STRESS_SCHEMA.record_size
+    record_dtype = STRESS_SCHEMA.record_dtype
 
     async def start(self, since: datetime):
         await super().start(FetchType.STRESS_AUTOMATIC, since)
-
-    def get_samples(self):
-        for n, sample in enumerate(self.buffer.getvalue()):
-            if sample != 0xFF:
-                yield self.sample_type.parse(
-                    self.start_timestamp + timedelta(minutes=1 * n), sample
-                )
@@ -0,0 +1,312 @@
+import struct
+from array import array
+from dataclasses import dataclass, make_dataclass
+from datetime import datetime, timedelta
+from functools import cached_property
+from itertools import compress
+from typing import Iterator, Optional, Sequence, Type, TYPE_CHECKING
+
+from .data_fetch import FetchType
+from .utils import SampleBatch
+from .utils.sample_batch import TYPECODES
+
+if TYPE_CHECKING:
+    from .utils.columnar import Columns
+
+TIMESTAMP = "timestamp"
+# records unpacked at once, bounds the memory of decoding a large buffer
+CHUNK = 4096
+
+
+@dataclass(frozen=True)
+class RecordSchema:
+    """
+    Layout of the fixed-size records of one fetch type.
+
+    `fields` are `(name, dtype)` pairs in record order, dtypes as in
+    `record_dtype` plus `"V<n>"` for n unused bytes. A field named
+    "timestamp" holds unix epoch seconds, without it record n is
+    `start + n * interval`. Records where the `sentinel` field has the
+    sentinel value are missing samples, `header` bytes in front of the
+    first record are skipped.
+
+    The layout is compiled once into a `struct.Struct` for `samples()` and
+    `batch()` and a numpy dtype for `columns()`.
+    """
+
+    name: str
+    fields: tuple[tuple[str, str], ...]
+    sentinel: Optional[tuple[str, int]] = None
+    interval: timedelta = timedelta(minutes=1)
+    header: int = 0
+    sample_type: Optional[Type] = None
+
+    @cached_property
+    def struct(self) -> struct.Struct:
+        codes = (
+            f"{dtype[1:]}x" if dtype.startswith("V") else TYPECODES[dtype]
+            for _, dtype in self.fields
+        )
+        return struct.Struct("<" + "".join(codes))
+
+    @property
+    def record_size(self) -> int:
+        return self.struct.size
+
+    @cached_property
+    def names(self) -> list[str]:
+        """Names of the unpacked values, padding excluded"""
+        return [name for name, dtype in self.fields if not dtype.startswith("V")]
+
+    @cached_property
+    def record_dtype(self) -> list[tuple[str, str]]:
+        """Sample fields besides the timestamp, as exporters take them"""
+        return [
+            (name, dtype)
+            for name, dtype in self.fields
+            if name != TIMESTAMP and not dtype.startswith("V")
+        ]
+
+    @property
+    def explicit_timestamp(self) -> bool:
+        return TIMESTAMP in self.names
+
+    @cached_property
+    def sentinel_index(self) -> Optional[int]:
+        """Position of the sentinel field in an unpacked record"""
+        if self.sentinel is None:
+            return None
+        return self.names.index(self.sentinel[0])
+
+    @cached_property
+    def timestamp_index(self) -> Optional[int]:
+        return self.names.index(TIMESTAMP) if self.explicit_timestamp else None
+
+    @cached_property
+    def value_indexes(self) -> tuple[int, ...]:
+        """Positions of the sample fields besides the timestamp"""
+        return tuple(i for i, name in enumerate(self.names) if name != TIMESTAMP)
+
+    @cached_property
+    def sample(self) -> Type:
+        if self.sample_type is not None:
+            return self.sample_type
+
+        name = "".join(i.capitalize() for i in self.name.split("_")) + "Sample"
+        return make_dataclass(
+            name,
+            [(TIMESTAMP, datetime), *((n, int) for n, _ in self.record_dtype)],
+            frozen=True,
+        )
+
+    def records(self, data: bytes) -> memoryview:
+        data = memoryview(data)[self.header :]
+        return data[: len(data) // self.record_size * self.record_size]
+
+    def chunks(
+        self, data: bytes, lost: Sequence[tuple[int, int]] = ()
+    ) -> Iterator[tuple[Sequence[int], list[tuple]]]:
+        """
+        Record numbers and values of the records that are neither sentinels
+        nor in the `[first, last)` ranges of `lost`, unpacked `CHUNK` records
+        at a time.
+        """
+        records = self.records(data)
+        size = self.record_size
+        total = len(records) // size
+        index = self.sentinel_index
+        value = self.sentinel[1] if index is not None else None
+        for first in range(0, total, CHUNK):
+            last = min(first + CHUNK, total)
+            rows = list(self.struct.iter_unpack(records[first * size : last * size]))
+            keep = None
+            if index is not None:
+                keep = [row[index] != value for row in rows]
+            for lo, hi in lost:
+                if lo < last and hi > first:
+                    if keep is None:
+                        keep = [True] * len(rows)
+                    lo, hi = max(lo, first) - first, min(hi, last) - first
+                    keep[lo:hi] = [False] * (hi - lo)
+
+            numbers = range(first, last)
+            if keep is not None:
+                numbers = list(compress(numbers, keep))
+                rows = list(compress(rows, keep))
+            yield numbers, rows
+
+    def samples(
+        self,
+        data: bytes,
+        start: datetime,
+        lost: Sequence[tuple[int, int]] = (),
+    ) -> Iterator:
+        sample = self.sample
+        if self.explicit_timestamp:
+            index = self.timestamp_index
+            values = self.value_indexes
+            tz = start.tzinfo
+            for _, rows in self.chunks(data, lost):
+                for row in rows:
+                    yield sample(
+                        datetime.fromtimestamp(row[index], tz),
+                        *(row[i] for i in values),
+                    )
+        else:
+            interval = self.interval
+            for numbers, rows in self.chunks(data, lost):
+                for n, row in zip(numbers, rows):
+                    yield sample(start + n * interval, *row)
+
+    def parse(self, n: int, data: memoryview, start: datetime) -> Optional[object]:
+        """Parses record `n` on its own, for streaming"""
+        row = self.struct.unpack(data)
+        index = self.sentinel_index
+        if index is not None and row[index] == self.sentinel[1]:
+            return None
+
+        index = self.timestamp_index
+        if index is None:
+            return self.sample(start + n * self.interval, *row)
+        return self.sample(
+            datetime.fromtimestamp(row[index], start.tzinfo),
+            *(row[i] for i in self.value_indexes),
+        )
+
+    @cached_property
+    def numpy_dtype(self):
+        import numpy as np
+
+        offsets = []
+        offset = 0
+        for name, dtype in self.fields:
+            offsets.append(offset)
+            offset += np.dtype(dtype).itemsize
+        return np.dtype(
+            {
+                "names": self.names,
+                "formats": [d for _, d in self.fields if not d.startswith("V")],
+                "offsets": [
+                    o
+                    for o, (_, d) in zip(offsets, self.fields)
+                    if not d.startswith("V")
+                ],
+                "itemsize": self.record_size,
+            }
+        )
+
+    def columns(
+        self,
+        data: bytes,
+        start: datetime,
+        lost: Sequence[tuple[int, int]] = (),
+    ) -> "Columns":
+        import numpy as np
+
+        from .utils.columnar import Columns
+
+        records = np.frombuffer(self.records(data), dtype=self.numpy_dtype)
+        if self.explicit_timestamp:
+            timestamp = records[TIMESTAMP].astype(np.int64)
+        else:
+            timestamp = int(start.timestamp()) + np.arange(
+                len(records), dtype=np.int64
+            ) * int(self.interval.total_seconds())
+
+        mask = np.ones(len(records), dtype=bool)
+        if self.sentinel is not None:
+            name, value = self.sentinel
+            mask &= records[name] != value
+        for first, last in lost:
+            mask[first:last] = False
+
+        return Columns(
+            timestamp=timestamp[mask],
+            columns={name: records[name][mask] for name, _ in self.record_dtype},
+            tz=start.tzinfo,
+        )
+
+    @cached_property
+    def batch_type(self) -> Type[SampleBatch]:
+        return type(
+            self.sample.__name__.replace("Sample", "Batch"),
+            (SampleBatch,),
+            {
+                "__slots__": (),
+                "sample_type": self.sample,
+            },
+        )
+
+    def batch(
+        self,
+        data: bytes,
+        start: datetime,
+        lost: Sequence[tuple[int, int]] = (),
+        batch_type: Optional[Type[SampleBatch]] = None,
+    ) -> SampleBatch:
+        dtypes = dict(self.fields)
+        columns = {name: array(TYPECODES[dtypes[name]]) for name in self.names}
+        offsets = array("I")
+        for numbers, rows in self.chunks(data, lost):
+            offsets.extend(numbers)
+            for column, values in zip(columns.values(), zip(*rows)):
+                column.extend(values)
+
+        if len(offsets) == len(self.records(data)) // self.record_size:
+            offsets = None
+        if self.explicit_timestamp:
+            # samples are located by their own timestamps
+            offsets = None
+            columns = {TIMESTAMP: columns.pop(TIMESTAMP), **columns}
+        return (batch_type or self.batch_type)(start, self.interval, columns, offsets)
+
+
+SCHEMAS: dict[FetchType, RecordSchema] = {}
+
+
+def register_schema(fetch_type: FetchType, schema: RecordSchema) -> RecordSchema:
+    SCHEMAS[fetch_type] = schema
+    return schema
+
+
+def get_schema(fetch_type: FetchType) -> RecordSchema:
+    try:
+        return SCHEMAS[fetch_type]
+    except KeyError:
+        raise ValueError(f"No record schema for {fetch_type.name}") from None
+
+
+# Layouts of the types read with explicit timestamps, as the Huami fetch
+# operations of Gadgetbridge parse them. MAX_HEART_RATE and
+# SLEEP_RESPIRATORY_RATE share their values with SPORTS_DETAILS and
+# SPORTS_SUMMARIES, so they can't be told apart by type and are left out.
+register_schema(
+    FetchType.MANUAL_HEART_RATE,
+    RecordSchema(
+        "manual_heart_rate",
+        (("timestamp", "u4"), ("utc_offset", "i1"), ("heart_rate", "u1")),
+    ),
+)
+register_schema(
+    FetchType.RESTING_HEART_RATE,
+    RecordSchema(
+        "resting_heart_rate",
+        (("timestamp", "u4"), ("heart_rate", "u1")),
+    ),
+)
+register_schema(
+    FetchType.STRESS_MANUAL,
+    RecordSchema(
+        "stress_manual",
+        (("timestamp", "u4"), ("stress", "u1")),
+    ),
+)
+register_schema(
+    FetchType.SPO2_NORMAL,
+    RecordSchema(
+        "spo2_normal",
+        (("timestamp", "u4"), ("spo2", "u1"), ("unknown", "V60")),
+        # format version
+        header=1,
+    ),
+)
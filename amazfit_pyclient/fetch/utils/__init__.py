@@ -1,2 +1,8 @@
+from .checkpoint import Checkpoint
 from .csv_helper import save_csv
+from .export import CsvExporter, Exporter, get_exporter, SampleBatcher
+from .record_stream import RecordStream
+from .sample_batch import SampleBatch, SampleView
+from .spool_buffer import SpoolBuffer
+from .store import StoreExporter, TimeSeriesStore
 from .timeutils import get_time_bytes, TimeUnit, TimeUtils
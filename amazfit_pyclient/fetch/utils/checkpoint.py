@@ -0,0 +1,55 @@
+import json
+import os
+from pathlib import Path
+from typing import Iterator, Optional
+
+
+class Checkpoint:
+    """
+    Spool file with the bytes received so far plus a json state file.
+
+    The state is replaced atomically after the data it describes has been
+    written, so `length` never points past what is on disk. All methods
+    block on file I/O.
+    """
+
+    def __init__(self, path: Path):
+        self.data_path = path.with_suffix(".partial.bin")
+        self.state_path = path.with_suffix(".partial.json")
+        self.length = 0
+
+    def load(self) -> Optional[dict]:
+        try:
+            state = json.loads(self.state_path.read_text())
+            size = self.data_path.stat().st_size
+        except (FileNotFoundError, ValueError):
+            return None
+
+        if size < state["length"]:
+            return None
+        return state
+
+    def read(self, length: int, chunk_size: int = 1 << 20) -> Iterator[bytes]:
+        with open(self.data_path, "rb") as f:
+            while length > 0 and (chunk := f.read(min(length, chunk_size))):
+                length -= len(chunk)
+                yield chunk
+
+    def reset(self):
+        self.data_path.unlink(missing_ok=True)
+        self.state_path.unlink(missing_ok=True)
+        self.length = 0
+
+    def append(self, data: bytes, state: dict):
+        """Writes `data` after the first `length` bytes, then `state`"""
+        mode = "ab" if self.length else "wb"
+        with open(self.data_path, mode) as f:
+            f.truncate(self.length)
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        self.length += len(data)
+
+        tmp = self.state_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({**state, "length": self.length}))
+        os.replace(tmp, self.state_path)
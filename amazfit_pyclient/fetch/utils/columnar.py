@@ -0,0 +1,31 @@
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Iterator
+
+import numpy as np
+
+
+@dataclass
+class Columns:
+    """
+    Samples of one fetch as numpy columns. `timestamp` holds unix epoch
+    seconds, `tz` the timezone the watch reported them in.
+    """
+
+    timestamp: np.ndarray
+    columns: dict[str, np.ndarray]
+    tz: timezone
+
+    def __len__(self):
+        return len(self.timestamp)
+
+    @property
+    def names(self) -> list[str]:
+        return ["timestamp", *self.columns]
+
+    def datetimes(self) -> Iterator[datetime]:
+        for ts in self.timestamp.tolist():
+            yield datetime.fromtimestamp(ts, self.tz)
+
+    def rows(self) -> Iterator[tuple]:
+        return zip(self.datetimes(), *(i.tolist() for i in self.columns.values()))
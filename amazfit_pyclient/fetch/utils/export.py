@@ -0,0 +1,121 @@
+import csv
+from dataclasses import fields
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Optional, Sequence, Type, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .columnar import Columns
+
+
+class Exporter:
+    """
+    Writes fetched samples to a file in batches of columns: epoch second
+    timestamps plus one sequence per record field.
+    """
+
+    suffix: str
+
+    def __init__(
+        self,
+        path: Path,
+        record_dtype: list[tuple[str, str]],
+        tz: timezone,
+        metadata: dict[str, str],
+    ):
+        self.path = path
+        self.record_dtype = record_dtype
+        self.tz = tz
+        self.metadata = metadata
+
+    @property
+    def names(self) -> list[str]:
+        return ["timestamp", *(name for name, _ in self.record_dtype)]
+
+    def write(self, timestamp: Sequence[int], columns: dict[str, Sequence[int]]):
+        raise NotImplementedError()
+
+    def write_columns(self, columns: "Columns", batch_size: int):
+        for start in range(0, len(columns), batch_size):
+            end = start + batch_size
+            self.write(
+                columns.timestamp[start:end],
+                {name: col[start:end] for name, col in columns.columns.items()},
+            )
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class CsvExporter(Exporter):
+    suffix = ".csv"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.file = open(self.path, "w")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(self.names)
+
+    def write(self, timestamp: Sequence[int], columns: dict[str, Sequence[int]]):
+        datetimes = (datetime.fromtimestamp(ts, self.tz) for ts in list(timestamp))
+        self.writer.writerows(zip(datetimes, *(list(i) for i in columns.values())))
+
+    def close(self):
+        self.file.close()
+
+
+class SampleBatcher:
+    """
+    Sink collecting sample dataclasses into column batches for an exporter.
+    """
+
+    def __init__(
+        self,
+        exporter: Exporter,
+        sample_type: Type,
+        batch_size: int,
+        write: Optional[Callable[[list, dict], None]] = None,
+    ):
+        """
+        Full batches go to `write`, `exporter.write` by default. A batch's
+        lists are not touched after they were handed over.
+        """
+        self.exporter = exporter
+        self.write = write or exporter.write
+        self.names = [i.name for i in fields(sample_type) if i.name != "timestamp"]
+        self.batch_size = batch_size
+        self.reset()
+
+    def reset(self):
+        self.timestamp = []
+        self.columns = {name: [] for name in self.names}
+
+    def __call__(self, sample: Any):
+        self.timestamp.append(int(sample.timestamp.timestamp()))
+        for name, column in self.columns.items():
+            column.append(getattr(sample, name))
+
+        if len(self.timestamp) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.timestamp:
+            self.write(self.timestamp, self.columns)
+            self.reset()
+
+
+def get_exporter(export_format: str) -> Type[Exporter]:
+    if export_format == "csv":
+        return CsvExporter
+    if export_format == "parquet":
+        from .parquet_export import ParquetExporter
+
+        return ParquetExporter
+
+    raise ValueError(f"Unknown export format: {export_format}")
@@ -0,0 +1,61 @@
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .export import Exporter
+
+ARROW_TYPES = {
+    "u1": pa.uint8(),
+    "u2": pa.uint16(),
+    "u4": pa.uint32(),
+    "i1": pa.int8(),
+    "i2": pa.int16(),
+    "i4": pa.int32(),
+}
+
+
+def arrow_type(name: str, dtype: str) -> pa.DataType:
+    try:
+        return ARROW_TYPES[dtype.lstrip("<>=|")]
+    except KeyError:
+        raise ValueError(
+            f"Can't export field {name} of dtype {dtype} to parquet, "
+            f"supported are {', '.join(ARROW_TYPES)}"
+        ) from None
+
+
+class ParquetExporter(Exporter):
+    """
+    Every `write` becomes one row group. Timestamps are stored with the
+    watch's timezone, fetch metadata as schema metadata.
+    """
+
+    suffix = ".parquet"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        offset = self.tz.utcoffset(None)
+        minutes = int(offset.total_seconds()) // 60
+        tz = f"{'-' if minutes < 0 else '+'}{abs(minutes) // 60:02}:{abs(minutes) % 60:02}"
+
+        self.schema = pa.schema(
+            [pa.field("timestamp", pa.timestamp("s", tz=tz))]
+            + [
+                pa.field(name, arrow_type(name, dtype))
+                for name, dtype in self.record_dtype
+            ],
+            metadata=self.metadata,
+        )
+        # pass a file object, pyarrow takes the ":" of the timestamp for a URI
+        self.file = open(self.path, "wb")
+        self.writer = pq.ParquetWriter(self.file, self.schema)
+
+    def write(self, timestamp, columns):
+        arrays = [pa.array(timestamp, pa.int64()).cast(self.schema.field(0).type)]
+        arrays += [
+            pa.array(columns[field.name], field.type) for field in list(self.schema)[1:]
+        ]
+        self.writer.write_batch(pa.record_batch(arrays, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+        self.file.close()
@@ -0,0 +1,45 @@
+from typing import Iterator
+
+
+class RecordStream:
+    """
+    Splits a byte stream into fixed size records.
+
+    Bytes of a record split across packets are kept until the rest of it
+    arrives, so only one partial record is ever held in memory. The first
+    `header` bytes of the stream are skipped.
+    """
+
+    def __init__(self, record_size: int, header: int = 0):
+        self.record_size = record_size
+        self.skip = header
+        self.pending = bytearray()
+        self.count = 0
+
+    def feed(self, data: bytes) -> Iterator[tuple[int, memoryview]]:
+        view = memoryview(data)
+        size = self.record_size
+
+        if self.skip:
+            skipped = min(self.skip, len(view))
+            view = view[skipped:]
+            self.skip -= skipped
+
+        if self.pending:
+            need = size - len(self.pending)
+            self.pending += view[:need]
+            view = view[need:]
+            if len(self.pending) < size:
+                return
+
+            record = memoryview(bytes(self.pending))
+            self.pending.clear()
+            yield self.count, record
+            self.count += 1
+
+        end = len(view) - len(view) % size
+        for offset in range(0, end, size):
+            yield self.count, view[offset : offset + size]
+            self.count += 1
+
+        self.pending += view[end:]
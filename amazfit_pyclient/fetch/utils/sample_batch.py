@@ -0,0 +1,132 @@
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from typing import Iterator, Optional, Type
+
+TYPECODES = {
+    "u1": "B",
+    "u2": "H",
+    "u4": "I",
+    "i1": "b",
+    "i2": "h",
+    "i4": "i",
+}
+
+
+class SampleView:
+    """
+    Read-only view of one sample of a batch, fields are looked up in the
+    batch columns on access.
+    """
+
+    __slots__ = ("batch", "index")
+
+    def __init__(self, batch: "SampleBatch", index: int):
+        self.batch = batch
+        self.index = index
+
+    def __getattr__(self, name: str):
+        if name == "timestamp":
+            return self.batch.timestamp_at(self.index)
+        try:
+            return self.batch.columns[name][self.index]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def sample(self):
+        """The sample as an instance of the batch's `sample_type`"""
+        return self.batch.sample_type(
+            self.timestamp,
+            *(column[self.index] for column in self.batch.fields().values()),
+        )
+
+    def __repr__(self):
+        fields = ", ".join(
+            f"{name}={column[self.index]}"
+            for name, column in self.batch.fields().items()
+        )
+        return f"{self.__class__.__name__}(timestamp={self.timestamp}, {fields})"
+
+
+class SampleBatch:
+    """
+    Samples of one fetch stored as `array.array` columns.
+
+    Records are `interval` apart from `start`, so timestamps are not stored.
+    When missing records were dropped, `offsets` holds the record number of
+    every kept sample. Records with their own time have a "timestamp" column
+    of epoch seconds instead.
+    """
+
+    sample_type: Type
+
+    __slots__ = ("start", "interval", "columns", "offsets")
+
+    def __init__(
+        self,
+        start: datetime,
+        interval: timedelta,
+        columns: dict[str, array],
+        offsets: Optional[array] = None,
+    ):
+        self.start = start
+        self.interval = interval
+        self.columns = columns
+        self.offsets = offsets
+
+    def fields(self) -> dict[str, array]:
+        """Columns of the sample fields besides the timestamp"""
+        if "timestamp" not in self.columns:
+            return self.columns
+        return {k: v for k, v in self.columns.items() if k != "timestamp"}
+
+    def __len__(self) -> int:
+        return len(next(iter(self.columns.values())))
+
+    def __getitem__(self, index: int) -> SampleView:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return SampleView(self, index)
+
+    def __iter__(self) -> Iterator[SampleView]:
+        return (SampleView(self, i) for i in range(len(self)))
+
+    def samples(self) -> Iterator:
+        """Samples as `sample_type` instances, like `parse` creates them"""
+        return (view.sample() for view in self)
+
+    def record_number(self, index: int) -> int:
+        return self.offsets[index] if self.offsets is not None else index
+
+    def timestamp_at(self, index: int) -> datetime:
+        if "timestamp" in self.columns:
+            return datetime.fromtimestamp(
+                self.columns["timestamp"][index], self.start.tzinfo
+            )
+        return self.start + self.record_number(index) * self.interval
+
+    def between(self, start: datetime, end: datetime) -> "SampleBatch":
+        """Samples of `[start, end)` as a new batch"""
+        if "timestamp" in self.columns:
+            timestamp = self.columns["timestamp"]
+            lo = bisect_left(timestamp, int(start.timestamp()))
+            hi = bisect_left(timestamp, int(end.timestamp()))
+            columns = {name: col[lo:hi] for name, col in self.columns.items()}
+            return self.__class__(self.start, self.interval, columns)
+
+        # first record numbers at or after start and end
+        first = max(0, -((self.start - start) // self.interval))
+        last = max(0, -((self.start - end) // self.interval))
+
+        if self.offsets is None:
+            columns = {name: col[first:last] for name, col in self.columns.items()}
+            return self.__class__(
+                self.start + first * self.interval, self.interval, columns
+            )
+
+        lo = bisect_left(self.offsets, first)
+        hi = bisect_left(self.offsets, last)
+        columns = {name: col[lo:hi] for name, col in self.columns.items()}
+        return self.__class__(self.start, self.interval, columns, self.offsets[lo:hi])
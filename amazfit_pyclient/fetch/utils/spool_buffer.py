@@ -0,0 +1,116 @@
+import mmap
+import os
+import tempfile
+from io import BytesIO
+from pathlib import Path
+from typing import BinaryIO, Optional
+
+DEFAULT_THRESHOLD = 1 << 20
+
+
+class SpoolBuffer:
+    """
+    Receive buffer that keeps small transfers in memory and spills to a
+    temporary file once `threshold` bytes are exceeded.
+
+    `getbuffer()` maps a spilled file with `mmap`, so parsers read it straight
+    from the page cache, and `save()` renames it into place instead of copying
+    it. The temporary file is created in `directory` (the working directory by
+    default) so the rename stays on one filesystem.
+    """
+
+    file: BinaryIO
+    spool_path: Optional[Path] = None
+
+    def __init__(
+        self, threshold: int = DEFAULT_THRESHOLD, directory: Optional[Path] = None
+    ):
+        self.threshold = threshold
+        self.directory = directory
+        self.file = BytesIO()
+        self.mmap: Optional[mmap.mmap] = None
+
+    @property
+    def spilled(self) -> bool:
+        return not isinstance(self.file, BytesIO)
+
+    def __len__(self) -> int:
+        if self.spilled:
+            self.file.flush()
+            return os.fstat(self.file.fileno()).st_size
+        return len(self.file.getbuffer())
+
+    def spill(self):
+        fd, name = tempfile.mkstemp(
+            prefix=".spool-", suffix=".bin", dir=self.directory or "."
+        )
+        file = os.fdopen(fd, "w+b")
+        file.write(self.file.getbuffer())
+        self.file = file
+        self.spool_path = Path(name)
+
+    def write(self, data: bytes) -> int:
+        if not self.spilled and self.file.tell() + len(data) > self.threshold:
+            self.spill()
+
+        # a mapping has a fixed size, the next getbuffer() maps the file again
+        self.mmap = None
+        return self.file.write(data)
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        return self.file.seek(offset, whence)
+
+    def tell(self) -> int:
+        return self.file.tell()
+
+    def getbuffer(self) -> memoryview:
+        if not self.spilled:
+            return self.file.getbuffer()
+
+        self.file.flush()
+        if self.mmap is None:
+            if not len(self):
+                return memoryview(b"")
+            self.mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        return memoryview(self.mmap)
+
+    def save(self, path: Path):
+        """
+        Moves the spool file to `path` or writes the in-memory data there.
+        The buffer is closed afterwards.
+        """
+        if self.spool_path is not None:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            os.replace(self.spool_path, path)
+            self.spool_path = None
+        else:
+            with open(path, "wb") as f, self.getbuffer() as view:
+                f.write(view)
+        self.close()
+
+    def unlink(self):
+        """
+        Removes the spool file, the data stays readable until `close()`.
+        """
+        if self.spool_path is not None:
+            self.spool_path.unlink(missing_ok=True)
+            self.spool_path = None
+
+    def close(self):
+        # a mapping with live views is released by the garbage collector
+        if self.mmap is not None:
+            try:
+                self.mmap.close()
+            except BufferError:
+                pass
+            self.mmap = None
+
+        self.file.close()
+        self.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
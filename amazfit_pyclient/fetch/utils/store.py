@@ -0,0 +1,172 @@
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterator, Sequence, Union
+
+from .export import Exporter
+
+SQL_TYPES = {
+    "u1": "INTEGER",
+    "u2": "INTEGER",
+    "u4": "INTEGER",
+    "i1": "INTEGER",
+    "i2": "INTEGER",
+    "i4": "INTEGER",
+}
+
+
+def quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+class TimeSeriesStore:
+    """
+    SQLite store for fetched samples.
+
+    Every fetch type gets a table with one column per record field and the
+    primary key `(device, timestamp)`, stored WITHOUT ROWID so the rows are
+    clustered by that key. Writes are upserts: samples of overlapping fetches
+    replace the stored ones, and a row is only rewritten when its values
+    changed, so ingesting the same window twice leaves the database as is.
+
+    The store can be used from the fetch executor threads, writes are
+    serialized by a lock.
+    """
+
+    def __init__(self, path: Union[Path, str]):
+        self.path = path
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.tables: dict[str, list[str]] = {}
+
+    def table(self, fetch_type: str, record_dtype: list[tuple[str, str]]) -> str:
+        if fetch_type not in self.tables:
+            columns = ", ".join(
+                f"{quote(name)} {SQL_TYPES[dtype]} NOT NULL"
+                for name, dtype in record_dtype
+            )
+            self.connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {quote(fetch_type)} ("
+                "device TEXT NOT NULL, timestamp INTEGER NOT NULL, "
+                f"{columns}, PRIMARY KEY (device, timestamp)) WITHOUT ROWID"
+            )
+            self.tables[fetch_type] = [name for name, _ in record_dtype]
+        return quote(fetch_type)
+
+    def upsert(
+        self,
+        device: str,
+        fetch_type: str,
+        record_dtype: list[tuple[str, str]],
+        timestamp: Sequence[int],
+        columns: dict[str, Sequence[int]],
+    ) -> int:
+        """
+        Inserts or updates samples, returns the number of rows written.
+        """
+        table = self.table(fetch_type, record_dtype)
+        names = [quote(name) for name, _ in record_dtype]
+        changed = ", ".join(f"{name} = excluded.{name}" for name in names)
+        values = ", ".join(names)
+        excluded = ", ".join(f"excluded.{name}" for name in names)
+        sql = (
+            f"INSERT INTO {table} (device, timestamp, {values}) "
+            f"VALUES (?, ?, {', '.join('?' * len(names))}) "
+            f"ON CONFLICT (device, timestamp) DO UPDATE SET {changed} "
+            f"WHERE ({values}) IS NOT ({excluded})"
+        )
+        rows = zip(
+            [device] * len(timestamp),
+            tolist(timestamp),
+            *(tolist(columns[name]) for name, _ in record_dtype),
+        )
+
+        with self.lock, self.connection:
+            before = self.connection.total_changes
+            self.connection.executemany(sql, rows)
+            return self.connection.total_changes - before
+
+    def query(
+        self, device: str, fetch_type: str, start: datetime, end: datetime
+    ) -> Iterator[tuple]:
+        """
+        Yields `(timestamp, *fields)` rows of `[start, end)` ordered by time,
+        timestamps are unix epoch seconds.
+        """
+        if not self.table_exists(fetch_type):
+            return iter(())
+
+        return self.connection.execute(
+            f"SELECT timestamp, {', '.join(map(quote, self.columns(fetch_type)))} "
+            f"FROM {quote(fetch_type)} "
+            "WHERE device = ? AND timestamp >= ? AND timestamp < ? "
+            "ORDER BY timestamp",
+            (device, int(start.timestamp()), int(end.timestamp())),
+        )
+
+    def table_exists(self, fetch_type: str) -> bool:
+        return fetch_type in self.tables or bool(
+            self.connection.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                (fetch_type,),
+            ).fetchone()
+        )
+
+    def columns(self, fetch_type: str) -> list[str]:
+        if fetch_type not in self.tables:
+            info = self.connection.execute(f"PRAGMA table_info({quote(fetch_type)})")
+            self.tables[fetch_type] = [
+                row[1] for row in info if row[1] not in ("device", "timestamp")
+            ]
+        return self.tables[fetch_type]
+
+    def exporter(
+        self,
+        device: str,
+        fetch_type: str,
+        record_dtype: list[tuple[str, str]],
+        tz: timezone,
+    ) -> "StoreExporter":
+        return StoreExporter(self, device, fetch_type, record_dtype, tz)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class StoreExporter(Exporter):
+    """
+    Exporter writing into a `TimeSeriesStore` instead of a file.
+    """
+
+    def __init__(
+        self,
+        store: TimeSeriesStore,
+        device: str,
+        fetch_type: str,
+        record_dtype: list[tuple[str, str]],
+        tz: timezone,
+    ):
+        super().__init__(Path(store.path), record_dtype, tz, {"fetch_type": fetch_type})
+        self.store = store
+        self.device = device
+        self.fetch_type = fetch_type
+        self.written = 0
+
+    def write(self, timestamp: Sequence[int], columns: dict[str, Sequence[int]]):
+        self.written += self.store.upsert(
+            self.device, self.fetch_type, self.record_dtype, timestamp, columns
+        )
+
+
+def tolist(values: Sequence[int]) -> list[int]:
+    # numpy scalars can't be bound as sqlite parameters
+    return values.tolist() if hasattr(values, "tolist") else list(values)
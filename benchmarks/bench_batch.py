@@ -0,0 +1,54 @@
+"""
+Memory per sample of a year of minute activity and stress data held as
+sample dataclasses vs array-backed batches.
+
+    python -m benchmarks.bench_batch
+"""
+
+import random
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from unittest.mock import Mock
+
+from amazfit_pyclient.fetch import FetchActivity, FetchStress
+from amazfit_pyclient.fetch.utils import SpoolBuffer
+
+MINUTES = 365 * 24 * 60
+
+
+def make(fetch_cls, record_size: int):
+    fetch = fetch_cls(Mock())
+    fetch.buffer = SpoolBuffer(threshold=MINUTES * record_size)
+    fetch.buffer.write(random.Random(0).randbytes(MINUTES * record_size))
+    fetch.start_timestamp = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    return fetch
+
+
+def measure(func) -> tuple[object, float, int]:
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, size
+
+
+def main():
+    for fetch_cls, record_size in ((FetchActivity, 8), (FetchStress, 1)):
+        fetch = make(fetch_cls, record_size)
+        for name, func in [
+            ("dataclasses", lambda: list(fetch.get_samples())),
+            ("batch", fetch.get_batch),
+        ]:
+            result, elapsed, size = measure(func)
+            print(
+                f"{fetch_cls.__name__:>14} {name:>11}: {elapsed:6.3f}s "
+                f"{size / 1e6:7.2f} MB, {size / len(result):6.1f} B/sample"
+            )
+            del result
+
+
+if __name__ == "__main__":
+    main()
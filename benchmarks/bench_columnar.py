@@ -0,0 +1,44 @@
+"""
+Decoding a year of minute activity and stress data with the per-row
+dataclass path vs the numpy columnar path.
+
+    python -m benchmarks.bench_columnar
+"""
+
+import random
+import time
+from datetime import datetime, timezone
+from io import BytesIO
+from unittest.mock import Mock
+
+from amazfit_pyclient.fetch import FetchActivity, FetchStress
+
+MINUTES = 365 * 24 * 60
+
+
+def make(fetch_cls, record_size: int):
+    fetch = fetch_cls(Mock())
+    fetch.buffer = BytesIO(random.Random(0).randbytes(MINUTES * record_size))
+    fetch.start_timestamp = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    return fetch
+
+
+def measure(func) -> float:
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def main():
+    for fetch_cls, record_size in ((FetchActivity, 8), (FetchStress, 1)):
+        fetch = make(fetch_cls, record_size)
+        rows = measure(lambda: list(fetch.get_samples()))
+        columns = measure(fetch.get_columns)
+        print(
+            f"{fetch_cls.__name__:>14}: per-row {rows:.3f}s, "
+            f"columnar {columns * 1e3:.1f}ms ({rows / columns:.0f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
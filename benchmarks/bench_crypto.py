@@ -0,0 +1,47 @@
+"""
+Encrypted round trips per second with per-message key derivation vs the
+per-session cipher cache.
+
+    python -m benchmarks.bench_crypto
+"""
+
+import time
+
+from amazfit_pyclient.chunked_encoder.aes import decrypt_aes, encrypt_aes, SessionCrypto
+
+KEY = bytes(range(16))
+ROUNDS = 50_000
+
+
+def legacy(payload: bytes, handle: int) -> bytes:
+    key = bytes([KEY[i] ^ handle for i in range(16)])
+    return decrypt_aes(encrypt_aes(payload, key), key)
+
+
+def cached(crypto: SessionCrypto, payload: bytes, handle: int) -> bytes:
+    return crypto.decrypt(handle, crypto.encrypt(handle, payload))
+
+
+def main():
+    for size in (16, 64, 1024):
+        payload = bytes(size)
+
+        start = time.perf_counter()
+        for n in range(ROUNDS):
+            legacy(payload, n & 0xFF)
+        before = ROUNDS / (time.perf_counter() - start)
+
+        crypto = SessionCrypto(KEY)
+        start = time.perf_counter()
+        for n in range(ROUNDS):
+            cached(crypto, payload, n & 0xFF)
+        after = ROUNDS / (time.perf_counter() - start)
+
+        print(
+            f"{size:>5} bytes: {before:>10.0f} -> {after:>10.0f} round trips/s "
+            f"({after / before:.2f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Reassembly cost of ChunkedDecoder for growing payloads at the default MTU.
+
+    python -m benchmarks.bench_decoder
+"""
+
+import asyncio
+import struct
+import time
+from unittest.mock import AsyncMock, Mock
+
+from amazfit_pyclient.chunked_encoder import ChunkedDecoder
+from amazfit_pyclient.chunked_encoder.chunked_endpoint import HeaderFlags
+
+SIZES = [1 << 10, 1 << 14, 1 << 17, 1 << 20]
+
+
+class Sink:
+    endpoint = 0x16
+
+    async def __call__(self, payload):
+        self.size = len(payload)
+
+
+def split(endpoint: int, payload: bytes, mtu: int):
+    # the chunk counter is a single byte and wraps on big messages
+    first = mtu - 3 - 11
+    rest = mtu - 3 - 5
+    offset = 0
+    count = 0
+    while offset < len(payload):
+        size = first if count == 0 else rest
+        flags = HeaderFlags.first_chunk if count == 0 else HeaderFlags(0)
+        if offset + size >= len(payload):
+            flags |= HeaderFlags.last_chunk
+        header = struct.pack("<5B", 0x03, flags, 0x00, 0x01, count & 0xFF)
+        if count == 0:
+            header += struct.pack("<IH", len(payload), endpoint)
+        yield header + payload[offset : offset + size]
+        offset += size
+        count += 1
+
+
+async def bench(size: int, mtu: int = 23) -> float:
+    client = Mock()
+    client.write_gatt_char = AsyncMock()
+    decoder = ChunkedDecoder(client)
+    sink = Sink()
+    decoder.add_handler(sink)
+
+    chunks = list(split(sink.endpoint, bytes(size), mtu))
+
+    start = time.perf_counter()
+    for chunk in chunks:
+        await decoder.decode(chunk)
+    elapsed = time.perf_counter() - start
+
+    assert sink.size == size
+    return elapsed
+
+
+async def main():
+    print(f"{'payload':>10} {'chunks':>8} {'ms/msg':>10} {'us/KiB':>10}")
+    for size in SIZES:
+        elapsed = await bench(size)
+        n_chunks = -(-size // 14)
+        print(
+            f"{size:>10} {n_chunks:>8} {elapsed * 1e3:>10.2f} "
+            f"{elapsed * 1e6 / (size / 1024):>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
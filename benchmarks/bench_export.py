@@ -0,0 +1,49 @@
+"""
+Exporting a year of synthetic minute activity as CSV vs Parquet.
+
+    python -m benchmarks.bench_export
+"""
+
+import asyncio
+import os
+import tempfile
+import time
+from datetime import datetime, timezone
+from unittest.mock import Mock
+
+from amazfit_pyclient.fetch import FetchActivity, FetchType
+from amazfit_pyclient.fetch.utils import SpoolBuffer
+from .synthetic import synthetic_activity
+
+MINUTES = 365 * 24 * 60
+
+
+async def export(data: bytes, **kwargs) -> tuple[float, int]:
+    fetch = FetchActivity(Mock(), **kwargs)
+    fetch.fetch_type = FetchType.ACTIVITY
+    fetch.buffer = SpoolBuffer(threshold=len(data))
+    fetch.buffer.write(data)
+    fetch.start_timestamp = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    start = time.perf_counter()
+    await fetch.on_transaction_complete()
+    elapsed = time.perf_counter() - start
+    return elapsed, os.path.getsize(fetch.path)
+
+
+async def main():
+    data = synthetic_activity(MINUTES)
+    os.chdir(tempfile.mkdtemp())
+
+    for name, kwargs in [
+        ("csv, per-row", {}),
+        ("csv, columnar", {"columnar": True}),
+        ("parquet, per-row", {"export_format": "parquet"}),
+        ("parquet, columnar", {"export_format": "parquet", "columnar": True}),
+    ]:
+        elapsed, size = await export(data, **kwargs)
+        print(f"{name:>18}: {elapsed:6.2f}s {size / 1e6:7.2f} MB")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
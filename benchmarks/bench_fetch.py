@@ -0,0 +1,141 @@
+"""
+End-to-end fetches from a simulated watch for a day, a month and a year of
+minute activity and stress data.
+
+Reports notification throughput, decode time of the received buffer,
+export time and peak traced memory (measured in a second run, tracemalloc
+slows everything down).
+
+    python -m benchmarks.bench_fetch [--workloads day,month] [--mtu 247]
+        [--rate 0] [--loss 0.0] [--modes buffered,streaming,columnar]
+        [--format csv]
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import os
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+from amazfit_pyclient.fetch import FetchActivity, FetchStress
+from .fake_watch import FakeFetchClient
+from .synthetic import synthetic_activity, synthetic_stress
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+WORKLOADS = {"day": 24 * 60, "month": 30 * 24 * 60, "year": 365 * 24 * 60}
+
+FETCHERS = [
+    (FetchActivity, synthetic_activity),
+    (FetchStress, synthetic_stress),
+]
+
+
+@dataclass
+class Result:
+    packets: int = 0
+    lost: int = 0
+    transfer: float = 0.0
+    parse: float = 0.0
+    export: float = 0.0
+    peak: int = 0
+
+    @property
+    def packets_per_second(self) -> float:
+        return self.packets / self.transfer if self.transfer else 0.0
+
+
+async def fetch_once(fetch_cls, payload: bytes, mode: str, args) -> Result:
+    watch = FakeFetchClient(
+        payload,
+        start=START,
+        record_size=fetch_cls.record_size,
+        mtu=args.mtu,
+        rate=args.rate,
+        loss=args.loss,
+    )
+    fetch = fetch_cls(
+        watch,
+        streaming=mode == "streaming",
+        columnar=mode == "columnar",
+        export_format=args.format,
+    )
+    result = Result()
+    complete = fetch.on_transaction_complete
+
+    async def timed_complete():
+        result.transfer = time.perf_counter() - started
+        start = time.perf_counter()
+        await complete()
+        result.export = time.perf_counter() - start
+
+    fetch.on_transaction_complete = timed_complete
+
+    started = time.perf_counter()
+    await fetch.start(watch.start)
+    await fetch.finished.wait()
+
+    result.packets = watch.sent
+    result.lost = fetch.loss.lost_packets
+    if mode != "streaming":
+        start = time.perf_counter()
+        if mode == "columnar":
+            fetch.get_columns()
+        else:
+            for _ in fetch.get_samples():
+                pass
+        result.parse = time.perf_counter() - start
+
+    os.unlink(fetch.path)
+    return result
+
+
+async def run(fetch_cls, payload: bytes, mode: str, args) -> Result:
+    result = await fetch_once(fetch_cls, payload, mode, args)
+
+    tracemalloc.start()
+    await fetch_once(fetch_cls, payload, mode, args)
+    _, result.peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workloads", default="day,month,year")
+    parser.add_argument("--mtu", type=int, default=247)
+    parser.add_argument("--rate", type=float, default=0, help="packets/s, 0 = max")
+    parser.add_argument("--loss", type=float, default=0.0)
+    parser.add_argument("--modes", default="buffered,streaming,columnar")
+    parser.add_argument("--format", default="csv")
+    args = parser.parse_args()
+
+    modes = args.modes.split(",")
+    if "columnar" in modes and importlib.util.find_spec("numpy") is None:
+        print("numpy is not installed, skipping columnar")
+        modes.remove("columnar")
+
+    os.chdir(tempfile.mkdtemp())
+    print(
+        f"{'fetch':>14} {'workload':>8} {'mode':>9} {'packets':>8} {'lost':>5} "
+        f"{'pkt/s':>9} {'parse s':>8} {'export s':>8} {'peak MB':>8}"
+    )
+    for name in args.workloads.split(","):
+        minutes = WORKLOADS[name]
+        for fetch_cls, synthetic in FETCHERS:
+            payload = synthetic(minutes)
+            for mode in modes:
+                result = await run(fetch_cls, payload, mode, args)
+                print(
+                    f"{fetch_cls.__name__:>14} {name:>8} {mode:>9} "
+                    f"{result.packets:>8} {result.lost:>5} "
+                    f"{result.packets_per_second:>9.0f} {result.parse:>8.3f} "
+                    f"{result.export:>8.3f} {result.peak / 1e6:>8.2f}"
+                )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
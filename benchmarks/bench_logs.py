@@ -0,0 +1,85 @@
+"""
+Sustained flood of watch log entries through the LOGS_DATA handler into
+rotating compressed files: handler time per entry, entries written and
+dropped, and the compressed size.
+
+    python -m benchmarks.bench_logs
+"""
+
+import asyncio
+import os
+import random
+import tempfile
+import time
+from unittest.mock import Mock
+
+from amazfit_pyclient.chunked_encoder import ChunkedEncoder
+from amazfit_pyclient.chunked_encoder.handlers import LogsClient
+from amazfit_pyclient.chunked_encoder.handlers.utils import LogWriter
+
+ENTRIES = 200_000
+# entries handled between yields to the loop, like a burst of notifications
+BURST = 64
+
+
+def payloads(count: int) -> list[memoryview]:
+    rnd = random.Random(0)
+    words = ["sensor", "ble", "render", "alarm", "sync", "gps", "ok", "retry"]
+    return [
+        memoryview(
+            bytes([0x07, 1, n & 0xFF])
+            + b"com.example.app\x002024-03-26 13:20:47\x00"
+            + " ".join(rnd.choices(words, k=rnd.randint(3, 20))).encode()
+            + b"\x00"
+        )
+        for n in range(count)
+    ]
+
+
+async def run(compression: str, directory: str) -> None:
+    client = Mock()
+    client.mtu_size = 247
+    data = payloads(ENTRIES)
+
+    async with LogWriter(directory, compression=compression) as writer:
+        logs = LogsClient(ChunkedEncoder(client), Mock(), writer=writer)
+        handler_time = 0.0
+        start = time.perf_counter()
+        for offset in range(0, ENTRIES, BURST):
+            t = time.perf_counter()
+            for payload in data[offset : offset + BURST]:
+                await logs(payload)
+            handler_time += time.perf_counter() - t
+            await asyncio.sleep(0)
+        submitted = time.perf_counter() - start
+
+    elapsed = time.perf_counter() - start
+    stats = writer.stats
+    size = sum(
+        os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory)
+    )
+    print(
+        f"{compression:>5}: {handler_time / ENTRIES * 1e6:5.2f} us/entry in handler, "
+        f"{ENTRIES / submitted:9.0f} entries/s submitted, "
+        f"written {stats.written}, dropped {stats.dropped}, "
+        f"{stats.bytes_written / 1e6:6.2f} MB -> {size / 1e6:5.2f} MB "
+        f"in {stats.files} files, {elapsed:5.2f}s total"
+    )
+
+
+def main():
+    compressions = ["gzip"]
+    try:
+        import zstandard  # noqa: F401
+
+        compressions.append("zstd")
+    except ImportError:
+        print("zstandard is not installed, skipping zstd")
+
+    for compression in compressions:
+        with tempfile.TemporaryDirectory() as directory:
+            asyncio.run(run(compression, directory))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+Outbound bytes/s at the default MTU of 23 vs a negotiated MTU of 247, with a
+fake client where every acknowledged write costs a round trip plus air time.
+
+    python -m benchmarks.bench_mtu
+"""
+
+import asyncio
+import time
+from unittest.mock import Mock
+
+from amazfit_pyclient.chunked_encoder import ChunkedEncoder
+
+ROUND_TRIP = 0.0075
+BYTE_TIME = 8 / 1_000_000
+
+
+class LatencyClient:
+    def __init__(self):
+        self.services = Mock()
+
+    async def write_gatt_char(self, char, data, response=None):
+        await asyncio.sleep(ROUND_TRIP + len(data) * BYTE_TIME)
+
+
+async def bench(size: int, mtu: int) -> float:
+    encoder = ChunkedEncoder(LatencyClient())
+    encoder.m_mtu = mtu
+    start = time.perf_counter()
+    await encoder.write(0x01, bytes(size), True)
+    return size / (time.perf_counter() - start)
+
+
+async def main():
+    print(f"{'payload':>8} {'MTU 23 B/s':>12} {'MTU 247 B/s':>12} {'gain':>6}")
+    for size in (64, 512, 4096, 16384):
+        low = await bench(size, 23)
+        high = await bench(size, 247)
+        print(f"{size:>8} {low:>12.0f} {high:>12.0f} {high / low:>5.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,47 @@
+"""
+Outbound throughput with acknowledged writes vs the pipelined mode against a
+fake client where an acknowledged write costs a connection event round trip.
+
+    python -m benchmarks.bench_pipelined
+"""
+
+import asyncio
+import time
+from unittest.mock import Mock
+
+from amazfit_pyclient.chunked_encoder import ChunkedEncoder
+
+ROUND_TRIP = 0.0075
+QUEUE_DELAY = 0.0005
+
+
+class LatencyClient:
+    def __init__(self):
+        self.services = Mock()
+        self.services.get_characteristic.return_value.properties = [
+            "write",
+            "write-without-response",
+        ]
+
+    async def write_gatt_char(self, char, data, response=None):
+        await asyncio.sleep(QUEUE_DELAY if response is False else ROUND_TRIP)
+
+
+async def bench(size: int, pipelined: bool, window: int = 8) -> float:
+    encoder = ChunkedEncoder(LatencyClient(), pipelined=pipelined, window=window)
+    encoder.m_mtu = 247
+    start = time.perf_counter()
+    await encoder.write(0x01, bytes(size), True)
+    return size / (time.perf_counter() - start)
+
+
+async def main():
+    print(f"{'payload':>8} {'acked B/s':>12} {'pipelined B/s':>14} {'gain':>6}")
+    for size in (1 << 10, 1 << 13, 1 << 15):
+        acked = await bench(size, False)
+        pipelined = await bench(size, True)
+        print(f"{size:>8} {acked:>12.0f} {pipelined:>14.0f} {pipelined / acked:>5.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
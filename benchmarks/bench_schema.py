@@ -0,0 +1,57 @@
+"""
+Decoding speed of every registered record schema, 100k records each,
+with the struct and numpy decoders, next to parsing activity one record at
+a time as streaming fetches do.
+
+    python -m benchmarks.bench_schema
+"""
+
+import random
+import time
+from datetime import datetime, timezone
+from unittest.mock import Mock
+
+from amazfit_pyclient.fetch import FetchActivity, SCHEMAS
+from amazfit_pyclient.fetch.utils import RecordStream, SpoolBuffer
+
+RECORDS = 100_000
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def measure(func) -> float:
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def main():
+    # import numpy outside of the measurements
+    next(iter(SCHEMAS.values())).columns(b"", START)
+
+    for fetch_type, schema in SCHEMAS.items():
+        data = random.Random(0).randbytes(schema.header + schema.record_size * RECORDS)
+        samples = measure(lambda: list(schema.samples(data, START)))
+        batch = measure(lambda: schema.batch(data, START))
+        columns = measure(lambda: schema.columns(data, START))
+        print(
+            f"{fetch_type.name:>18}: samples {RECORDS / samples / 1e6:5.2f} M/s, "
+            f"batch {RECORDS / batch / 1e6:5.2f} M/s, "
+            f"columns {RECORDS / columns / 1e6:6.1f} M/s"
+        )
+
+    fetch = FetchActivity(Mock())
+    fetch.buffer = SpoolBuffer()
+    fetch.buffer.write(random.Random(0).randbytes(8 * RECORDS))
+    fetch.start_timestamp = START
+    stream = RecordStream(fetch.record_size)
+    parse = measure(
+        lambda: [
+            fetch.schema.parse(n, record, START)
+            for n, record in stream.feed(fetch.buffer.getbuffer())
+        ]
+    )
+    print(f"{'ACTIVITY':>18}: parse {RECORDS / parse / 1e6:5.2f} M/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Peak Python memory of raw fetches of growing size, kept in memory vs
+spooled to disk.
+
+    python -m benchmarks.bench_spool
+"""
+
+import asyncio
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from unittest.mock import Mock
+
+from amazfit_pyclient.fetch import DataFetch, FetchType
+from amazfit_pyclient.fetch.utils import SpoolBuffer
+
+MIB = 1 << 20
+PACKET = bytes(range(244))
+
+
+async def fetch(size: int, threshold: int) -> tuple[float, int]:
+    fetch = DataFetch(Mock())
+    fetch.fetch_type = FetchType.DEBUG_LOGS
+    fetch.start_timestamp = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    fetch.buffer = SpoolBuffer(threshold)
+    for _ in range(size // len(PACKET)):
+        fetch.on_data(PACKET)
+    await fetch.on_transaction_complete()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    os.unlink(fetch.path)
+    return elapsed, peak
+
+
+async def main():
+    os.chdir(tempfile.mkdtemp())
+
+    for size in [MIB, 8 * MIB, 32 * MIB]:
+        for name, threshold in [("in memory", 2 * size), ("spooled", MIB)]:
+            elapsed, peak = await fetch(size, threshold)
+            print(
+                f"{size // MIB:3} MiB {name:>9}: {elapsed:6.2f}s "
+                f"peak {peak / MIB:7.2f} MiB"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
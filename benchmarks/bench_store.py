@@ -0,0 +1,50 @@
+"""
+Ingesting a year of minute stress samples into the time-series store, then
+the same day again and reading one week back.
+
+    python -m benchmarks.bench_store
+"""
+
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from amazfit_pyclient.fetch.utils import TimeSeriesStore
+
+MINUTES = 365 * 24 * 60
+DAY = 24 * 60
+DTYPE = [("stress", "u1")]
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def main():
+    rnd = random.Random(0)
+    timestamp = [int(START.timestamp()) + i * 60 for i in range(MINUTES)]
+    stress = [rnd.randint(0, 100) for _ in range(MINUTES)]
+
+    path = os.path.join(tempfile.mkdtemp(), "samples.db")
+    with TimeSeriesStore(path) as store:
+        start = time.perf_counter()
+        store.upsert("watch", "stress", DTYPE, timestamp, {"stress": stress})
+        print(f"ingest year: {time.perf_counter() - start:6.3f}s")
+
+        day = slice(100 * DAY, 101 * DAY)
+        start = time.perf_counter()
+        written = store.upsert(
+            "watch", "stress", DTYPE, timestamp[day], {"stress": stress[day]}
+        )
+        print(
+            f"ingest day again: {time.perf_counter() - start:6.3f}s, {written} rows written"
+        )
+
+        week = START + timedelta(days=200)
+        start = time.perf_counter()
+        rows = list(store.query("watch", "stress", week, week + timedelta(days=7)))
+        print(f"query week: {time.perf_counter() - start:6.3f}s, {len(rows)} rows")
+        print(f"database: {os.path.getsize(path) / 1e6:.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
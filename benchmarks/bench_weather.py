@@ -0,0 +1,61 @@
+"""
+CPU time per watch weather poll served straight from the weather stub vs
+from the response cache. Encryption is left out, the encoder write is
+replaced by a no-op.
+
+    python -m benchmarks.bench_weather
+"""
+
+import asyncio
+import time
+from unittest.mock import Mock
+
+from amazfit_pyclient.chunked_encoder import ChunkedEncoder
+from amazfit_pyclient.chunked_encoder.handlers import HttpClient
+from amazfit_pyclient.chunked_encoder.handlers.utils import (
+    ResponseCache,
+    WeatherServer,
+)
+
+POLLS = 20_000
+URL = "https://localhost/weather/current"
+
+
+async def discard(*args, **kwargs):
+    pass
+
+
+class Uncached(ResponseCache):
+    async def get(self, url: str, headers: dict = None):
+        return await self.fetch(url, headers)
+
+
+def make(cached: bool) -> HttpClient:
+    client = Mock()
+    client.mtu_size = 247
+    encoder = ChunkedEncoder(client)
+    encoder.write = discard
+    http = HttpClient(encoder, Mock())
+    http.logger.disabled = True
+    if not cached:
+        http.cache = Uncached(WeatherServer())
+    return http
+
+
+async def run(cached: bool) -> float:
+    http = make(cached)
+    start = time.process_time()
+    for n in range(POLLS):
+        await http.request(n & 0xFF, "GET", URL)
+    return time.process_time() - start
+
+
+def main():
+    for cached in (False, True):
+        elapsed = asyncio.run(run(cached))
+        name = "cached" if cached else "uncached"
+        print(f"{name:>8}: {elapsed / POLLS * 1e6:7.2f} us CPU/poll")
+
+
+if __name__ == "__main__":
+    main()
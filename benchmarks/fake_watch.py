@@ -0,0 +1,127 @@
+"""
+BleakClient stand-in for the activity fetch protocol, shared by the fetch
+benchmarks and tests.
+"""
+
+import asyncio
+import random
+import struct
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Iterator, Optional
+from uuid import UUID
+
+
+class FakeFetchClient:
+    """
+    BleakClient stand-in for the activity fetch protocol: answers the start
+    date request with the data from the requested time on, streams
+    counter-prefixed data packets on FETCH_DATA and then reports completion
+    on the metadata characteristic. With `disconnect_after` it goes silent
+    after that many data packets, like a dropped link, packets numbered in
+    `drop` are never delivered.
+
+    `mtu` sets the packet size as a negotiated MTU would (ATT header and
+    counter byte taken off), `rate` limits the notifications per second
+    (0 for as fast as possible) and `loss` is the probability of a packet
+    being dropped. `sent` and `dropped` count the delivered and dropped
+    packets.
+    """
+
+    METADATA = UUID("00000004-0000-3512-2118-0009af100700")
+    DATA = UUID("00000005-0000-3512-2118-0009af100700")
+
+    def __init__(
+        self,
+        payload: bytes,
+        start: datetime = datetime(2024, 3, 1, tzinfo=timezone.utc),
+        packet_size: int = 19,
+        record_size: int = 8,
+        disconnect_after: Optional[int] = None,
+        drop: Iterable[int] = (),
+        mtu: Optional[int] = None,
+        rate: float = 0,
+        loss: float = 0.0,
+        seed: int = 0,
+    ):
+        self.payload = payload
+        self.start = start
+        self.packet_size = packet_size if mtu is None else mtu - 3 - 1
+        self.record_size = record_size
+        self.disconnect_after = disconnect_after
+        self.drop = set(drop)
+        self.rate = rate
+        self.loss = loss
+        self.random = random.Random(seed)
+        self.address = "00:11:22:33:44:55"
+        self.disconnected = asyncio.Event()
+        self.served = memoryview(payload)
+        self.served_start = start
+        self.callbacks = {}
+        self.acks = []
+        self.tasks = set()
+        self.sent = 0
+        self.dropped = 0
+
+    async def start_notify(self, char, callback):
+        self.callbacks[char] = callback
+
+    def request(self, data: bytes):
+        year, month, day, hour, minute = struct.unpack("<H4B", data[2:8])
+        since = datetime(year, month, day, hour, minute, tzinfo=timezone.utc)
+        offset = max(0, (since - self.start) // timedelta(minutes=1))
+        self.served = memoryview(self.payload)[offset * self.record_size :]
+        self.served_start = self.start + offset * timedelta(minutes=1)
+
+    def start_date_response(self) -> bytes:
+        start = self.served_start
+        return (
+            bytes([0x10, 0x01, 0x01])
+            + len(self.served).to_bytes(4, "little")
+            + struct.pack(
+                "<H6b",
+                start.year,
+                start.month,
+                start.day,
+                start.hour,
+                start.minute,
+                start.second,
+                int(start.utcoffset().total_seconds() // 900),
+            )
+            + b"\x00"
+        )
+
+    def packets(self) -> Iterator[bytes]:
+        for n, offset in enumerate(range(0, len(self.served), self.packet_size)):
+            yield bytes([n & 0xFF]) + self.served[offset : offset + self.packet_size]
+
+    async def deliver(self, cmd: int):
+        if cmd == 0x01:
+            await self.callbacks[self.METADATA](None, self.start_date_response())
+        elif cmd == 0x02:
+            loop = asyncio.get_running_loop()
+            started = loop.time()
+            for n, packet in enumerate(self.packets()):
+                if n == self.disconnect_after:
+                    self.disconnected.set()
+                    return
+                if self.rate:
+                    delay = started + n / self.rate - loop.time()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                if n in self.drop or (self.loss and self.random.random() < self.loss):
+                    self.dropped += 1
+                    continue
+                self.sent += 1
+                await self.callbacks[self.DATA](None, bytearray(packet))
+            await self.callbacks[self.METADATA](None, bytearray(b"\x10\x02\x01"))
+
+    async def write_gatt_char(self, char, data, response=None):
+        if data[0] == 0x03:
+            self.acks.append(bytes(data))
+            return
+        if data[0] == 0x01:
+            self.request(data)
+
+        task = asyncio.create_task(self.deliver(data[0]))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
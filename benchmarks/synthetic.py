@@ -0,0 +1,36 @@
+"""
+Synthetic fetch payloads for the benchmarks, served by
+`tests.utils.FakeFetchClient`.
+"""
+
+import random
+
+
+def synthetic_activity(minutes: int, seed: int = 0) -> bytes:
+    """Minute activity records with a night of sleep every day"""
+    rnd = random.Random(seed)
+    data = bytearray()
+    for minute in range(minutes):
+        asleep = (minute // 60) % 24 < 7
+        steps = 0 if asleep else rnd.choice([0, 0, 0, rnd.randint(0, 120)])
+        data += bytes(
+            [
+                1 if asleep else 0,
+                rnd.randint(0, 30 if asleep else 120),
+                steps,
+                rnd.randint(50, 60 if asleep else 140),
+                0,
+                int(asleep),
+                int(asleep and minute % 90 < 20),
+                int(asleep and minute % 90 > 70),
+            ]
+        )
+    return bytes(data)
+
+
+def synthetic_stress(minutes: int, seed: int = 0) -> bytes:
+    """Stress measured every 5 minutes, 0xFF in between"""
+    rnd = random.Random(seed)
+    return bytes(
+        rnd.randint(0, 100) if minute % 5 == 0 else 0xFF for minute in range(minutes)
+    )
@@ -2,11 +2,14 @@ import argparse
 import asyncio
 import logging
 from datetime import datetime, timedelta
-from uuid import UUID
 
 from bleak import BleakClient
 
-from amazfit_pyclient.chunked_encoder import ChunkedDecoder, ChunkedEncoder
+from amazfit_pyclient.chunked_encoder import (
+    ChunkedDecoder,
+    ChunkedEncoder,
+    OutboundScheduler,
+)
 from amazfit_pyclient.chunked_encoder.handlers import (
     AuthHandler,
     BatteryClient,
@@ -18,8 +21,6 @@ from amazfit_pyclient.chunked_encoder.handlers import (
 )
 from amazfit_pyclient.fetch import FetchActivity
 
-CHARACTERISTIC_HR = UUID("00002a37-0000-1000-8000-00805f9b34fb")
-
 
 def print_chars(client: BleakClient):
     for service in client.services:
@@ -36,7 +37,8 @@ async def main(address: str, key: str):
         timeout=30,
     ) as client:
         decoder = ChunkedDecoder(client)
-        encoder = ChunkedEncoder(client)
+        scheduler = OutboundScheduler()
+        encoder = ChunkedEncoder(client, scheduler=scheduler)
 
         eh = AuthHandler(key, encoder, decoder)
         http = HttpClient(encoder, decoder)
@@ -49,13 +51,14 @@ async def main(address: str, key: str):
         await decoder.start_notify()
         await eh.autenticate()
 
-        # await steps.get_steps()
-        await conn.get_mtu()
-        # await battery.request_status()
+        # print(await steps.get_steps())
+        await conn.negotiate_mtu()
+        # print(await battery.request_status())
 
         # print_chars(client)
 
-        await notify_hr(client)
+        hr_task = asyncio.create_task(print_hr(hr))
+        await hr.start_notify()
 
         # df = FetchActivity(client)
         # await df.start(
@@ -70,15 +73,17 @@ async def main(address: str, key: str):
         # await client.disconnect()
 
         await disconnect_event.wait()
+        hr_task.cancel()
+        await http.close()
+        await decoder.close()
+        await scheduler.close()
         print("Disconnected")
 
 
-async def notify_hr(client):
-    def heart_rate(char, data: bytearray):
-        print(f"Heart rate: {int.from_bytes(data)}")
-
-    heart_rate_measurement_char = client.services.get_characteristic(CHARACTERISTIC_HR)
-    await client.start_notify(heart_rate_measurement_char, heart_rate)
+async def print_hr(hr: HeartRateClient):
+    with hr.subscribe() as samples:
+        async for sample in samples:
+            print(f"Heart rate: {sample.heart_rate} at {sample.timestamp:%H:%M:%S}")
 
 
 if __name__ == "__main__":
@@ -4,7 +4,7 @@ setup(
     name="amazfit_pyclient",
     version="0.2.8",  # Update with your project version
     packages=find_packages(
-        exclude=["tests"],
+        exclude=["tests", "benchmarks"],
     ),
     # include_package_data=False,
     install_requires=[
@@ -27,6 +27,15 @@ setup(
             "httpx",
             "yarl",
         ],
+        "numpy": [
+            "numpy",
+        ],
+        "parquet": [
+            "pyarrow",
+        ],
+        "zstd": [
+            "zstandard",
+        ],
     },
     tests_setup="tests",
 )
@@ -0,0 +1,70 @@
+import random
+from datetime import datetime, timedelta, timezone
+from unittest.mock import Mock
+
+import pytest
+
+from amazfit_pyclient.fetch import FetchActivity, FetchStress, RecordSchema
+from amazfit_pyclient.fetch.utils import SpoolBuffer
+
+START = datetime(2024, 3, 1, tzinfo=timezone.utc)
+
+
+def make(fetch_cls, data: bytes):
+    fetch = fetch_cls(Mock())
+    fetch.buffer = SpoolBuffer()
+    fetch.buffer.write(data)
+    fetch.start_timestamp = START
+    return fetch
+
+
+@pytest.mark.parametrize("fetch_cls", [FetchActivity, FetchStress])
+def test_batch_matches_samples(fetch_cls):
+    data = bytearray(random.Random(7).randbytes(8 * 500))
+    data[16:40] = b"\xff" * 24
+    fetch = make(fetch_cls, data + b"\x01\x02\x03")
+
+    batch = fetch.get_batch()
+    expected = list(fetch.get_samples())
+
+    assert len(batch) == len(expected)
+    assert list(batch.samples()) == expected
+    for view, sample in zip(batch, expected):
+        assert view.timestamp == sample.timestamp
+        assert view.sample() == sample
+    assert batch[-1].sample() == expected[-1]
+    with pytest.raises(AttributeError):
+        batch[0].missing
+
+
+@pytest.mark.parametrize("fetch_cls", [FetchActivity, FetchStress])
+def test_batch_between(fetch_cls):
+    data = bytearray(random.Random(8).randbytes(8 * 500))
+    data[100:300] = b"\xff" * 200
+    fetch = make(fetch_cls, data)
+    batch = fetch.get_batch()
+    samples = list(batch.samples())
+
+    for start, end in [
+        (START - timedelta(hours=1), START + timedelta(minutes=10)),
+        (START + timedelta(minutes=90, seconds=30), START + timedelta(minutes=400)),
+        (START + timedelta(minutes=120), START + timedelta(days=10)),
+        (START + timedelta(days=9), START + timedelta(days=10)),
+    ]:
+        window = batch.between(start, end)
+        assert list(window.samples()) == [
+            i for i in samples if start <= i.timestamp < end
+        ]
+
+
+def test_multibyte_fields():
+    schema = RecordSchema(
+        "word", (("a", "u2"), ("b", "i1")), interval=timedelta(seconds=1)
+    )
+
+    batch = schema.batch(b"\x01\x02\xff\x03\x04\x05", START)
+    assert list(batch.columns["a"]) == [0x0201, 0x0403]
+    assert list(batch.columns["b"]) == [-1, 5]
+    assert batch[1].timestamp == START + timedelta(seconds=1)
+    assert batch.offsets is None
+    assert len(schema.batch(b"", START)) == 0
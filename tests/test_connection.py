@@ -0,0 +1,62 @@
+import asyncio
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+from amazfit_pyclient.chunked_encoder import ChunkedEncoder
+from amazfit_pyclient.chunked_encoder.handlers import ConnectionClient
+
+
+@pytest.mark.asyncio
+async def test_negotiate_mtu():
+    client = Mock()
+    client.mtu_size = 247
+    client.write_gatt_char = AsyncMock()
+    encoder = ChunkedEncoder(client)
+    conn = ConnectionClient(encoder, Mock())
+
+    task = asyncio.create_task(conn.negotiate_mtu())
+    await asyncio.sleep(0)
+    assert encoder.m_mtu == 247
+    assert not encoder.mtu_settled.is_set()
+
+    encrypted = asyncio.create_task(encoder.write(0x01, b"", encrypt=True))
+    await asyncio.sleep(0)
+    assert not encrypted.done()
+
+    await conn(memoryview(b"\x02\xf4\x00"))
+
+    assert await task == 244
+    assert encoder.mtu_settled.is_set()
+    await encrypted
+
+
+@pytest.mark.asyncio
+async def test_negotiate_mtu_timeout():
+    client = Mock()
+    client.mtu_size = 185
+    client.write_gatt_char = AsyncMock()
+    encoder = ChunkedEncoder(client)
+    conn = ConnectionClient(encoder, Mock())
+
+    assert await conn.negotiate_mtu(timeout=0.01) == 185
+    assert encoder.mtu_settled.is_set()
+
+
+@pytest.mark.asyncio
+async def test_negotiate_mtu_above_att_mtu():
+    client = Mock()
+    client.mtu_size = 185
+    client.write_gatt_char = AsyncMock()
+    encoder = ChunkedEncoder(client)
+    conn = ConnectionClient(encoder, Mock())
+
+    task = asyncio.create_task(conn.negotiate_mtu())
+    await asyncio.sleep(0)
+    await conn(memoryview(b"\x02\xf4\x00"))
+
+    assert await task == 185
+    assert encoder.m_mtu == 185
+    # no chunk is larger than an ATT write can carry
+    chunks = list(encoder.encode(0x01, bytes(1000), extended_flags=True))
+    assert max(map(len, chunks)) == 185 - 3
@@ -0,0 +1,181 @@
+import asyncio
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+import pytest_asyncio
+
+from amazfit_pyclient.chunked_encoder import ChunkedDecoder, ChunkedEncoder
+
+
+@pytest.fixture
+def handler():
+    handler = AsyncMock()
+    handler.endpoint = 0x16
+    return handler
+
+
+@pytest_asyncio.fixture
+async def decoder(handler):
+    client = Mock()
+    client.write_gatt_char = AsyncMock()
+    decoder = ChunkedDecoder(client)
+    decoder.add_handler(handler)
+    yield decoder
+    await decoder.close()
+
+
+def chunks(payload: bytes, mtu: int = 23, encrypt: bool = False, key=None):
+    encoder = ChunkedEncoder(Mock())
+    encoder.m_mtu = mtu
+    if key is not None:
+        encoder.set_encryption_parameters(0, key)
+    return encoder, list(encoder.encode(0x16, payload, True, encrypt))
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("size", [1, 14, 15, 1000])
+async def test_reassembly(decoder, handler, size):
+    payload = bytes(i % 251 for i in range(size))
+
+    _, data = chunks(payload)
+    for chunk in data:
+        await decoder.decode(chunk)
+    await decoder.dispatcher.join()
+
+    handler.assert_awaited_once()
+    (buf,), _ = handler.await_args
+    assert isinstance(buf, memoryview)
+    assert buf.readonly
+    assert bytes(buf) == payload
+
+
+@pytest.mark.asyncio
+async def test_reassembly_encrypted(decoder, handler):
+    key = bytes(range(16))
+    decoder.set_encryption_parameters(key)
+    payload = b"\x01" + bytes(range(100))
+
+    encoder, data = chunks(payload, encrypt=True, key=key)
+    # the watch announces the plaintext length in the first chunk
+    header = bytearray(data[0])
+    header[5:9] = len(payload).to_bytes(4, "little")
+    data[0] = bytes(header)
+
+    for chunk in data:
+        await decoder.decode(chunk)
+    await decoder.dispatcher.join()
+
+    (buf,), _ = handler.await_args
+    assert bytes(buf) == payload
+
+
+@pytest.mark.asyncio
+async def test_reassembly_overflow(decoder, handler):
+    _, data = chunks(bytes(100))
+
+    first = bytearray(data[0])
+    first[5:9] = (10).to_bytes(4, "little")
+    await decoder.decode(bytes(first))
+    for chunk in data[1:]:
+        await decoder.decode(chunk)
+    await decoder.dispatcher.join()
+
+    handler.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_interleaved_handles(decoder, handler):
+    encoder = ChunkedEncoder(Mock())
+    first = list(encoder.encode(0x16, b"a" * 100, True))
+    second = list(encoder.encode(0x16, b"b" * 60, True))
+
+    for i in range(max(len(first), len(second))):
+        for data in (first, second):
+            if i < len(data):
+                await decoder.decode(data[i])
+    await decoder.dispatcher.join()
+
+    assert [bytes(i.args[0]) for i in handler.await_args_list] == [
+        b"b" * 60,
+        b"a" * 100,
+    ]
+    assert not decoder.messages
+
+
+@pytest.mark.asyncio
+async def test_stale_messages_evicted(decoder, handler):
+    decoder.max_messages = 2
+    encoder = ChunkedEncoder(Mock())
+    data = [list(encoder.encode(0x16, bytes(100), True)) for _ in range(3)]
+
+    for chunks in data:
+        await decoder.decode(chunks[0])
+
+    assert sorted(decoder.messages) == [2, 3]
+
+    decoder.message_timeout = -1
+    await decoder.decode(list(encoder.encode(0x16, bytes(100), True))[0])
+    assert list(decoder.messages) == [4]
+
+
+@pytest.mark.asyncio
+async def test_slow_handler_does_not_block_decoding(decoder, handler):
+    release = asyncio.Event()
+
+    class Slow:
+        endpoint = 0x17
+
+        async def __call__(self, payload):
+            await release.wait()
+
+    decoder.add_handler(Slow())
+    encoder = ChunkedEncoder(Mock())
+    slow = list(encoder.encode(0x17, b"slow", True))
+    fast = list(encoder.encode(0x16, b"fast", True))
+
+    for chunk in slow + fast:
+        await asyncio.wait_for(decoder.decode(chunk), 1)
+
+    await asyncio.sleep(0)
+    assert bytes(handler.await_args.args[0]) == b"fast"
+    assert decoder.dispatcher.stats[0x17].handled == 0
+
+    release.set()
+    await decoder.dispatcher.join()
+    assert decoder.dispatcher.stats[0x17].handled == 1
+    assert decoder.dispatcher.queue_depth(0x17) == 0
+
+
+@pytest.mark.asyncio
+async def test_dropped_message_is_not_acked(decoder, handler):
+    decoder.dispatcher.queue_size = 1
+    release = asyncio.Event()
+
+    async def wait(payload):
+        await release.wait()
+
+    handler.side_effect = wait
+    encoder = ChunkedEncoder(Mock())
+
+    def message(payload: bytes) -> list[bytes]:
+        data = list(encoder.encode(0x16, payload, True))
+        last = bytearray(data[-1])
+        last[1] |= 0x04
+        return data[:-1] + [bytes(last)]
+
+    # the first is handled, the second queued, the third doesn't fit
+    for payload in (b"a", b"b", b"c"):
+        for chunk in message(payload):
+            await decoder.decode(chunk)
+        await asyncio.sleep(0)
+
+    assert decoder.dispatcher.stats[0x16].dropped == 1
+    assert decoder.client.write_gatt_char.await_count == 2
+
+    release.set()
+    await decoder.dispatcher.join()
+    for chunk in message(b"c"):
+        await decoder.decode(chunk)
+    await decoder.dispatcher.join()
+    assert decoder.client.write_gatt_char.await_count == 3
+    assert [bytes(i.args[0]) for i in handler.await_args_list] == [b"a", b"b", b"c"]
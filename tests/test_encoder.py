@@ -0,0 +1,128 @@
+import random
+from unittest.mock import Mock
+
+import pytest
+from bleak.exc import BleakError
+
+from amazfit_pyclient.chunked_encoder import ChunkedEncoder
+from amazfit_pyclient.chunked_encoder.chunked_endpoint import HeaderFlags
+
+
+def reference_encode(mtu, write_handle, endpoint, payload, encrypt):
+    # the original slicing encoder, extended flags only
+    count = 0
+    header_size = 11
+    while payload:
+        max_chunklength = mtu - 3 - header_size
+        copybytes = min(len(payload), max_chunklength)
+
+        flags = HeaderFlags(0)
+        if encrypt:
+            flags |= HeaderFlags.encrypted
+        if count == 0:
+            flags |= HeaderFlags.first_chunk
+        if len(payload) <= max_chunklength:
+            flags |= HeaderFlags.last_chunk
+
+        header = b"\x03"
+        header += flags.to_bytes(1, "little")
+        header += b"\x00"
+        header += write_handle.to_bytes(1, "little")
+        header += count.to_bytes(1, "little")
+        if count == 0:
+            header += len(payload).to_bytes(4, "little")
+            header += endpoint.to_bytes(2, "little")
+
+        yield header + payload[:copybytes]
+
+        payload = payload[copybytes:]
+        header_size = 5
+        count += 1
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_encode_matches_reference(seed):
+    rnd = random.Random(seed)
+    mtu = rnd.randint(23, 247)
+    endpoint = rnd.randint(0, 0xFFFF)
+    write_handle = rnd.randint(0, 254)
+    max_size = (mtu - 8) * 255
+    payload = rnd.randbytes(rnd.choice([1, rnd.randint(1, max_size)]))
+    encrypt = bool(seed % 2)
+    key = rnd.randbytes(16)
+
+    encoder = ChunkedEncoder(Mock())
+    encoder.m_mtu = mtu
+    encoder.set_encryption_parameters(1, key)
+
+    encoder.write_handle = write_handle
+    chunks = list(encoder.encode(endpoint, payload, True, encrypt))
+
+    encoder.write_handle = write_handle
+    encoder.encrypted_sequence_nr = 1
+    chunks_into = [
+        bytes(i) for i in encoder.encode_into(endpoint, payload, True, encrypt)
+    ]
+
+    encoder.write_handle = write_handle + 1
+    encoder.encrypted_sequence_nr = 1
+    expected = encoder.encrypt(payload) if encrypt else payload
+
+    assert chunks == list(
+        reference_encode(mtu, write_handle + 1, endpoint, expected, encrypt)
+    )
+    assert chunks_into == chunks
+
+
+def test_encode_not_extended():
+    encoder = ChunkedEncoder(Mock())
+    chunks = list(encoder.encode(0x16, bytes(range(30)), False))
+
+    assert [len(i) for i in chunks] == [20, 20, 8]
+    assert chunks[0][:10] == b"\x03\x01\x01\x00\x1e\x00\x00\x00\x16\x00"
+    assert chunks[-1][:4] == b"\x03\x02\x01\x02"
+
+
+class FakeClient:
+    def __init__(self, fail_at: int = -1):
+        self.services = Mock()
+        self.services.get_characteristic.return_value.properties = [
+            "write",
+            "write-without-response",
+        ]
+        self.writes = []
+        self.fail_at = fail_at
+
+    async def write_gatt_char(self, char, data, response=None):
+        if not response and len(self.writes) == self.fail_at:
+            self.fail_at = -1
+            raise BleakError("congested")
+        self.writes.append((bytes(data), response))
+
+
+@pytest.mark.asyncio
+async def test_write_pipelined():
+    client = FakeClient()
+    encoder = ChunkedEncoder(client, pipelined=True, window=3)
+    payload = bytes(200)
+
+    await encoder.write(0x16, payload, True)
+
+    responses = [response for _, response in client.writes]
+    assert responses == ([False] * 3 + [True]) * 3 + [False, True]
+
+    encoder.write_handle = 0
+    assert [data for data, _ in client.writes] == list(
+        encoder.encode(0x16, payload, True)
+    )
+
+
+@pytest.mark.asyncio
+async def test_write_pipelined_congestion():
+    client = FakeClient(fail_at=2)
+    encoder = ChunkedEncoder(client, pipelined=True, window=3)
+
+    await encoder.write(0x16, bytes(100), True)
+
+    responses = [response for _, response in client.writes]
+    assert responses == [False, False] + [True] * 6
@@ -1,6 +1,7 @@
 from unittest.mock import Mock, patch
 
 from amazfit_pyclient.chunked_encoder import ChunkedEncoder
+from amazfit_pyclient.chunked_encoder.aes import SessionCrypto
 
 
 def test_encrypt():
@@ -10,14 +11,18 @@ def test_encrypt():
         encrypted_sequence_number=0xF5C7CB0A - 1,
         final_shared_session_aes=b"\x14\xcd\x905\xd6\xb9U;\xe8$\x8f\x85\x0f!j\xa5",
     )
-    with patch("chunked_encoder.chunked_encoder.encrypt_aes") as mock:
+    with patch.object(SessionCrypto, "encrypt") as mock:
         a.encrypt(
             b'\x02B\x01\x94>\x00\x00\x00{"errorCode":-2001,"httpStatusCode":404,"message":"Not found"}',
         )
 
     mock.assert_called_once_with(
+        46,
         b'\x02B\x01\x94>\x00\x00\x00{"errorCode":-2001,"httpStatusCode":404,"message":"Not found"}\t\xcb\xc7\xf5\t<\x9f]\x00\x00',
-        b":\xe3\xbe\x1b\xf8\x97{\x15\xc6\n\xa1\xab!\x0fD\x8b",
+    )
+    assert (
+        a.crypto.message_key(46)
+        == b":\xe3\xbe\x1b\xf8\x97{\x15\xc6\n\xa1\xab!\x0fD\x8b"
     )
 
 
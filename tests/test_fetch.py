@@ -0,0 +1,611 @@
+import asyncio
+import csv
+import random
+import time
+from datetime import datetime, timezone
+from unittest.mock import Mock
+
+import pytest
+
+from amazfit_pyclient.fetch import (
+    DataFetch,
+    FetchActivity,
+    FetchScheduler,
+    FetchStress,
+    FetchType,
+)
+from amazfit_pyclient.fetch.utils import Checkpoint, SpoolBuffer
+from amazfit_pyclient.fetch.utils.export import CsvExporter
+from benchmarks.fake_watch import FakeFetchClient
+
+
+async def run(fetch, since):
+    await fetch.start(since)
+    async with fetch.in_progress:
+        pass
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("fetch_cls", [FetchActivity, FetchStress])
+async def test_streaming_matches_buffered(tmp_path, monkeypatch, fetch_cls):
+    monkeypatch.chdir(tmp_path)
+    payload = random.Random(0).randbytes(8 * 500)
+    client = FakeFetchClient(payload)
+
+    buffered = fetch_cls(client)
+    await run(buffered, client.start)
+    expected = list(buffered.get_samples())
+    with open(buffered.path) as f:
+        expected_csv = f.read()
+
+    streaming = fetch_cls(client, streaming=True)
+    streamed = []
+    streaming.sinks.append(streamed.append)
+    await run(streaming, client.start)
+
+    assert streamed == expected
+    with open(streaming.path) as f:
+        assert f.read() == expected_csv
+    assert client.acks == [b"\x03\x09", b"\x03\x09"]
+
+
+@pytest.mark.asyncio
+async def test_streaming_samples_iterator(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    client = FakeFetchClient(bytes(range(256)) * 4, packet_size=7)
+    fetch = FetchStress(client, streaming=True)
+
+    samples = fetch.samples()
+    await fetch.start(client.start)
+    result = [sample.stress async for sample in samples]
+
+    assert result == [i for i in range(255)] * 4
+    assert len(list(csv.DictReader(open(fetch.path)))) == 255 * 4
+
+
+@pytest.mark.asyncio
+async def test_samples_iterator_is_bounded(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    client = FakeFetchClient(bytes(range(100)) * 10)
+    fetch = FetchStress(client, streaming=True)
+
+    samples = fetch.samples(maxsize=10)
+    await run(fetch, client.start)
+    result = [sample.stress async for sample in samples]
+
+    # the consumer only started after the transfer, it gets the newest ones
+    assert result == list(range(90, 100))
+    assert fetch.dropped_samples == 990
+
+
+@pytest.mark.asyncio
+async def test_aborted_streaming_fetch_ends_iterators(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    client = FakeFetchClient(bytes(range(100)) * 10, disconnect_after=20)
+    fetch = FetchStress(client, streaming=True, batch_size=1000)
+    received = []
+    fetch.sinks.append(received.append)
+
+    samples = fetch.samples()
+    await fetch.start(client.start)
+    await client.disconnected.wait()
+    await fetch.abort()
+
+    assert len([s async for s in samples]) == 20 * 19
+    assert fetch.finished.is_set()
+    assert not fetch.in_progress.locked()
+    # what arrived was flushed and the exporter closed
+    assert len(list(csv.DictReader(open(fetch.path)))) == 20 * 19
+    # only the fetch's own sinks are gone
+    assert fetch.sinks == [received.append]
+    assert len(received) == 20 * 19
+
+
+@pytest.mark.asyncio
+async def test_caller_sinks_survive_completion(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    client = FakeFetchClient(bytes(range(100)))
+    fetch = FetchStress(client, streaming=True)
+    received = []
+    fetch.sinks.append(received.append)
+
+    await run(fetch, client.start)
+    await run(fetch, client.start)
+
+    assert len(received) == 200
+    assert fetch.sinks == [received.append]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("fetch_cls", [FetchActivity, FetchStress])
+async def test_columnar_matches_samples(tmp_path, monkeypatch, fetch_cls):
+    pytest.importorskip("numpy")
+    monkeypatch.chdir(tmp_path)
+    payload = random.Random(1).randbytes(8 * 300) + b"\xff" * 16
+    client = FakeFetchClient(payload)
+
+    fetch = fetch_cls(client)
+    await run(fetch, client.start)
+    with open(fetch.path) as f:
+        expected_csv = f.read()
+    samples = list(fetch.get_samples())
+
+    columnar = fetch_cls(client, columnar=True)
+    await run(columnar, client.start)
+    columns = columnar.get_columns()
+
+    assert len(columns) == len(samples)
+    assert [dict(zip(columns.names, row)) for row in columns.rows()] == [
+        vars(sample) for sample in samples
+    ]
+    with open(columnar.path) as f:
+        assert f.read() == expected_csv
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("streaming", [False, True])
+async def test_parquet_export(tmp_path, monkeypatch, streaming):
+    pq = pytest.importorskip("pyarrow.parquet")
+    monkeypatch.chdir(tmp_path)
+    client = FakeFetchClient(random.Random(2).randbytes(8 * 250))
+
+    fetch = FetchActivity(
+        client, streaming=streaming, export_format="parquet", batch_size=100
+    )
+    samples = []
+    fetch.sinks.append(samples.append)
+    await run(fetch, client.start)
+    if not streaming:
+        samples = list(fetch.get_samples())
+
+    assert fetch.path.suffix == ".parquet"
+    parquet = pq.ParquetFile(fetch.path.open("rb"))
+    assert parquet.metadata.num_row_groups == 3
+    assert parquet.schema_arrow.metadata == {
+        b"fetch_type": b"ACTIVITY",
+        b"start_timestamp": b"2024-03-01T00:00:00+00:00",
+    }
+    assert parquet.read().to_pylist() == [vars(sample) for sample in samples]
+
+
+def test_parquet_rejects_unsupported_dtype(tmp_path):
+    pytest.importorskip("pyarrow")
+    from amazfit_pyclient.fetch.utils.parquet_export import ParquetExporter
+
+    with pytest.raises(ValueError, match="temperature of dtype f4"):
+        ParquetExporter(
+            tmp_path / "x.parquet",
+            [("steps", "u2"), ("temperature", "f4")],
+            timezone.utc,
+            {},
+        )
+    assert not (tmp_path / "x.parquet").exists()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("seed", range(5))
+async def test_resume_after_disconnects(tmp_path, monkeypatch, seed):
+    monkeypatch.chdir(tmp_path)
+    rnd = random.Random(seed)
+    payload = rnd.randbytes(8 * 2000)
+    start = FakeFetchClient(payload).start
+
+    reference = FetchActivity(FakeFetchClient(payload))
+    await run(reference, start)
+    expected = list(reference.get_samples())
+    reference.path.unlink()
+
+    attempts = 0
+    while True:
+        attempts += 1
+        client = FakeFetchClient(payload, disconnect_after=rnd.randint(0, 400))
+        fetch = FetchActivity(
+            client, checkpoint_dir=tmp_path / "spool", checkpoint_every=16
+        )
+        (tmp_path / "spool").mkdir(exist_ok=True)
+        await fetch.start(start)
+
+        done = asyncio.create_task(fetch.in_progress.acquire())
+        disconnected = asyncio.create_task(client.disconnected.wait())
+        await asyncio.wait([done, disconnected], return_when=asyncio.FIRST_COMPLETED)
+        done.cancel()
+        disconnected.cancel()
+        if not client.disconnected.is_set():
+            break
+        # lets the queued checkpoint writes finish
+        await fetch.abort()
+
+    assert attempts > 1
+    assert list(fetch.get_samples()) == expected
+    with open(fetch.path) as f:
+        assert len(f.readlines()) == len(expected) + 1
+    assert not list((tmp_path / "spool").iterdir())
+
+
+@pytest.mark.asyncio
+async def test_fetch_scheduler(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    payload = random.Random(3).randbytes(8 * 100)
+    client = FakeFetchClient(payload)
+    subscriptions = []
+    start_notify = client.start_notify
+
+    async def count_start_notify(char, callback):
+        subscriptions.append(char)
+        await start_notify(char, callback)
+
+    client.start_notify = count_start_notify
+
+    scheduler = FetchScheduler(client)
+    stats = await scheduler.run(
+        [
+            (FetchType.ACTIVITY, client.start),
+            (FetchType.STRESS_AUTOMATIC, client.start),
+            (FetchType.TEMPERATURE, client.start),
+        ]
+    )
+
+    assert len(subscriptions) == 2
+    assert [i.fetch_type for i in stats] == [
+        FetchType.ACTIVITY,
+        FetchType.STRESS_AUTOMATIC,
+        FetchType.TEMPERATURE,
+    ]
+    assert all(i.received_bytes == len(payload) and i.error is None for i in stats)
+    assert client.acks == [b"\x03\x09"] * 3
+    assert sorted(i.name for i in tmp_path.iterdir()) == [
+        "activity.2024-03-01T00:00:00+00:00.csv",
+        "stress_automatic.2024-03-01T00:00:00+00:00.csv",
+        "temperature.2024-03-01T00:00:00+00:00.bin",
+    ]
+    assert [i.packets for i in stats] == [-(-len(payload) // 19)] * 3
+
+
+@pytest.mark.asyncio
+async def test_fetch_scheduler_skips_stalled_job(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    payload = random.Random(3).randbytes(8 * 100)
+    client = FakeFetchClient(payload, disconnect_after=10)
+    scheduler = FetchScheduler(client, idle_timeout=0.1)
+
+    async def reconnect():
+        await client.disconnected.wait()
+        client.disconnect_after = None
+
+    task = asyncio.create_task(reconnect())
+    stats = await asyncio.wait_for(
+        scheduler.run(
+            [
+                (FetchType.ACTIVITY, client.start),
+                (FetchType.STRESS_AUTOMATIC, client.start),
+            ]
+        ),
+        5,
+    )
+    await task
+
+    assert stats[0].error == "timeout: no data for 0.1s"
+    assert stats[0].packets == 10
+    assert stats[1].error is None
+    assert stats[1].received_bytes == len(payload)
+
+
+@pytest.mark.asyncio
+async def test_fetch_scheduler_reports_rejected_job(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    payload = random.Random(3).randbytes(8 * 100)
+    client = FakeFetchClient(payload)
+    start_date_response = client.start_date_response
+    rejected = {FetchType.ACTIVITY}
+
+    def reject():
+        response = bytearray(start_date_response())
+        if rejected:
+            rejected.pop()
+            response[2] = 0x02
+        return bytes(response)
+
+    client.start_date_response = reject
+    stats = await asyncio.wait_for(
+        FetchScheduler(client).run(
+            [
+                (FetchType.ACTIVITY, client.start),
+                (FetchType.STRESS_AUTOMATIC, client.start),
+            ]
+        ),
+        5,
+    )
+
+    assert stats[0].error == "Failed to start date: 0x2"
+    assert stats[1].error is None
+    assert stats[1].received_bytes == len(payload)
+
+
+@pytest.mark.asyncio
+async def test_fetch_scheduler_requests_next_job_during_export(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    payload = random.Random(3).randbytes(8 * 100)
+    client = FakeFetchClient(payload)
+    write_gatt_char = client.write_gatt_char
+    requests = []
+
+    async def record_requests(char, data, response=None):
+        if data[0] == 0x01:
+            requests.append(time.perf_counter())
+        await write_gatt_char(char, data, response)
+
+    client.write_gatt_char = record_requests
+    export = FetchActivity.export
+
+    def slow_export(self):
+        time.sleep(0.2)
+        export(self)
+
+    monkeypatch.setattr(FetchActivity, "export", slow_export)
+    stats = await FetchScheduler(client).run(
+        [
+            (FetchType.ACTIVITY, client.start),
+            (FetchType.STRESS_AUTOMATIC, client.start),
+        ]
+    )
+
+    assert all(i.error is None for i in stats)
+    assert requests[1] < stats[0].finished
+    assert (
+        len(list(csv.reader(open(tmp_path / "activity.2024-03-01T00:00:00+00:00.csv"))))
+        == 101
+    )
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("columnar", [False, True])
+async def test_spooled_matches_in_memory(tmp_path, monkeypatch, columnar):
+    if columnar:
+        pytest.importorskip("numpy")
+    monkeypatch.chdir(tmp_path)
+    payload = random.Random(4).randbytes(8 * 400)
+    client = FakeFetchClient(payload)
+
+    in_memory = FetchActivity(client, columnar=columnar)
+    await run(in_memory, client.start)
+    with open(in_memory.path) as f:
+        expected = f.read()
+
+    spooled = FetchActivity(client, columnar=columnar)
+    spooled.spool_threshold = 256
+    await run(spooled, client.start)
+
+    assert spooled.buffer.spilled
+    assert list(spooled.get_samples()) == list(in_memory.get_samples())
+    with open(spooled.path) as f:
+        assert f.read() == expected
+    assert not list(tmp_path.glob(".spool-*"))
+
+
+@pytest.mark.asyncio
+async def test_spooled_raw_fetch_is_renamed(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    payload = random.Random(5).randbytes(5000)
+    client = FakeFetchClient(payload)
+
+    fetch = DataFetch(client)
+    fetch.spool_threshold = 1024
+    await fetch.start(FetchType.DEBUG_LOGS, client.start)
+    await fetch.finished.wait()
+
+    assert fetch.path.with_suffix(".bin").read_bytes() == payload
+    assert not list(tmp_path.glob(".spool-*"))
+
+
+@pytest.mark.asyncio
+async def test_export_keeps_loop_responsive(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    fetch = FetchActivity(Mock())
+    fetch.fetch_type = FetchType.ACTIVITY
+    fetch.start_timestamp = datetime(2024, 3, 1, tzinfo=timezone.utc)
+    fetch.buffer = SpoolBuffer()
+    fetch.buffer.write(random.Random(9).randbytes(8 * 30000))
+
+    lags = []
+
+    async def ticker():
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(0.005)
+            lags.append(time.perf_counter() - start - 0.005)
+
+    task = asyncio.create_task(ticker())
+    await asyncio.sleep(0.01)
+    start = time.perf_counter()
+    await fetch.on_transaction_complete()
+    elapsed = time.perf_counter() - start
+    # let a tick delayed by a blocked loop report
+    await asyncio.sleep(0.01)
+    task.cancel()
+
+    assert len(list(csv.reader(open(fetch.path)))) == 30001
+    # the export itself takes longer than the slowest tick
+    assert max(lags) < min(0.1, elapsed)
+
+
+@pytest.mark.asyncio
+async def test_streaming_flush_doesnt_delay_notifications(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write = CsvExporter.write
+
+    def slow_write(self, timestamp, columns):
+        time.sleep(0.1)
+        write(self, timestamp, columns)
+
+    monkeypatch.setattr(CsvExporter, "write", slow_write)
+    # 53 packets at 200/s, a batch every ~5 packets
+    client = FakeFetchClient(bytes(range(100)) * 10, rate=200)
+    fetch = FetchStress(client, streaming=True, batch_size=100)
+
+    arrivals = []
+    handle = fetch.handle_activity_data
+
+    async def timed(char, data):
+        arrivals.append(time.perf_counter())
+        await handle(char, data)
+
+    monkeypatch.setattr(fetch, "handle_activity_data", timed)
+    await run(fetch, client.start)
+
+    assert len(arrivals) == 53
+    gaps = [b - a for a, b in zip(arrivals, arrivals[1:])]
+    # a flush on the loop would hold a notification back for 0.1s
+    assert max(gaps) < 0.05
+    assert len(list(csv.DictReader(open(fetch.path)))) == 1000
+
+
+@pytest.mark.asyncio
+async def test_checkpoints_dont_delay_notifications(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    append = Checkpoint.append
+    saved = []
+
+    def slow_append(self, data, state):
+        time.sleep(0.1)
+        append(self, data, state)
+        saved.append(self.length)
+
+    monkeypatch.setattr(Checkpoint, "append", slow_append)
+    client = FakeFetchClient(bytes(range(100)) * 10, rate=200)
+    fetch = FetchStress(client, checkpoint_dir=tmp_path, checkpoint_every=5)
+
+    arrivals = []
+    handle = fetch.handle_activity_data
+
+    async def timed(char, data):
+        arrivals.append(time.perf_counter())
+        await handle(char, data)
+
+    monkeypatch.setattr(fetch, "handle_activity_data", timed)
+    await run(fetch, client.start)
+
+    gaps = [b - a for a, b in zip(arrivals, arrivals[1:])]
+    # a checkpoint written on the loop would hold a notification back
+    assert max(gaps) < 0.05
+    # written in order, every one after the data before it
+    assert saved == [n * 5 * 19 for n in range(1, 11)]
+    assert not list(tmp_path.glob("*.partial.*"))
+
+
+def test_checkpoint_without_data_file(tmp_path):
+    checkpoint = Checkpoint(tmp_path / "activity")
+    checkpoint.append(b"\x00" * 16, {"since": "2024-03-01T00:00:00+00:00"})
+    assert checkpoint.load()["length"] == 16
+
+    checkpoint.data_path.unlink()
+    assert checkpoint.load() is None
+
+
+LOST_PACKETS = [5, 6, 255, 256, 336]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("mode", ["buffered", "streaming", "columnar", "batch"])
+async def test_lost_packets_are_skipped(tmp_path, monkeypatch, mode):
+    if mode == "columnar":
+        pytest.importorskip("numpy")
+    monkeypatch.chdir(tmp_path)
+    payload = random.Random(10).randbytes(8 * 800)
+
+    reference = FetchActivity(FakeFetchClient(payload))
+    await run(reference, reference.client.start)
+    # packets 5-6 and 255-256 are lost together, 336 is the last one
+    lost = [(5 * 19, 7 * 19), (255 * 19, 257 * 19), (336 * 19, len(payload))]
+    expected = [
+        sample
+        for n, sample in enumerate(reference.get_samples())
+        if not any(start < (n + 1) * 8 and n * 8 < end for start, end in lost)
+    ]
+
+    client = FakeFetchClient(payload, drop=LOST_PACKETS)
+    fetch = FetchActivity(
+        client, streaming=mode == "streaming", columnar=mode == "columnar"
+    )
+    samples = []
+    if mode == "streaming":
+        fetch.sinks.append(samples.append)
+    await run(fetch, client.start)
+
+    if mode == "buffered":
+        samples = list(fetch.get_samples())
+    elif mode == "batch":
+        samples = list(fetch.get_batch().samples())
+    elif mode == "columnar":
+        columns = fetch.get_columns()
+        samples = [fetch.sample_type(*row) for row in columns.rows()]
+
+    assert samples == expected
+    assert fetch.gaps == lost
+    assert fetch.loss.lost_packets == len(LOST_PACKETS)
+    assert fetch.loss.lost_bytes == 4 * 19 + 16
+    assert fetch.loss.packets == 337 - len(LOST_PACKETS)
+    assert len(list(csv.reader(open(fetch.path)))) == len(expected) + 1
+    assert client.acks == [b"\x03\x09"]
+
+
+@pytest.mark.asyncio
+async def test_lost_packets_raw(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    payload = random.Random(11).randbytes(8 * 800)
+    client = FakeFetchClient(payload, drop=LOST_PACKETS)
+
+    fetch = DataFetch(client)
+    await fetch.start(FetchType.DEBUG_LOGS, client.start)
+    await fetch.finished.wait()
+
+    data = bytearray(payload)
+    for start, end in fetch.gaps:
+        data[start:end] = b"\xff" * (end - start)
+    assert fetch.path.with_suffix(".bin").read_bytes() == data
+    assert fetch.loss.loss_rate == len(LOST_PACKETS) / 337
+
+
+@pytest.mark.asyncio
+async def test_out_of_order_packet_is_dropped(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    payload = random.Random(12).randbytes(8 * 10)
+    client = FakeFetchClient(payload)
+    packets = client.packets
+
+    def repeated():
+        sent = list(packets())
+        yield from sent[:3]
+        yield sent[1]
+        yield from sent[3:]
+
+    client.packets = repeated
+    fetch = FetchActivity(client)
+    await run(fetch, client.start)
+
+    assert fetch.loss.out_of_order == 1
+    assert fetch.gaps == []
+    assert len(list(fetch.get_samples())) == 10
+
+
+@pytest.mark.asyncio
+async def test_burst_loss_is_a_gap(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    payload = random.Random(13).randbytes(8 * 800)
+
+    reference = FetchActivity(FakeFetchClient(payload))
+    await run(reference, reference.client.start)
+
+    client = FakeFetchClient(payload, drop=range(100, 250))
+    fetch = FetchActivity(client)
+    await run(fetch, client.start)
+
+    lost = (100 * 19, 250 * 19)
+    expected = [
+        sample
+        for n, sample in enumerate(reference.get_samples())
+        if not (lost[0] < (n + 1) * 8 and n * 8 < lost[1])
+    ]
+    assert fetch.gaps == [lost]
+    assert fetch.loss.lost_packets == 150
+    assert fetch.loss.out_of_order == 0
+    assert list(fetch.get_samples()) == expected
@@ -0,0 +1,147 @@
+import asyncio
+import time
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+from amazfit_pyclient.chunked_encoder import ChunkedEncoder
+from amazfit_pyclient.chunked_encoder.handlers import HttpClient
+from amazfit_pyclient.chunked_encoder.handlers.utils import (
+    HttpUpstream,
+    ResponseCache,
+)
+from tests.utils import StandInServer
+
+pytest.importorskip("httpx")
+
+SUCCESS = 0x01
+NO_INTERNET = 0x02
+
+
+def make(**kwargs) -> HttpClient:
+    client = Mock()
+    client.mtu_size = 247
+    upstream = HttpUpstream()
+    http = HttpClient(
+        ChunkedEncoder(client),
+        Mock(),
+        upstream=upstream,
+        cache=ResponseCache(upstream, ttl=0),
+        **kwargs,
+    )
+    http.write = AsyncMock()
+    return http
+
+
+def replies(http: HttpClient) -> list[tuple[int, int]]:
+    """(request_id, response code) in the order the replies were written"""
+    return [(c.args[0][1], c.args[0][2]) for c in http.write.call_args_list]
+
+
+async def run(http: HttpClient, urls: list[str]) -> float:
+    start = time.monotonic()
+    await asyncio.gather(*(http.dispatch(n, "GET", url) for n, url in enumerate(urls)))
+    return time.monotonic() - start
+
+
+@pytest.mark.asyncio
+async def test_throughput_scales_with_concurrency():
+    async with StandInServer(latency=0.05) as server:
+        # distinct urls, the cache would share one fetch between equal ones
+        urls = [f"{server.url}/weather?n={n}" for n in range(8)]
+
+        serial = make(concurrency=1)
+        serial_time = await run(serial, urls)
+        await serial.close()
+        assert server.peak == 1
+
+        server.peak = 0
+        parallel = make(concurrency=8)
+        parallel_time = await run(parallel, urls)
+        await parallel.close()
+        assert server.peak == 8
+
+    assert serial_time >= 0.4
+    assert parallel_time < serial_time / 3
+    assert sorted(replies(parallel)) == [(n, SUCCESS) for n in range(8)]
+
+
+@pytest.mark.asyncio
+async def test_concurrency_cap_is_respected():
+    async with StandInServer(latency=0.02) as server:
+        http = make(concurrency=3)
+        await run(http, [f"{server.url}/?n={n}" for n in range(12)])
+        await http.close()
+
+    assert server.peak == 3
+    assert http.proxy_stats.completed == 12
+
+
+@pytest.mark.asyncio
+async def test_replies_go_out_as_requests_finish():
+    async with StandInServer() as server:
+        http = make(timeout=0.3)
+        await run(
+            http,
+            [
+                f"{server.url}/delay/1",
+                f"{server.url}/delay/0.1",
+                f"{server.url}/delay/0",
+            ],
+        )
+        await http.close()
+
+    # the slow request timed out after the others were answered
+    assert replies(http) == [(2, SUCCESS), (1, SUCCESS), (0, NO_INTERNET)]
+    assert http.proxy_stats.timeouts == 1
+
+
+@pytest.mark.asyncio
+async def test_handler_returns_before_the_response():
+    async with StandInServer(latency=0.1) as server:
+        http = make()
+        url = f"{server.url}/".encode()
+        payload = memoryview(b"\x01\x00\x05GET\0" + url + b"\0\x01Accept\0*/*\0\0\0\0")
+
+        await asyncio.wait_for(http(payload), 0.05)
+        assert list(http.tasks) == [5]
+        await asyncio.gather(*http.tasks.values())
+        await http.close()
+
+    assert replies(http) == [(5, SUCCESS)]
+
+
+@pytest.mark.asyncio
+async def test_close_cancels_requests_in_flight():
+    async with StandInServer(latency=5) as server:
+        http = make()
+        for n in range(4):
+            http.dispatch(n, "GET", f"{server.url}/?n={n}")
+        await asyncio.sleep(0.05)
+
+        await asyncio.wait_for(http.close(), 1)
+
+    assert http.tasks == {}
+    http.write.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_post_with_body_is_rejected():
+    async with StandInServer() as server:
+        http = make()
+        url = f"{server.url}/submit".encode()
+        payload = memoryview(
+            b"\x01\x00\x07POST\0"
+            + url
+            + b"\0\x01Content-Type\0application/json\0\0\0\0"
+            + b'{"steps": 1200}'
+        )
+
+        await http(payload)
+        await asyncio.gather(*http.tasks.values())
+        await http.close()
+
+    # answered with an error rather than forwarded without its body
+    assert replies(http) == [(7, NO_INTERNET)]
+    assert server.requests == 0
+    assert http.proxy_stats.failed == 1
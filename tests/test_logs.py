@@ -0,0 +1,150 @@
+import asyncio
+import gzip
+import os
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+from amazfit_pyclient.chunked_encoder import ChunkedEncoder
+from amazfit_pyclient.chunked_encoder.handlers import LogsClient
+from amazfit_pyclient.chunked_encoder.handlers.utils import (
+    LogEntry,
+    LogWriter,
+    parse_log_entry,
+)
+
+
+def logs_data(session_id: int, index: int, message: bytes) -> memoryview:
+    return memoryview(
+        bytes([0x07, session_id, index])
+        + b"com.example.app\x002024-03-26 13:20:47\x00"
+        + message
+        + b"\x00"
+    )
+
+
+def make(writer=None) -> LogsClient:
+    client = Mock()
+    client.mtu_size = 247
+    client.write_gatt_char = AsyncMock()
+    return LogsClient(ChunkedEncoder(client), Mock(), writer=writer)
+
+
+def read_lines(directory) -> list[str]:
+    lines = []
+    for name in sorted(os.listdir(directory)):
+        with gzip.open(os.path.join(directory, name), "rt") as f:
+            # entries may contain other line boundaries, only \n ends them
+            lines += f.read().split("\n")[:-1]
+    return lines
+
+
+def test_parse_log_entry():
+    entry = parse_log_entry(logs_data(3, 17, b"value\x00with nul")[1:])
+
+    assert entry == LogEntry(
+        3, 17, "com.example.app", "2024-03-26 13:20:47", "value with nul"
+    )
+    assert entry.line() == (
+        "2024-03-26 13:20:47 3:17 [com.example.app] value with nul\n"
+    )
+
+
+def test_multiline_message_stays_on_one_line():
+    entry = parse_log_entry(logs_data(1, 0, b"Traceback\n  line 1\r\n")[1:])
+    assert entry.line() == (
+        "2024-03-26 13:20:47 1:0 [com.example.app] Traceback\\n  line 1\\r\\n\n"
+    )
+
+
+def test_parse_truncated_log_entry():
+    entry = parse_log_entry(b"\x01\x02app")
+    assert (entry.app_id, entry.timestamp, entry.message) == ("app", "", "")
+
+
+@pytest.mark.asyncio
+async def test_missed_indexes_are_counted():
+    logs = make()
+
+    for index in (254, 255, 0, 3):
+        await logs(logs_data(1, index, b"x"))
+    await logs(logs_data(2, 10, b"x"))
+
+    assert logs.missed == 2
+    assert logs.indexes == {1: 3, 2: 10}
+
+
+@pytest.mark.asyncio
+async def test_entries_are_written_compressed(tmp_path):
+    async with LogWriter(str(tmp_path), batch_size=8) as writer:
+        logs = make(writer)
+        for n in range(100):
+            await logs(logs_data(1, n, b"entry %i" % n))
+
+    assert writer.stats.written == 100
+    assert writer.stats.dropped == 0
+    lines = read_lines(tmp_path)
+    assert len(lines) == 100
+    assert lines[42] == "2024-03-26 13:20:47 1:42 [com.example.app] entry 42"
+
+
+@pytest.mark.asyncio
+async def test_partial_batch_is_flushed_on_interval(tmp_path):
+    async with LogWriter(str(tmp_path), flush_interval=0.01) as writer:
+        writer.submit(parse_log_entry(logs_data(1, 0, b"alone")[1:]))
+        await asyncio.sleep(0.1)
+        assert writer.stats.written == 1
+
+
+@pytest.mark.asyncio
+async def test_files_are_rotated_by_size(tmp_path):
+    async with LogWriter(str(tmp_path), max_bytes=1024, batch_size=50) as writer:
+        for n in range(2000):
+            writer.submit(parse_log_entry(logs_data(1, n & 0xFF, os.urandom(16))[1:]))
+            if n % 50 == 0:
+                await asyncio.sleep(0)
+
+    assert writer.stats.files > 1
+    assert len(os.listdir(tmp_path)) == writer.stats.files
+    assert len(read_lines(tmp_path)) == writer.stats.written
+
+
+@pytest.mark.asyncio
+async def test_files_are_rotated_by_age(tmp_path):
+    async with LogWriter(str(tmp_path), max_age=0.05, flush_interval=0.01) as writer:
+        writer.submit(parse_log_entry(logs_data(1, 0, b"first")[1:]))
+        await asyncio.sleep(0.1)
+        writer.submit(parse_log_entry(logs_data(1, 1, b"second")[1:]))
+
+    assert writer.stats.files == 2
+    assert len(read_lines(tmp_path)) == 2
+
+
+@pytest.mark.asyncio
+async def test_flood_drops_batches_instead_of_blocking(tmp_path):
+    writer = LogWriter(str(tmp_path), batch_size=10, max_batches=2)
+    writer.start()
+    entry = parse_log_entry(logs_data(1, 0, b"flood")[1:])
+
+    # nothing awaits, so the writer never gets to run
+    for _ in range(1000):
+        writer.submit(entry)
+
+    assert writer.stats.dropped == 980
+    await writer.close()
+    assert writer.stats.written == 20
+    assert writer.stats.received == writer.stats.written + writer.stats.dropped
+
+
+@pytest.mark.asyncio
+async def test_zstd_compression(tmp_path):
+    zstandard = pytest.importorskip("zstandard")
+
+    async with LogWriter(str(tmp_path), compression="zstd") as writer:
+        writer.submit(parse_log_entry(logs_data(1, 0, b"zstd")[1:]))
+
+    (name,) = os.listdir(tmp_path)
+    assert name.endswith(".log.zst")
+    with open(tmp_path / name, "rb") as f:
+        data = zstandard.ZstdDecompressor().stream_reader(f).read()
+    assert data.endswith(b"zstd\n")
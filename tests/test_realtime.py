@@ -0,0 +1,147 @@
+import asyncio
+import struct
+from datetime import datetime
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+from amazfit_pyclient.chunked_encoder import ChunkedEncoder
+from amazfit_pyclient.chunked_encoder.handlers import (
+    HeartRateClient,
+    OverflowPolicy,
+    RealtimeStream,
+    StepsClient,
+)
+
+
+def make(client_cls):
+    client = Mock()
+    client.mtu_size = 247
+    client.write_gatt_char = AsyncMock()
+    client.start_notify = AsyncMock()
+    return client_cls(ChunkedEncoder(client), Mock())
+
+
+async def take(subscription, n: int) -> list:
+    result = []
+    async for item in subscription:
+        result.append(item)
+        if len(result) == n:
+            break
+    return result
+
+
+@pytest.mark.asyncio
+async def test_every_subscriber_gets_every_sample():
+    stream = RealtimeStream()
+    first = stream.subscribe()
+    second = stream.subscribe()
+
+    for n in range(3):
+        stream.publish_nowait(n)
+
+    assert await take(first, 3) == [0, 1, 2]
+    assert await take(second, 3) == [0, 1, 2]
+
+
+@pytest.mark.asyncio
+async def test_drop_oldest_keeps_the_buffer_bounded():
+    stream = RealtimeStream()
+    subscription = stream.subscribe(maxsize=4)
+
+    for n in range(10_000):
+        stream.publish_nowait(n)
+
+    assert len(subscription.buffer) == 4
+    assert subscription.dropped == 9_996
+    assert await take(subscription, 4) == [9_996, 9_997, 9_998, 9_999]
+
+
+@pytest.mark.asyncio
+async def test_backpressure_waits_for_the_consumer():
+    stream = RealtimeStream()
+    subscription = stream.subscribe(maxsize=2, policy=OverflowPolicy.BACKPRESSURE)
+
+    await stream.publish(0)
+    await stream.publish(1)
+    publish = asyncio.create_task(stream.publish(2))
+    await asyncio.sleep(0.01)
+    assert not publish.done()
+
+    assert await take(subscription, 1) == [0]
+    await asyncio.wait_for(publish, 1)
+    assert await take(subscription, 2) == [1, 2]
+    assert subscription.dropped == 0
+
+    # callbacks can't wait, the new sample is dropped instead
+    stream.publish_nowait(3)
+    stream.publish_nowait(4)
+    stream.publish_nowait(5)
+    assert subscription.dropped == 1
+    assert await take(subscription, 2) == [3, 4]
+
+
+@pytest.mark.asyncio
+async def test_closed_subscription_ends_iteration():
+    stream = RealtimeStream()
+    with stream.subscribe() as subscription:
+        stream.publish_nowait(1)
+        consumer = asyncio.create_task(take(subscription, 10))
+        await asyncio.sleep(0)
+
+    assert await asyncio.wait_for(consumer, 1) == [1]
+    assert stream.subscribers == []
+    stream.publish_nowait(2)
+    assert not subscription.buffer
+
+
+@pytest.mark.asyncio
+async def test_heart_rate_measurements_are_timestamped_on_arrival():
+    hr = make(HeartRateClient)
+    await hr.start_notify()
+    subscription = hr.subscribe()
+
+    before = datetime.now().astimezone()
+    hr.on_measurement(None, bytearray([0x00, 72]))
+    hr.on_measurement(None, bytearray([0x01, 0x2C, 0x01]))
+    after = datetime.now().astimezone()
+
+    samples = await take(subscription, 2)
+    assert [s.heart_rate for s in samples] == [72, 300]
+    assert all(before <= s.timestamp <= after for s in samples)
+
+
+@pytest.mark.asyncio
+async def test_realtime_steps_are_published():
+    steps = make(StepsClient)
+    subscription = steps.subscribe()
+
+    await steps(memoryview(struct.pack("<BBiii", 0x07, 0, 1200, 900, 40)))
+
+    (sample,) = await take(subscription, 1)
+    assert (sample.steps, sample.meters, sample.calories) == (1200, 900, 40)
+    assert sample.timestamp.tzinfo is not None
+    await steps.close()
+
+
+@pytest.mark.asyncio
+async def test_backpressured_steps_subscriber_doesnt_block_handler():
+    steps = make(StepsClient)
+    steps.pending_samples = asyncio.Queue(2)
+    subscription = steps.subscribe(maxsize=1, policy=OverflowPolicy.BACKPRESSURE)
+
+    for n in range(5):
+        notification = struct.pack("<BBiii", 0x07, 0, n, 0, 0)
+        await asyncio.wait_for(steps(memoryview(notification)), 1)
+        await asyncio.sleep(0)
+
+    # one sample buffered, one held by the publisher, two waiting for it
+    assert steps.dropped == 1
+    request = asyncio.create_task(steps.get_steps())
+    await asyncio.sleep(0)
+    await steps(memoryview(struct.pack("<BBB3I", 0x04, 0, 0, 10, 20, 1)))
+    assert (await asyncio.wait_for(request, 1)).steps == 10
+
+    samples = await take(subscription, 4)
+    assert [s.steps for s in samples] == [0, 1, 2, 3]
+    await steps.close()
@@ -0,0 +1,133 @@
+import asyncio
+import struct
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+from amazfit_pyclient.chunked_encoder import ChunkedEncoder
+from amazfit_pyclient.chunked_encoder.handlers import (
+    BaseHandler,
+    BatteryClient,
+    BatteryInfo,
+    ConnectionClient,
+    HttpClient,
+    Steps,
+    StepsClient,
+)
+from amazfit_pyclient.chunked_encoder.handlers.battery_handler import BatteryStatus
+
+
+def make(client_cls):
+    client = Mock()
+    client.mtu_size = 247
+    client.write_gatt_char = AsyncMock()
+    return client_cls(ChunkedEncoder(client), Mock())
+
+
+def steps_reply(steps: int) -> memoryview:
+    return memoryview(struct.pack("<BBB3I", 0x04, 0, 0, steps, steps * 2, steps // 10))
+
+
+@pytest.mark.asyncio
+async def test_pipelined_requests_resolve_in_order():
+    steps = make(StepsClient)
+
+    requests = [asyncio.create_task(steps.get_steps()) for _ in range(3)]
+    await asyncio.sleep(0)
+    for n in (100, 200, 300):
+        await steps(steps_reply(n))
+
+    assert await asyncio.gather(*requests) == [
+        Steps(100, 200, 10),
+        Steps(200, 400, 20),
+        Steps(300, 600, 30),
+    ]
+    stats = steps.stats[(steps.endpoint, 0x04)]
+    assert stats.completed == 3
+    assert stats.latency_max >= stats.latency_avg > 0
+
+
+@pytest.mark.asyncio
+async def test_request_timeout():
+    steps = make(StepsClient)
+
+    with pytest.raises(asyncio.TimeoutError):
+        await steps.get_steps(timeout=0.01)
+    assert steps.stats[(steps.endpoint, 0x04)].timeouts == 1
+    await asyncio.sleep(0)
+    assert steps.pending == {}
+
+    # the timed out request no longer takes replies
+    request = asyncio.create_task(steps.get_steps())
+    await asyncio.sleep(0)
+    await steps(steps_reply(5))
+    assert await request == Steps(5, 10, 0)
+    assert steps.pending == {}
+
+
+@pytest.mark.asyncio
+async def test_unanswered_requests_dont_pile_up():
+    steps = make(StepsClient)
+
+    for _ in range(100):
+        with pytest.raises(asyncio.TimeoutError):
+            await steps.get_steps(timeout=0)
+    cancelled = asyncio.create_task(steps.get_steps())
+    await asyncio.sleep(0)
+    cancelled.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await cancelled
+    await asyncio.sleep(0)
+    assert steps.pending == {}
+
+    request = asyncio.create_task(steps.get_steps())
+    await asyncio.sleep(0)
+    assert len(steps.pending[(steps.endpoint, 0x04)]) == 1
+    await steps(steps_reply(7))
+    assert await request == Steps(7, 14, 0)
+
+
+@pytest.mark.asyncio
+async def test_handler_error_fails_request():
+    battery = make(BatteryClient)
+
+    request = asyncio.create_task(battery.request_status())
+    await asyncio.sleep(0)
+    await battery(memoryview(b"\x04\x00"))
+
+    with pytest.raises(struct.error):
+        await request
+    assert battery.stats[(battery.endpoint, 0x04)].failed == 1
+
+
+@pytest.mark.asyncio
+async def test_typed_results():
+    battery = make(BatteryClient)
+    conn = make(ConnectionClient)
+
+    status = asyncio.create_task(battery.request_status())
+    mtu = asyncio.create_task(conn.get_mtu())
+    ping = asyncio.create_task(conn.ping())
+    await asyncio.sleep(0)
+
+    date = struct.pack("<H6B", 2024, 3, 1, 12, 0, 0, 0)
+    await battery(memoryview(b"\x04\x0f\x50\x01" + date + date + b"\x64"))
+    await conn(memoryview(b"\x02\xf4\x00"))
+    await conn(memoryview(b"\x04"))
+
+    info = await status
+    assert isinstance(info, BatteryInfo)
+    assert (info.level, info.status, info.last_charge_level) == (
+        80,
+        BatteryStatus.CHARGING,
+        100,
+    )
+    assert await mtu == 244
+    assert await ping >= 0
+
+
+def test_no_handler_shadows_query():
+    # HttpClient.request proxies watch requests, it isn't the reply API
+    assert "request" in vars(HttpClient)
+    for cls in BaseHandler.__subclasses__():
+        assert cls.query is BaseHandler.query, cls
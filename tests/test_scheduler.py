@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+
+from amazfit_pyclient.chunked_encoder import OutboundScheduler
+from amazfit_pyclient.chunked_encoder.chunked_endpoint import ChunkedEndpoint
+
+
+@pytest.mark.asyncio
+async def test_priority_order():
+    scheduler = OutboundScheduler()
+    started = asyncio.Event()
+    release = asyncio.Event()
+    sent = []
+
+    def message(name, block=False):
+        async def send():
+            sent.append(name)
+            if block:
+                started.set()
+                await release.wait()
+
+        return send
+
+    tasks = [
+        asyncio.create_task(
+            scheduler.submit(ChunkedEndpoint.HTTP, message("http 1", block=True))
+        )
+    ]
+    await started.wait()
+
+    for endpoint, name in [
+        (ChunkedEndpoint.HTTP, "http 2"),
+        (ChunkedEndpoint.BATTERY, "battery"),
+        (ChunkedEndpoint.CONNECT, "ping"),
+    ]:
+        tasks.append(asyncio.create_task(scheduler.submit(endpoint, message(name))))
+    await asyncio.sleep(0)
+    assert scheduler.pending() == 3
+
+    release.set()
+    await asyncio.gather(*tasks)
+
+    assert sent == ["http 1", "ping", "battery", "http 2"]
+    assert scheduler.stats[0].sent == 1
+    assert scheduler.stats[3].sent == 2
+    await scheduler.close()
+
+
+@pytest.mark.asyncio
+async def test_send_error_is_raised_to_caller():
+    scheduler = OutboundScheduler(priorities={ChunkedEndpoint.HTTP: 0})
+
+    async def send():
+        raise ValueError()
+
+    with pytest.raises(ValueError):
+        await scheduler.submit(ChunkedEndpoint.HTTP, send)
+    await scheduler.close()
@@ -0,0 +1,111 @@
+import csv
+import random
+import struct
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from amazfit_pyclient.fetch import (
+    FetchScheduler,
+    FetchType,
+    get_schema,
+    SchemaFetch,
+    SCHEMAS,
+)
+from amazfit_pyclient.fetch.schema import CHUNK
+from amazfit_pyclient.fetch.utils import RecordStream
+from benchmarks.fake_watch import FakeFetchClient
+
+START = datetime(2024, 3, 1, tzinfo=timezone.utc)
+
+
+def records(schema, count: int, seed: int) -> bytes:
+    rnd = random.Random(seed)
+    data = bytearray(rnd.randbytes(schema.header + schema.record_size * count))
+    if schema.explicit_timestamp:
+        offset = schema.header + [name for name, _ in schema.fields].index("timestamp")
+        for n in range(count):
+            struct.pack_into(
+                "<I",
+                data,
+                offset + n * schema.record_size,
+                int(START.timestamp()) + n * 300,
+            )
+    return bytes(data)
+
+
+@pytest.mark.parametrize("fetch_type", list(SCHEMAS))
+def test_decoders_agree(fetch_type):
+    schema = SCHEMAS[fetch_type]
+    # spans several decoding chunks, lost ranges cross their boundaries
+    data = records(schema, 3 * CHUNK, fetch_type)
+    lost = [(10, 20), (CHUNK - 5, CHUNK + 5), (3 * CHUNK - 1, 3 * CHUNK)]
+
+    samples = list(schema.samples(data, START, lost))
+    stream = RecordStream(schema.record_size, schema.header)
+    parsed = [
+        schema.parse(n, record, START)
+        for n, record in stream.feed(data)
+        if not any(first <= n < last for first, last in lost)
+    ]
+    assert samples == [i for i in parsed if i is not None]
+    assert 0 < len(samples) <= 3 * CHUNK - 21
+
+    batch = schema.batch(data, START, lost)
+    assert list(batch.samples()) == samples
+
+    pytest.importorskip("numpy")
+    columns = schema.columns(data, START, lost)
+    assert [schema.sample(*row) for row in columns.rows()] == samples
+
+
+def test_explicit_timestamps_between():
+    schema = get_schema(FetchType.RESTING_HEART_RATE)
+    batch = schema.batch(records(schema, 100, 1), START, [(5, 6)])
+    window = batch.between(START + timedelta(minutes=7), START + timedelta(hours=1))
+
+    assert [i.timestamp for i in window] == [
+        START + timedelta(minutes=5 * n) for n in range(2, 12) if n != 5
+    ]
+    assert window[0].sample() == batch[2].sample()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("streaming", [False, True])
+@pytest.mark.parametrize(
+    "fetch_type", [FetchType.SPO2_NORMAL, FetchType.RESTING_HEART_RATE]
+)
+async def test_schema_fetch(tmp_path, monkeypatch, fetch_type, streaming):
+    monkeypatch.chdir(tmp_path)
+    schema = get_schema(fetch_type)
+    data = records(schema, 200, 2)
+    client = FakeFetchClient(data, record_size=schema.record_size)
+
+    fetch = SchemaFetch(client, fetch_type, streaming=streaming)
+    samples = []
+    if streaming:
+        fetch.sinks.append(samples.append)
+    await fetch.start(client.start)
+    await fetch.finished.wait()
+
+    expected = list(schema.samples(data, client.start))
+    if not streaming:
+        samples = list(fetch.get_samples())
+    assert samples == expected
+    assert type(samples[0]).__name__ == schema.sample.__name__
+    with open(fetch.path) as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == ["timestamp", *(name for name, _ in schema.record_dtype)]
+    assert len(rows) == len(expected) + 1
+
+
+@pytest.mark.asyncio
+async def test_scheduler_uses_schemas(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    schema = get_schema(FetchType.STRESS_MANUAL)
+    client = FakeFetchClient(records(schema, 50, 3), record_size=schema.record_size)
+
+    await FetchScheduler(client).run([(FetchType.STRESS_MANUAL, client.start)])
+
+    with open(tmp_path / "stress_manual.2024-03-01T00:00:00+00:00.csv") as f:
+        assert len(list(csv.reader(f))) == 51
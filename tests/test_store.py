@@ -0,0 +1,124 @@
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from amazfit_pyclient.fetch import FetchActivity, FetchStress
+from amazfit_pyclient.fetch.utils import TimeSeriesStore
+from benchmarks.fake_watch import FakeFetchClient
+
+DTYPE = [("stress", "u1")]
+START = datetime(2024, 3, 1, tzinfo=timezone.utc)
+
+
+def epoch(minute: int) -> int:
+    return int(START.timestamp()) + minute * 60
+
+
+@pytest.fixture
+def store(tmp_path):
+    with TimeSeriesStore(tmp_path / "samples.db") as store:
+        yield store
+
+
+def test_upsert_overlapping_windows(store):
+    assert (
+        store.upsert(
+            "a",
+            "stress",
+            DTYPE,
+            [epoch(i) for i in range(10)],
+            {"stress": list(range(10))},
+        )
+        == 10
+    )
+    # same window again writes nothing
+    assert (
+        store.upsert(
+            "a",
+            "stress",
+            DTYPE,
+            [epoch(i) for i in range(10)],
+            {"stress": list(range(10))},
+        )
+        == 0
+    )
+    # overlap updates changed samples and appends the rest
+    assert (
+        store.upsert(
+            "a",
+            "stress",
+            DTYPE,
+            [epoch(i) for i in range(8, 12)],
+            {"stress": [8, 90, 100, 110]},
+        )
+        == 3
+    )
+    store.upsert("b", "stress", DTYPE, [epoch(0)], {"stress": [1]})
+
+    rows = list(store.query("a", "stress", START, START + timedelta(hours=1)))
+    assert rows == [(epoch(i), i) for i in range(9)] + [
+        (epoch(9), 90),
+        (epoch(10), 100),
+        (epoch(11), 110),
+    ]
+    assert list(
+        store.query(
+            "a", "stress", START + timedelta(minutes=3), START + timedelta(minutes=5)
+        )
+    ) == [(epoch(3), 3), (epoch(4), 4)]
+    assert list(store.query("a", "activity", START, START + timedelta(days=1))) == []
+
+
+def test_range_query_uses_index(store):
+    store.table("stress", DTYPE)
+    plan = store.connection.execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM stress "
+        "WHERE device = ? AND timestamp >= ? AND timestamp < ?",
+        ("a", 0, 1),
+    ).fetchall()
+    assert "USING PRIMARY KEY" in plan[0][-1]
+
+
+def test_reopen(tmp_path):
+    with TimeSeriesStore(tmp_path / "samples.db") as store:
+        store.upsert("a", "stress", DTYPE, [epoch(0)], {"stress": [5]})
+    with TimeSeriesStore(tmp_path / "samples.db") as store:
+        assert list(
+            store.query("a", "stress", START, START + timedelta(minutes=1))
+        ) == [(epoch(0), 5)]
+
+
+async def fetch_rows(fetch, since):
+    await fetch.start(since)
+    await fetch.finished.wait()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("streaming", [False, True])
+@pytest.mark.parametrize("fetch_cls", [FetchActivity, FetchStress])
+async def test_fetch_into_store(tmp_path, monkeypatch, store, streaming, fetch_cls):
+    monkeypatch.chdir(tmp_path)
+    payload = random.Random(6).randbytes(8 * 200)
+    client = FakeFetchClient(payload, record_size=fetch_cls.record_size)
+
+    reference = fetch_cls(client)
+    await fetch_rows(reference, START)
+    names = [name for name, _ in reference.record_dtype]
+    expected = [
+        (int(i.timestamp.timestamp()), *(getattr(i, name) for name in names))
+        for i in reference.get_samples()
+    ]
+
+    # a later window first, then the whole one overlapping it, then again
+    written = []
+    for since in [START + timedelta(minutes=100), START, START]:
+        before = store.connection.total_changes
+        await fetch_rows(fetch_cls(client, streaming=streaming, store=store), since)
+        written.append(store.connection.total_changes - before)
+
+    table = reference.fetch_type.name.lower()
+    end = START + timedelta(days=7)
+    assert list(store.query(client.address, table, START, end)) == expected
+    assert written[1] == len([i for i in expected if i[0] < epoch(100)])
+    assert written[2] == 0
@@ -1,9 +1,14 @@
+import asyncio
 from unittest.mock import AsyncMock, Mock, patch
 
 import pytest
 
 from amazfit_pyclient.chunked_encoder import ChunkedEncoder
 from amazfit_pyclient.chunked_encoder.handlers import HttpClient
+from amazfit_pyclient.chunked_encoder.handlers.utils import (
+    ResponseCache,
+    WeatherServer,
+)
 
 
 @pytest.mark.asyncio
@@ -25,3 +30,156 @@ async def test_weather():
     # a = WeatherServer()
     # r = a.get("/weather/current")
     # print(r.content)
+
+
+class FlakyUpstream:
+    def __init__(self, latency: float = 0.0):
+        self.server = WeatherServer(latency)
+        self.fail = False
+
+    @property
+    def requests(self):
+        return self.server.requests
+
+    async def fetch(self, url: str, method: str = "GET", headers: dict = None):
+        if self.fail:
+            self.server.requests += 1
+            raise ConnectionError("upstream down")
+        return await self.server.fetch(url)
+
+
+URL_CURRENT = "https://localhost/weather/current"
+
+
+@pytest.mark.asyncio
+async def test_cache_serves_repeated_polls():
+    upstream = WeatherServer()
+    cache = ResponseCache(upstream, ttl=60)
+
+    first = await cache.get(URL_CURRENT)
+    for _ in range(100):
+        assert await cache.get(URL_CURRENT) is first
+
+    assert upstream.requests == 1
+    assert cache.stats.hits == 100
+
+
+@pytest.mark.asyncio
+async def test_cache_shares_concurrent_fetches():
+    upstream = WeatherServer(latency=0.01)
+    cache = ResponseCache(upstream, ttl=60)
+
+    responses = await asyncio.gather(*(cache.get(URL_CURRENT) for _ in range(10)))
+
+    assert upstream.requests == 1
+    assert all(r is responses[0] for r in responses)
+
+
+@pytest.mark.asyncio
+async def test_cache_refreshes_in_background():
+    upstream = WeatherServer(latency=0.01)
+    cache = ResponseCache(upstream, ttls={"/weather/current": 1.0})
+
+    first = await cache.get(URL_CURRENT)
+    first.fetched -= 0.9
+    # stale but not expired: served at once, refreshed behind it
+    assert await cache.get(URL_CURRENT) is first
+    await asyncio.gather(*cache.fetching.values())
+
+    assert upstream.requests == 2
+    assert await cache.get(URL_CURRENT) is not first
+
+
+@pytest.mark.asyncio
+async def test_cache_serves_expired_entry_when_upstream_fails():
+    upstream = FlakyUpstream()
+    cache = ResponseCache(upstream, ttl=1.0)
+
+    first = await cache.get(URL_CURRENT)
+    first.fetched -= 2
+    upstream.fail = True
+
+    assert await cache.get(URL_CURRENT) is first
+    assert cache.stats.errors == 1
+
+    cache.invalidate()
+    with pytest.raises(ConnectionError):
+        await cache.get(URL_CURRENT)
+
+
+@pytest.mark.asyncio
+async def test_http_client_reuses_serialized_frame():
+    client = Mock()
+    client.write_gatt_char = AsyncMock()
+    upstream = WeatherServer()
+    http = HttpClient(ChunkedEncoder(client), Mock(), upstream=upstream)
+
+    with patch.object(ChunkedEncoder, "write") as encoder_mock:
+        await http.request(1, "GET", URL_CURRENT)
+        await http.request(2, "GET", URL_CURRENT)
+        await http.request(3, "GET", "https://localhost/unknown")
+
+    first, second, missing = (c.args[1] for c in encoder_mock.call_args_list)
+    assert first[:2] == b"\x02\x01"
+    assert second[:2] == b"\x02\x02"
+    assert first[2:] == second[2:]
+    assert missing == b"\x02\x03\x02\x00\x00\x00\x00"
+    assert upstream.requests == 2
+
+
+class RecordingUpstream(WeatherServer):
+    def __init__(self):
+        super().__init__()
+        self.headers = []
+
+    async def fetch(self, url: str, method: str = "GET", headers: dict = None):
+        self.headers.append(headers)
+        return await super().fetch(url, method, headers)
+
+
+@pytest.mark.asyncio
+async def test_only_urls_with_a_ttl_are_cached():
+    upstream = WeatherServer()
+    cache = ResponseCache(upstream, ttls={"/weather/current": 60})
+
+    for _ in range(3):
+        await cache.get(URL_CURRENT)
+        await cache.get("https://localhost/app/data")
+
+    assert upstream.requests == 4
+    assert list(cache.entries) == [URL_CURRENT]
+    assert cache.stats.bypassed == 3
+
+
+@pytest.mark.asyncio
+async def test_cache_is_bounded():
+    cache = ResponseCache(WeatherServer(), ttl=60, max_entries=4)
+
+    urls = [f"{URL_CURRENT}?n={n}" for n in range(10)]
+    for url in urls:
+        await cache.get(url)
+    await cache.get(urls[6])
+
+    assert list(cache.entries) == urls[6:]
+    assert len(cache.url_ttls) == 4
+
+
+@pytest.mark.asyncio
+async def test_http_client_forwards_headers():
+    client = Mock()
+    client.write_gatt_char = AsyncMock()
+    upstream = RecordingUpstream()
+    http = HttpClient(ChunkedEncoder(client), Mock(), upstream=upstream)
+    http.write = AsyncMock()
+
+    for request_id, url in enumerate([b"https://localhost/app", URL_CURRENT.encode()]):
+        payload = memoryview(
+            bytes([0x01, 0x00, request_id])
+            + b"GET\0"
+            + url
+            + b"\0\x01Authorization\0Bearer abc\0\0\0\0"
+        )
+        await http(payload)
+    await asyncio.gather(*http.tasks.values())
+
+    assert upstream.headers == [{"Authorization": "Bearer abc"}] * 2
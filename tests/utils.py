@@ -1,3 +1,7 @@
+import asyncio
+from typing import Optional
+
+
 class JavaHelper:
     @staticmethod
     def convert(v: list[int]) -> bytes:
@@ -18,3 +22,62 @@ class JavaHelper:
                 v,
             )
         )
+
+
+class StandInServer:
+    """
+    Local HTTP/1.1 server answering every request with `body` after
+    `latency` seconds, `/delay/<seconds>` overrides the latency. `peak` is
+    the most requests it served at once.
+    """
+
+    def __init__(self, latency: float = 0.0, body: bytes = b"ok"):
+        self.latency = latency
+        self.body = body
+        self.requests = 0
+        self.active = 0
+        self.peak = 0
+        self.server: Optional[asyncio.Server] = None
+        self.connections: set[asyncio.Task] = set()
+        self.url = ""
+
+    async def handle(self, reader: asyncio.StreamReader, writer):
+        self.connections.add(asyncio.current_task())
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                path = head.split(b" ", 2)[1].decode()
+                latency = self.latency
+                if path.startswith("/delay/"):
+                    latency = float(path.removeprefix("/delay/"))
+
+                self.requests += 1
+                self.active += 1
+                self.peak = max(self.peak, self.active)
+                try:
+                    await asyncio.sleep(latency)
+                finally:
+                    self.active -= 1
+
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Length: %i\r\n\r\n" % len(self.body)
+                    + self.body
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+            self.connections.discard(asyncio.current_task())
+
+    async def __aenter__(self):
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        port = self.server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}"
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.server.close()
+        for task in self.connections:
+            task.cancel()
+        await asyncio.gather(*self.connections, return_exceptions=True)